@@ -0,0 +1,131 @@
+"""
+Local on-disk cache of EDGAR resources, keyed by EDGAR path (e.g. `edgar/data/1234/0001234-19-000001.txt`).
+
+Accession files never change once published and are served from disk without any request. Daily and quarterly
+index files are revalidated with `If-None-Match` / `If-Modified-Since`, until they are old enough to be settled.
+"""
+from datetime import datetime
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import time
+
+from insider_trading import utils
+
+
+ARCHIVES = '/Archives/'
+# Daily index files are not updated after a few days
+SETTLE_DAYS = 3
+
+LOG = logging.getLogger(__name__)
+
+
+class Cache:
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def __repr__(self):
+        return f"Cache {self.root}"
+
+    @staticmethod
+    def key(url):
+        """
+        EDGAR path of the `url`, None if the url is not cacheable.
+        """
+        _, archives, path = url.partition(ARCHIVES)
+        if not archives or not path or '?' in path:
+            return None
+        return path
+
+    @staticmethod
+    def is_immutable(key):
+        """
+        Check if resource can be served from disk without revalidation.
+        """
+        if key.startswith('edgar/data/'):
+            return True
+        date = utils.parse_date(key)
+        if date and re.search(r'/form\.\d{8}\.idx$', key):
+            return (datetime.now() - datetime.strptime(date, '%Y%m%d')).days > SETTLE_DAYS
+        quarter = re.search(r'full-index/(\d{4})/QTR([1-4])/form\.idx$', key)
+        if quarter:
+            # Quarterly index is complete once the next quarter starts
+            year, quarter = int(quarter.group(1)), int(quarter.group(2))
+            next_quarter = datetime(year + quarter // 4, quarter % 4 * 3 + 1, 1)
+            return (datetime.now() - next_quarter).days > SETTLE_DAYS
+        return False
+
+    def _data_path(self, key):
+        return self.root / key
+
+    def _meta_path(self, key):
+        return self.root / (key + '.meta.json')
+
+    def get(self, key):
+        """
+        Load cached resource.
+        :param key: EDGAR path
+        :return: tuple (data, meta) or None if not cached. `data` is None for cached missing resources.
+        """
+        meta_path = self._meta_path(key)
+        meta = {}
+        if meta_path.exists():
+            with open(meta_path, 'r') as fin:
+                meta = json.load(fin)
+            if meta.get('status') == 404:
+                return None, meta
+
+        data_path = self._data_path(key)
+        if not data_path.exists():
+            return None
+        return data_path.read_bytes(), meta
+
+    def put(self, key, data, headers=None, status=200):
+        """
+        Save resource to the cache.
+        :param key: EDGAR path
+        :param data: bytes
+        :param headers: response headers, validators are kept for mutable resources
+        :param status: response status, 404 are kept as missing resources
+        """
+        headers = headers or {}
+        meta = {'status': status, 'fetched': time.time()}
+        for header in ('ETag', 'Last-Modified'):
+            if header in headers:
+                meta[header] = headers[header]
+
+        if status == 200:
+            _atomic_write(self._data_path(key), data)
+        if status != 200 or not self.is_immutable(key):
+            _atomic_write(self._meta_path(key), json.dumps(meta).encode('utf-8'))
+        LOG.debug(f"Cached {key} ({status})")
+
+    def touch(self, key):
+        """
+        Mark resource as revalidated.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            _, meta = cached
+            meta['fetched'] = time.time()
+            _atomic_write(self._meta_path(key), json.dumps(meta).encode('utf-8'))
+
+    @staticmethod
+    def conditional_headers(meta):
+        headers = {}
+        if meta.get('ETag'):
+            headers['If-None-Match'] = meta['ETag']
+        if meta.get('Last-Modified'):
+            headers['If-Modified-Since'] = meta['Last-Modified']
+        return headers
+
+
+def _atomic_write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as fout:
+        fout.write(data)
+    os.replace(tmp_path, path)
@@ -0,0 +1,206 @@
+"""
+Shared HTTP client for EDGAR and AlphaVantage requests.
+
+A single `aiohttp.ClientSession` with a bounded keep-alive connection pool is reused by every request of the
+process, so connections (and TLS handshakes) are shared between filings instead of opened per request.
+"""
+import asyncio
+import logging
+import os
+import time
+
+import aiohttp
+from multidict import CIMultiDict
+from yarl import URL
+
+from insider_trading.metrics import get_metrics
+
+# SEC asks automated tools to declare themselves: "Company Name admin@company.com"
+USER_AGENT = os.getenv("EDGAR_USER_AGENT", "insider_trading y.karanouskaya@gmail.com")
+MAX_CONNECTIONS = 30
+MAX_CONNECTIONS_PER_HOST = 10
+KEEPALIVE_TIMEOUT = 60
+REQUEST_TIMEOUT = 120
+MAX_RETRIES = 3
+RETRY_WAIT = 1.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+LOG = logging.getLogger(__name__)
+
+
+class Client:
+
+    def __init__(self, user_agent=USER_AGENT, limit=MAX_CONNECTIONS, limit_per_host=MAX_CONNECTIONS_PER_HOST,
+                 timeout=REQUEST_TIMEOUT, cache=None):
+        self.user_agent = user_agent
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.cache = cache
+        self._session = None
+        self._loop = None
+
+    def __repr__(self):
+        return f"Client (limit={self.limit}, limit_per_host={self.limit_per_host})"
+
+    async def _get_session(self):
+        """
+        Create session lazily, it has to be bound to the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is not None and self._loop is not loop:
+            await self._close_previous_session()
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit,
+                                             limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=KEEPALIVE_TIMEOUT,
+                                             ttl_dns_cache=300)
+            headers = {'User-Agent': self.user_agent,
+                       'Accept-Encoding': 'gzip, deflate'}
+            self._session = aiohttp.ClientSession(connector=connector, headers=headers,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._loop = loop
+        return self._session
+
+    async def _close_previous_session(self):
+        """
+        Close the session bound to a previous event loop, its connections can't be used by the running one.
+        """
+        session, loop = self._session, self._loop
+        self._session = None
+        self._loop = None
+        if session.closed:
+            return
+        try:
+            if loop.is_running():
+                # Loop of another thread, the session is closed there
+                asyncio.run_coroutine_threadsafe(session.close(), loop)
+            else:
+                # Connections of a closed loop are dropped without touching their transports
+                await session.close()
+        except Exception:
+            LOG.exception('Failed to close the session of a previous event loop')
+
+    async def _get(self, url, params=None, governor=None, headers=None):
+        session = await self._get_session()
+        start = time.monotonic()
+        async with session.get(url, params=params, headers=headers) as response:
+            data = await response.read()
+        latency = time.monotonic() - start
+        if governor is not None:
+            governor.report(response.status, latency)
+        LOG.debug(f"GET {url}: {response.status}, {len(data)} bytes")
+
+        host = URL(url).host
+        metrics = get_metrics()
+        metrics.inc('http_requests', host=host, status=response.status)
+        metrics.inc('http_bytes', len(data), host=host)
+        metrics.observe('http_request', latency, host=host)
+
+        return response, data
+
+    async def _get_with_retries(self, url, params=None, governor=None, retries=MAX_RETRIES, headers=None):
+        for attempt in range(retries + 1):
+            if governor is None:
+                response, data = await self._get(url, params, headers=headers)
+            else:
+                async with governor:
+                    response, data = await self._get(url, params, governor, headers)
+            if response.status not in RETRY_STATUSES or attempt == retries:
+                break
+            wait = _retry_wait(response, attempt)
+            LOG.debug(f"GET {url}: {response.status}, retrying in {wait} sec")
+            get_metrics().inc('http_retries', host=URL(url).host, status=response.status)
+            await asyncio.sleep(wait)
+
+        return response, data
+
+    async def get(self, url, params=None, governor=None, retries=MAX_RETRIES):
+        """
+        GET `url` and return response body.
+        Throttled and server error responses are retried with exponential backoff.
+        If the client has a cache, EDGAR resources are served from it when possible.
+        :param url: string
+        :param params: dict of query parameters
+        :param governor: `rate.RateGovernor` to pass the request through
+        :param retries: max number of retries
+        :return: bytes
+        Raises aiohttp.ClientResponseError for error statuses.
+        """
+        key = self.cache.key(url) if self.cache is not None and params is None else None
+        if key is None:
+            response, data = await self._get_with_retries(url, params, governor, retries)
+            response.raise_for_status()
+            return data
+
+        headers = None
+        cached = self.cache.get(key)
+        if cached is not None:
+            cached_data, meta = cached
+            if cached_data is None:
+                get_metrics().inc('cache_hits', kind='not_found')
+                raise _not_found(url)
+            if self.cache.is_immutable(key):
+                get_metrics().inc('cache_hits', kind='immutable')
+                return cached_data
+            headers = self.cache.conditional_headers(meta)
+
+        response, data = await self._get_with_retries(url, params, governor, retries, headers)
+        if response.status == 304 and cached is not None:
+            get_metrics().inc('cache_hits', kind='revalidated')
+            self.cache.touch(key)
+            return cached_data
+        if response.status == 200 or (response.status == 404 and self.cache.is_immutable(key)):
+            self.cache.put(key, data, response.headers, response.status)
+        response.raise_for_status()
+
+        return data
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+def _not_found(url):
+    request_info = aiohttp.RequestInfo(URL(url), 'GET', CIMultiDict(), URL(url))
+    return aiohttp.ClientResponseError(request_info, (), status=404, message='Not Found (cached)')
+
+
+def _retry_wait(response, attempt):
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return RETRY_WAIT * 2 ** attempt
+
+
+_CLIENT = None
+
+
+def get_client():
+    """
+    Get process-wide shared client.
+    """
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = Client()
+    return _CLIENT
+
+
+def configure_client(**kwargs):
+    """
+    Replace process-wide shared client with a new one created with `kwargs`.
+    """
+    global _CLIENT
+    _CLIENT = Client(**kwargs)
+    return _CLIENT
+
+
+def close_client():
+    """
+    Close process-wide shared client connections.
+    """
+    if _CLIENT is not None:
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(_CLIENT.close())
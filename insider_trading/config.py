@@ -4,11 +4,20 @@ RANDOM_SEED = 10
 
 # COLUMN NAMES - SEC filings
 REPORT_DATE = 'REPORT_DATE'
+OWNER_CIK = 'OWNER_CIK'
+OWNER_NAME = 'OWNER_NAME'
+COMMENTS = 'COMMENTS'
+ISSUER_CIK = 'ISSUER_CIK'
+ISSUER_COMPANY = 'ISSUER_COMPANY'
 TICKER = 'TICKER'
+EQUITY = 'EQUITY'
+TRANSACTION_DATE = 'TRANSACTION_DATE'
 AQUIRED = 'AQUIRED/DISPOSED'
 PRICE_PER_UNIT = 'PRICE_PER_UNIT'
 HOLDING_BEFORE = 'HOLDING_BEFORE'
+HOLDING_AFTER = 'HOLDING_AFTER'
 AMOUNT = 'AMOUNT'
+OWNERSHIP_NATURE = 'OWNERSHIP_NATURE'
 
 IS_DIRECTOR = 'IS_DIRECTOR'
 IS_OFFICER = 'IS_OFFICER'
@@ -17,6 +26,13 @@ IS_OTHER = 'OTHER'
 IS_DIRECT_OWNER = 'IS_DIRECT_OWNER'
 OWNERSHIP_STATUS = 'OWNERSHIP_STATUS(DIRECT/INDIRECT)'
 
+# Filings database layout
+FILINGS_COLUMNS = [REPORT_DATE, OWNER_CIK, OWNER_NAME, IS_DIRECTOR, IS_OFFICER, IS_MAJOR_OWNER, IS_OTHER,
+                   COMMENTS, ISSUER_CIK, ISSUER_COMPANY, TICKER,
+                   EQUITY, TRANSACTION_DATE, AQUIRED, AMOUNT, PRICE_PER_UNIT,
+                   HOLDING_BEFORE, HOLDING_AFTER, OWNERSHIP_STATUS,
+                   OWNERSHIP_NATURE]
+
 # COLUMN NAMES - market data
 DATE = 'date'
 OPEN = 'open'
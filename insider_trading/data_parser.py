@@ -8,24 +8,33 @@ import urllib.parse
 from pathlib import Path
 import logging
 
-from tqdm import tqdm
+import numpy as np
 from bs4 import BeautifulSoup
 
-from insider_trading import utils
+from insider_trading import utils, form_parser, index_parser
+from insider_trading.client import get_client
+from insider_trading.metrics import get_metrics
 
 
 BASE_FORM_ENDPOINT = 'https://www.sec.gov/Archives/'
 DAILY_INDEX_ENDPOINT = 'https://www.sec.gov/Archives/edgar/daily-index/'
-RATE_LIMIT_WAIT = 1.2
+FULL_INDEX_ENDPOINT = 'https://www.sec.gov/Archives/edgar/full-index/'
 
 
 LOG = logging.getLogger(__name__)
 
 
+class IndexFetchError(Exception):
+    """
+    Index could not be downloaded, e.g. network error or timeout, unlike a missing index (404).
+    """
+
+
 class Form:
 
-    def __init__(self, url):
+    def __init__(self, url, client=None):
         self.url = urllib.parse.urljoin(BASE_FORM_ENDPOINT, url)
+        self.client = client or get_client()
         self.content = {
             "owner": {},
             "issuer": {},
@@ -36,6 +45,10 @@ class Form:
     def __repr__(self):
         return f"Form {self.url}"
 
+    @property
+    def accession(self):
+        return utils.parse_accession(self.url)
+
     def get_content(self):
         return self.content
 
@@ -52,20 +65,18 @@ class Form:
             return None
         return soup
 
-    async def _async_request_form(self):
+    async def _async_request_form(self, governor=None):
         try:
             LOG.debug(f"Resuest start: {time.monotonic()}")
-            await asyncio.sleep(RATE_LIMIT_WAIT)
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.url) as url:
-                    url_data = await url.read()
-            soup = BeautifulSoup(url_data, 'html.parser')
+            with get_metrics().timer('stage', stage='form_fetch'):
+                url_data = await self.client.get(self.url, governor=governor)
             LOG.debug(f"Request end: {time.monotonic()}")
-        except aiohttp.web.HTTPError as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             LOG.exception(f'Error while downloading form: {e}')
+            get_metrics().inc('forms_failed', stage='form_fetch')
             return None
 
-        return soup
+        return url_data
 
     def _extract_owner_info(self, soup):
         """
@@ -164,27 +175,57 @@ class Form:
         self._set_content('holding', 'ownership_status', ownership_status)
         self._set_content('holding', 'ownership_nature', ownership_nature)
 
-    async def extract_info(self, limiter):
-        async with limiter:
-            soup = await self._async_request_form()
-        if soup:
-            self._extract_transaction_info(soup)
-            self._extract_owner_info(soup)
-            self._extract_issuer_info(soup)
-            self._extract_holding_info(soup)
-        else:
+    def extract_soup_info(self, soup):
+        """
+         Extract form content from bs4 soup (reference implementation for `form_parser`).
+         :param soup: bs4 soup object
+         """
+        self._extract_transaction_info(soup)
+        self._extract_owner_info(soup)
+        self._extract_issuer_info(soup)
+        self._extract_holding_info(soup)
+
+    def parse(self, data):
+        """
+         Extract form content from raw submission data.
+         :param data: bytes, EDGAR .txt submission
+         """
+        self.content = form_parser.extract_content(data)
+
+    async def extract_info(self, limiter, executor=None):
+        """
+         Download the form and extract its content.
+         :param limiter: `rate.RateGovernor`
+         :param executor: `concurrent.futures.Executor` to parse in, parse on the event loop if None
+         """
+        data = await self._async_request_form(limiter)
+        if not data:
             raise AttributeError('Could not get form info.')
+        metrics = get_metrics()
+        try:
+            # Parsing in the executor is timed from submission, the time includes waiting for a free worker
+            with metrics.timer('stage', stage='parse'):
+                if executor is None:
+                    self.parse(data)
+                else:
+                    loop = asyncio.get_running_loop()
+                    self.content = await loop.run_in_executor(executor, form_parser.extract_content, data)
+        except AttributeError:
+            metrics.inc('forms_failed', stage='parse')
+            raise
 
 
 class Index:
 
-    def __init__(self, url, name=None):
+    def __init__(self, url, name=None, client=None, endpoint=None):
         if name:
             self.name = name
         else:
             self.name = url
-        self.url = urllib.parse.urljoin(DAILY_INDEX_ENDPOINT, url)
+        self.url = urllib.parse.urljoin(endpoint or DAILY_INDEX_ENDPOINT, url)
+        self.client = client or get_client()
         self.data = None
+        self.entries = None
 
     def __repr__(self):
         return f"Index {self.name}"
@@ -195,44 +236,57 @@ class Index:
     # def _decode_binary_data(self):
     #     return self.data.decode('ascii')
 
-    def _request_index(self):
+    async def _async_request_index(self, governor=None):
         try:
-            user_agent = 'Mozilla/5.0 (iPhone; CPU iPhone OS 5_0 like Mac OS X) AppleWebKit/534.46'
-            req = request.Request(self.url, headers={'User-Agent': user_agent})
-            with request.urlopen(req) as url_in:
-                data = url_in.read()
-        except urllib.error.HTTPError as e:
+            with get_metrics().timer('stage', stage='index_fetch'):
+                data = await self.client.get(self.url, governor=governor)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if isinstance(e, aiohttp.ClientResponseError) and e.status == 404:
+                # No index on weekends and holidays
+                LOG.info(f'No index {self.url}')
+                get_metrics().inc('indices', status='missing')
+                return None
             LOG.exception(f'Error while downloading index: {e}')
-            return None
+            get_metrics().inc('indices', status='failed')
+            raise IndexFetchError(f'Could not download index {self.url}: {e!r}') from e
         return data
 
-    def _parse_entry(self, entry):
+    async def async_get_index(self, governor=None):
         """
-         Parse index form entry:
-              Form Company CIK Date Filename
-         """
-        entry_list = entry.strip().split(' ')
-        entry_list = list(filter(lambda x: x != '', entry_list))
-        form = entry_list[0]
-        company = ' '.join(entry_list[1:-3])
-        cik = entry_list[-3]
-        date = entry_list[-2]
-        filename = entry_list[-1]
-
-        return form, company, cik, date, filename
-
-    def get_index(self):
-        data = self._request_index()
+        Download and parse the index.
+        Raises AttributeError if there is no index (404), `IndexFetchError` if it could not be downloaded.
+        """
+        data = await self._async_request_index(governor)
         if data:
-            self.data = data.decode('ascii')
+            self.data = data
+            metrics = get_metrics()
+            with metrics.timer('stage', stage='index_parse'):
+                self.entries = index_parser.parse(data)
+            metrics.inc('indices', status='ok')
+            metrics.inc('index_entries', len(self.entries.path))
         else:
             raise AttributeError
 
+    def get_index(self):
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(self.async_get_index())
+
+    def partition(self):
+        """
+        Split index entries by filing date, e.g. to process a quarterly index day by day.
+        :return: dict of `Index` with loaded entries by date formatted as "%Y-%m-%d"
+        """
+        dates = np.datetime_as_string(self.entries.date)
+        order = np.argsort(dates, kind='stable')
+        unique, first = np.unique(dates[order], return_index=True)
+        indices = {}
+        for date, rows in zip(unique, np.split(order, first[1:])):
+            index = Index(self.url, f'{self.name} {date}', self.client)
+            index.entries = index_parser.IndexEntries(*[column[rows] for column in self.entries])
+            indices[str(date)] = index
+        return indices
+
     def generate_form(self):
-        for entry in self.data.split("\n"):
-            if entry.startswith('4 ') or entry.startswith('4/A'):
-            # if entry.startswith('4/A'):
-            #     import pdb; pdb.set_trace()
-                form_url = self._parse_entry(entry)[-1]
-                form = Form(form_url)
-                yield form
+        for form_url in self.entries.path:
+            form = Form(str(form_url), self.client)
+            yield form
@@ -0,0 +1,172 @@
+"""
+Filings database readers and writers.
+
+The database is either a single CSV file (default), a folder of Parquet files partitioned by report
+year/month (see `database.parquet`) or a SQLite file keyed by accession number (see `database.sqlite`).
+"""
+import csv
+import logging
+from pathlib import Path
+
+import pandas as pd
+
+from insider_trading import schema
+from insider_trading.config import *
+
+
+BACKENDS = ['csv', 'parquet', 'sqlite']
+SQLITE_SUFFIXES = ['.db', '.sqlite', '.sqlite3']
+PARQUET_BUFFER_SIZE = 50000
+
+LOG = logging.getLogger(__name__)
+
+
+def detect_backend(path):
+    path = Path(path)
+    if path.is_dir() or path.suffix == '.parquet':
+        return 'parquet'
+    if path.suffix in SQLITE_SUFFIXES:
+        return 'sqlite'
+    return 'csv'
+
+
+def _read_csv(path, columns=None, start=None, end=None):
+    usecols = columns
+    if columns is not None and (start is not None or end is not None) and REPORT_DATE not in columns:
+        usecols = columns + [REPORT_DATE]
+    df = schema.read_csv(path, usecols=usecols)
+
+    if start is not None or end is not None:
+        dates = df[REPORT_DATE]
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= dates >= pd.Timestamp(start)
+        if end is not None:
+            mask &= dates <= pd.Timestamp(end)
+        df = df[mask]
+    if columns is not None:
+        df = df[columns]
+
+    return df
+
+
+def read_filings(path, columns=None, start=None, end=None):
+    """
+    Load filings (or merged filings and market data) table, columns have `schema` types.
+    With Parquet, only requested columns and partitions in the date range are read from disk.
+    :param path: .csv file, .parquet file, partitioned Parquet folder or SQLite file
+    :param columns: list of columns to load, all if None
+    :param start: first report date to load, inclusive
+    :param end: last report date to load, inclusive
+    :return: data frame
+    """
+    backend = detect_backend(path)
+    if backend == 'parquet':
+        from insider_trading.database import parquet
+        return parquet.read(path, columns, start, end)
+    if backend == 'sqlite':
+        from insider_trading.database import sqlite
+        return sqlite.read(path, columns, start, end)
+
+    return _read_csv(path, columns, start, end)
+
+
+class CSVWriter:
+    """
+    Appends rows to the CSV database, creating it with a heading if it doesn't exist.
+    """
+
+    def __init__(self, path, on_flush=None):
+        self.path = Path(path)
+        self.on_flush = on_flush
+        exists = self.path.exists()
+        self._file = open(self.path, 'a')
+        self._writer = csv.writer(self._file)
+        if not exists:
+            self._writer.writerow(FILINGS_COLUMNS)
+
+    def __repr__(self):
+        return f"CSVWriter {self.path}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write_rows(self, rows, accession=None):
+        """
+        Write rows and flush them to disk.
+        :param rows: list of rows, values ordered as `FILINGS_COLUMNS`
+        :param accession: form accession number, not stored in CSV
+        """
+        self._writer.writerows(rows)
+        self._file.flush()
+        if self.on_flush is not None:
+            self.on_flush([accession])
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """
+    Buffers rows and writes them to the partitioned Parquet database in large files.
+    """
+
+    def __init__(self, path, buffer_size=PARQUET_BUFFER_SIZE, on_flush=None):
+        self.path = Path(path)
+        self.buffer_size = buffer_size
+        self.on_flush = on_flush
+        self._rows = []
+        self._accessions = []
+
+    def __repr__(self):
+        return f"ParquetWriter {self.path}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write_rows(self, rows, accession=None):
+        """
+        :param rows: list of rows, values ordered as `FILINGS_COLUMNS`
+        :param accession: form accession number, not stored in Parquet
+        """
+        self._rows.extend(rows)
+        self._accessions.append(accession)
+        if len(self._rows) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        from insider_trading.database import parquet
+        parquet.write_rows(self.path, self._rows)
+        if self.on_flush is not None:
+            self.on_flush(self._accessions)
+        self._rows = []
+        self._accessions = []
+
+    def close(self):
+        self.flush()
+
+
+def open_writer(path, backend=None, on_flush=None):
+    """
+    Open filings database for appending.
+    :param path: database file or folder
+    :param backend: one of `BACKENDS`, detected from `path` if None
+    :param on_flush: callable(accessions), called with accession numbers of forms once their rows are on disk
+    :return: writer with `write_rows(rows, accession)`, `flush()` and `close()`
+    """
+    backend = backend or detect_backend(path)
+    if backend == 'parquet':
+        return ParquetWriter(path, on_flush=on_flush)
+    if backend == 'sqlite':
+        from insider_trading.database.sqlite import SQLiteWriter
+        return SQLiteWriter(path, on_flush=on_flush)
+    return CSVWriter(path, on_flush=on_flush)
@@ -0,0 +1,108 @@
+"""
+Filings database stored as Parquet files partitioned by report year and month:
+    <root>/year=2019/month=9/part-20190913-<id>.parquet
+"""
+import logging
+from pathlib import Path
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from insider_trading import schema
+from insider_trading.config import *
+
+
+NUMERIC_COLUMNS = schema.NUMERIC_COLUMNS
+PARTITION_COLUMNS = ['year', 'month']
+
+SCHEMA = pa.schema([(col, pa.timestamp('ms') if col == REPORT_DATE else
+                     pa.float64() if col in NUMERIC_COLUMNS else pa.string())
+                    for col in FILINGS_COLUMNS])
+
+LOG = logging.getLogger(__name__)
+
+
+def rows_to_table(rows):
+    """
+    Convert database rows into a typed table.
+    :param rows: list of rows, values ordered as `FILINGS_COLUMNS`
+    :return: pyarrow Table
+    """
+    df = pd.DataFrame(rows, columns=FILINGS_COLUMNS, dtype=str)
+    df[REPORT_DATE] = pd.to_datetime(df[REPORT_DATE], format='%Y-%m-%d')
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    return pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+
+def write_rows(root, rows):
+    """
+    Write rows as new files into report year/month partitions.
+    :param root: database folder
+    :param rows: list of rows, values ordered as `FILINGS_COLUMNS`
+    """
+    if not rows:
+        return
+    table = rows_to_table(rows)
+    dates = table.column(REPORT_DATE).to_pandas()
+    for (year, month), ids in dates.groupby([dates.dt.year, dates.dt.month]).groups.items():
+        part = table.take(pa.array(ids))
+        folder = Path(root) / f'year={year}' / f'month={month}'
+        folder.mkdir(parents=True, exist_ok=True)
+        stamp = dates[ids[0]].strftime('%Y%m%d')
+        path = folder / f'part-{stamp}-{uuid.uuid4().hex[:8]}.parquet'
+        pq.write_table(part, path)
+        LOG.debug(f"Wrote {len(part)} rows to {path}")
+
+
+def _date_filter(start=None, end=None, date_col=REPORT_DATE, partitioned=True):
+    """
+    Build filter on the date range [start, end], using partition columns to skip whole files.
+    """
+    conditions = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        if partitioned:
+            conditions.append((ds.field('year') > start.year) |
+                              ((ds.field('year') == start.year) & (ds.field('month') >= start.month)))
+        conditions.append(ds.field(date_col) >= pa.scalar(start.to_pydatetime(), pa.timestamp('ms')))
+    if end is not None:
+        end = pd.Timestamp(end)
+        if partitioned:
+            conditions.append((ds.field('year') < end.year) |
+                              ((ds.field('year') == end.year) & (ds.field('month') <= end.month)))
+        conditions.append(ds.field(date_col) <= pa.scalar(end.to_pydatetime(), pa.timestamp('ms')))
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def read(root, columns=None, start=None, end=None):
+    """
+    Load filings from the partitioned database or a single Parquet file, columns have `schema` types.
+    :param root: database folder or .parquet file
+    :param columns: list of columns to load, all if None
+    :param start: first report date to load, inclusive
+    :param end: last report date to load, inclusive
+    :return: data frame sorted by report date, rows of the same date in file order
+    """
+    dataset = ds.dataset(root, format='parquet', partitioning='hive')
+    partitioned = all(col in dataset.schema.names for col in PARTITION_COLUMNS)
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name not in PARTITION_COLUMNS]
+    sort = REPORT_DATE in dataset.schema.names
+    read_columns = columns + [REPORT_DATE] if sort and REPORT_DATE not in columns else columns
+    table = dataset.to_table(columns=read_columns, filter=_date_filter(start, end, partitioned=partitioned))
+
+    # Dates are datetime64[ns] as read from CSV and SQLite, whatever the stored unit
+    df = schema.apply(table.to_pandas())
+    if sort:
+        # Partition folders are listed as text, e.g. month=10 before month=9
+        df = df.sort_values(by=REPORT_DATE, kind='stable', ignore_index=True)
+    return df[columns]
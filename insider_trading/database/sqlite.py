@@ -0,0 +1,185 @@
+"""
+Filings database stored in a local SQLite file.
+
+Rows are keyed by form accession number and transaction index, so writing the same forms again updates
+them in place instead of appending duplicates.
+"""
+from contextlib import closing
+import csv
+import logging
+import sqlite3
+
+import pandas as pd
+
+from insider_trading import schema
+from insider_trading.config import *
+
+
+TABLE = 'filings'
+ACCESSION = 'ACCESSION'
+TRANSACTION_INDEX = 'TRANSACTION_INDEX'
+KEY_COLUMNS = [ACCESSION, TRANSACTION_INDEX]
+NUMERIC_COLUMNS = schema.NUMERIC_COLUMNS
+INDEXED_COLUMNS = [TICKER, REPORT_DATE, OWNER_CIK]
+BATCH_SIZE = 5000
+EXPORT_CHUNK_SIZE = 100000
+
+LOG = logging.getLogger(__name__)
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _column_type(column):
+    if column == TRANSACTION_INDEX:
+        return 'INTEGER NOT NULL'
+    if column == ACCESSION:
+        return 'TEXT NOT NULL'
+    if column in NUMERIC_COLUMNS:
+        return 'REAL'
+    return 'TEXT'
+
+
+def connect(path):
+    """
+    Open the database, creating the table and indexes if needed.
+    :param path: SQLite file
+    :return: sqlite3 connection
+    """
+    conn = sqlite3.connect(str(path))
+    columns = ', '.join(f'{_quote(col)} {_column_type(col)}' for col in KEY_COLUMNS + FILINGS_COLUMNS)
+    keys = ', '.join(_quote(col) for col in KEY_COLUMNS)
+    with conn:
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {TABLE} ({columns}, PRIMARY KEY ({keys}))')
+        for col in INDEXED_COLUMNS:
+            index_name = f'{TABLE}_{col.lower()}'
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {TABLE} ({_quote(col)})')
+
+    return conn
+
+
+def _upsert_statement():
+    columns = KEY_COLUMNS + FILINGS_COLUMNS
+    names = ', '.join(_quote(col) for col in columns)
+    values = ', '.join('?' for _ in columns)
+    keys = ', '.join(_quote(col) for col in KEY_COLUMNS)
+    updates = ', '.join(f'{_quote(col)} = excluded.{_quote(col)}' for col in FILINGS_COLUMNS)
+    return f'INSERT INTO {TABLE} ({names}) VALUES ({values}) ON CONFLICT ({keys}) DO UPDATE SET {updates}'
+
+
+class SQLiteWriter:
+    """
+    Upserts rows into the SQLite database in batches, one transaction per batch.
+    """
+
+    def __init__(self, path, batch_size=BATCH_SIZE, on_flush=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self._accessions = []
+        self._conn = connect(path)
+        self._statement = _upsert_statement()
+        self._numeric_ids = [FILINGS_COLUMNS.index(col) for col in NUMERIC_COLUMNS]
+        self._rows = []
+
+    def __repr__(self):
+        return f"SQLiteWriter {self.path}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write_rows(self, rows, accession=None):
+        """
+        :param rows: list of rows of a single form, values ordered as `FILINGS_COLUMNS`
+        :param accession: form accession number
+        """
+        if accession is None:
+            raise ValueError('SQLite database rows have to be keyed by accession number')
+        for ind, row in enumerate(rows):
+            row = list(row)
+            for i in self._numeric_ids:
+                if row[i] == '':
+                    row[i] = None
+            self._rows.append([accession, ind] + row)
+        self._accessions.append(accession)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            with self._conn:
+                self._conn.executemany(self._statement, self._rows)
+            LOG.debug(f"Upserted {len(self._rows)} rows to {self.path}")
+        if self.on_flush is not None and self._accessions:
+            self.on_flush(self._accessions)
+        self._rows = []
+        self._accessions = []
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+
+def _select(columns=None, start=None, end=None):
+    columns = columns or FILINGS_COLUMNS
+    query = f'SELECT {", ".join(_quote(col) for col in columns)} FROM {TABLE}'
+    conditions, params = [], []
+    if start is not None:
+        conditions.append(f'{_quote(REPORT_DATE)} >= ?')
+        params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+    if end is not None:
+        conditions.append(f'{_quote(REPORT_DATE)} <= ?')
+        params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += f' ORDER BY {_quote(REPORT_DATE)}, {_quote(ACCESSION)}, {_quote(TRANSACTION_INDEX)}'
+    return query, params
+
+
+def read(path, columns=None, start=None, end=None):
+    """
+    Load filings from the database, using the report date index for the range, columns have `schema` types.
+    :param path: SQLite file
+    :param columns: list of columns to load, all `FILINGS_COLUMNS` if None
+    :param start: first report date to load, inclusive
+    :param end: last report date to load, inclusive
+    :return: data frame
+    """
+    query, params = _select(columns, start, end)
+    with closing(sqlite3.connect(str(path))) as conn:
+        return schema.apply(pd.read_sql_query(query, conn, params=params))
+
+
+def _format(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def export_csv(path, csv_path, start=None, end=None):
+    """
+    Export the database to the CSV database layout.
+    :param path: SQLite file
+    :param csv_path: output csv file
+    :return: number of exported rows
+    """
+    query, params = _select(FILINGS_COLUMNS, start, end)
+    count = 0
+    with closing(sqlite3.connect(str(path))) as conn, open(csv_path, 'w') as fout:
+        writer = csv.writer(fout)
+        writer.writerow(FILINGS_COLUMNS)
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            writer.writerows([_format(value) for value in row] for row in rows)
+            count += len(rows)
+
+    return count
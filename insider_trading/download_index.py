@@ -1,12 +1,14 @@
 # !usr/bin/python
 
 from datetime import datetime, timedelta
-import time
-import urllib.request as request
+import asyncio
 import urllib.parse
 from pathlib import Path
 
+import aiohttp
+
 from insider_trading import utils
+from insider_trading.client import get_client
 
 
 DAILY_INDEX_ENDPOINT = 'https://www.sec.gov/Archives/edgar/daily-index/'
@@ -27,11 +29,13 @@ def find_weekdays(start_date, end_date):
     return weekdays
 
 
-def download_day_form_index(date, output_folder):
+async def async_download_day_form_index(date, output_folder, client=None):
     """
     Downloads forms for a specific day and save to `output_folder`
     :param date: datetime.date instance
+    :param client: `client.Client`, shared client is used if None
     """
+    client = client or get_client()
     year = date.strftime('%Y')
     quarter = utils.get_quarter(date)
     filename = utils.create_index_filename(date)
@@ -40,10 +44,8 @@ def download_day_form_index(date, output_folder):
     print(url_address)
 
     try:
-        req = request.Request(url_address, headers={'User-Agent': 'Mozilla/5.0'})
-        with request.urlopen(req) as url_in:
-            data = url_in.read()
-    except urllib.error.HTTPError as e:
+        data = await client.get(url_address)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         print('Error while downloading index')
         print(e)
         return None
@@ -58,7 +60,12 @@ def download_day_form_index(date, output_folder):
     return filename
 
 
-def download_span_indices(date_span, output_folder):
+def download_day_form_index(date, output_folder, client=None):
+    loop = asyncio.get_event_loop()
+    return loop.run_until_complete(async_download_day_form_index(date, output_folder, client))
+
+
+async def async_download_span_indices(date_span, output_folder, client=None):
     """
     Donwload indicies for a time span (start_date, end_date] inclusive to `output_folder`.
     :param date_span: tuple of datetime.dates (start_date, end_date)
@@ -69,14 +76,19 @@ def download_span_indices(date_span, output_folder):
     days = find_weekdays(date_span[0], date_span[1])
     inds = []
     for day in days:
-        index = download_day_form_index(day, output_folder)
+        index = await async_download_day_form_index(day, output_folder, client)
         if index:
             inds.append(index)
-        time.sleep(1)
+        await asyncio.sleep(1)
 
     return inds
 
 
+def download_span_indices(date_span, output_folder, client=None):
+    loop = asyncio.get_event_loop()
+    return loop.run_until_complete(async_download_span_indices(date_span, output_folder, client))
+
+
 def find_latest_downloaded_index(data_folder):
     """
     Find latest downloaded index in `data_folder`
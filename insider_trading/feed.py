@@ -0,0 +1,132 @@
+"""
+Offline ingestion of EDGAR daily feed archives (`YYYYMMDD.nc.tar.gz`, every submission disseminated on a day).
+
+Archives are streamed member by member without extracting them to disk. Only the header of each submission is
+read to check its form type, Form 4 / 4/A submissions are parsed with `form_parser` and turned into the same
+rows as `store.generate_csv_row`.
+"""
+from datetime import datetime
+import logging
+from pathlib import Path
+import re
+import tarfile
+
+from insider_trading import form_parser, store, utils
+
+FORM_4_TYPES = ('4', '4/A')
+# Submission type and filing date are in the first lines of the submission header
+HEADER_SIZE = 4096
+# `.nc` feed submissions have SGML tags, `.txt` ones have `KEY: value` header lines
+SUBMISSION_TYPE = re.compile(rb'^(?:<TYPE>|CONFORMED SUBMISSION TYPE:)[ \t]*(\S+)[ \t]*\r?$', re.M)
+FILING_DATE = re.compile(rb'^(?:<FILING-DATE>|FILED AS OF DATE:)[ \t]*(\d{8})[ \t]*\r?$', re.M)
+ARCHIVE_DATE = re.compile(r'(\d{8})\.nc\.tar\.gz$')
+ARCHIVE_PATTERNS = ('*.nc.tar.gz', '*.tar.gz')
+
+LOG = logging.getLogger(__name__)
+
+
+def submission_type(header):
+    """
+    :param header: bytes, beginning of the submission
+    :return: form type or None if it's not found
+    """
+    match = SUBMISSION_TYPE.search(header)
+    if match:
+        return match.group(1).decode('ascii', errors='replace')
+
+
+def filing_date(header):
+    """
+    :param header: bytes, beginning of the submission
+    :return: datetime or None if it's not found
+    """
+    match = FILING_DATE.search(header)
+    if match:
+        return datetime.strptime(match.group(1).decode('ascii'), '%Y%m%d')
+
+
+def archive_date(path):
+    """
+    Dissemination date from the archive name, e.g. `20190913.nc.tar.gz`.
+    """
+    match = ARCHIVE_DATE.search(Path(path).name)
+    if match:
+        return datetime.strptime(match.group(1), '%Y%m%d')
+
+
+def find_archives(paths):
+    """
+    Feed archives from the list of archives and folders, sorted by name.
+    """
+    archives = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            found = set()
+            for pattern in ARCHIVE_PATTERNS:
+                found.update(path.glob(pattern))
+            archives.extend(sorted(found))
+        else:
+            archives.append(path)
+    return archives
+
+
+def generate_submissions(path, forms=FORM_4_TYPES):
+    """
+    Stream submissions of the given form types from the feed archive.
+    Members are read in the archive order, other submissions are skipped after reading their header.
+    :param path: feed archive
+    :param forms: form types to keep
+    :return: generator of tuples (member name, bytes)
+    """
+    with tarfile.open(path, 'r|gz') as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            fin = archive.extractfile(member)
+            header = fin.read(HEADER_SIZE)
+            if submission_type(header) not in forms:
+                continue
+            yield member.name, header + fin.read()
+
+
+def submission_rows(data, date=None):
+    """
+    Database rows of the submission, the same as `store.generate_csv_row` with the report date first.
+    :param data: bytes, raw submission
+    :param date: report date used if the submission has no filing date
+    :return: list of rows, empty if the form is not valid
+    """
+    date = filing_date(data[:HEADER_SIZE]) or date
+    content = form_parser.extract_content(data)
+    if not store.is_valid_content(content):
+        return []
+
+    rows = []
+    for row in store.generate_csv_row([content]):
+        row.insert(0, date.strftime("%Y-%m-%d"))
+        rows.append(row)
+    return rows
+
+
+def ingest_archive(path, forms=FORM_4_TYPES):
+    """
+    Parse all valid forms of the feed archive.
+    Picklable result, so archives can be ingested in a process pool.
+    :param path: feed archive
+    :param forms: form types to keep
+    :return: tuple (list of tuples (accession, rows) in the archive order, number of failed submissions)
+    """
+    date = archive_date(path)
+    results = []
+    failed = 0
+    for name, data in generate_submissions(path, forms):
+        try:
+            rows = submission_rows(data, date)
+        except AttributeError as e:
+            LOG.debug(f'Error parsing {name} from {path}: {e}')
+            failed += 1
+            continue
+        if rows:
+            results.append((utils.parse_accession(name), rows))
+
+    return results, failed
@@ -0,0 +1,174 @@
+"""
+Fast extraction of Form 4 fields from EDGAR submissions.
+
+Only the `<ownershipDocument>` XML is cut out of the `.txt` submission and parsed with the C-accelerated
+ElementTree parser, instead of building a BeautifulSoup tree of the whole file. The produced content dict
+is the same as the one built by `data_parser.Form`.
+"""
+import logging
+from xml.etree import ElementTree
+
+LOG = logging.getLogger(__name__)
+
+DOCUMENT_START = b'<ownershipDocument'
+DOCUMENT_END = b'</ownershipDocument>'
+
+
+def _text(elem):
+    return ''.join(elem.itertext())
+
+
+def _find(elem, tag):
+    """
+    Find first descendant `tag` of `elem`.
+    Raises AttributeError if it's missing, the same way as a bs4 attribute lookup on None does.
+    """
+    found = elem.find('.//' + tag)
+    if found is None:
+        raise AttributeError(f'No {tag} found')
+    return found
+
+
+def _valid_string(elem, tag):
+    found = elem.find('.//' + tag)
+    if found is None:
+        return ''
+    return _text(found).strip()
+
+
+def find_document(data):
+    """
+    Cut `<ownershipDocument>` XML out of the submission.
+    :param data: bytes, raw EDGAR .txt submission
+    :return: bytes or None if there is no ownership document
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    start = data.find(DOCUMENT_START)
+    if start < 0:
+        return None
+    end = data.find(DOCUMENT_END, start)
+    if end < 0:
+        return None
+
+    return data[start:end + len(DOCUMENT_END)]
+
+
+def parse_document(data):
+    """
+    Parse ownership document from the submission.
+    :param data: bytes, raw EDGAR .txt submission
+    :return: ElementTree root element
+    """
+    document = find_document(data)
+    if document is None:
+        raise AttributeError('No ownership document found')
+    try:
+        return ElementTree.fromstring(document)
+    except ElementTree.ParseError:
+        # Documents without XML declaration are parsed as utf-8, retry for legacy encodings
+        try:
+            return ElementTree.fromstring(document.decode('latin-1'))
+        except ElementTree.ParseError as e:
+            raise AttributeError(f'Could not parse ownership document: {e}')
+
+
+def extract_owner_info(root):
+    """
+    Find information related to reporting owner.
+    :param root: ownership document element
+    :return: dict
+    """
+    reporting_owner = _find(root, 'reportingOwner')
+    id = _find(reporting_owner, 'reportingOwnerId')
+    relation = _find(reporting_owner, 'reportingOwnerRelationship')
+
+    return {'cik': _text(_find(id, 'rptOwnerCik')),
+            'name': _text(_find(id, 'rptOwnerName')),
+            'isdirector': _valid_string(relation, 'isDirector'),
+            'isofficer': _valid_string(relation, 'isOfficer'),
+            'istenpercentowner': _valid_string(relation, 'isTenPercentOwner'),
+            'isother': _valid_string(relation, 'isOther'),
+            'officertitle': _valid_string(relation, 'officerTitle')}
+
+
+def extract_transaction_info(root):
+    """
+    Find information from nonDerivativeTransaction.
+    :param root: ownership document element
+    :return: dict of transactions
+    """
+    table = root.find('.//nonDerivativeTable')
+    if table is None:
+        LOG.debug("No non derivative transactions info found.")
+        raise AttributeError("No non derivative transactions info found")
+
+    transactions = {}
+    for ind, transaction in enumerate(table.iter('nonDerivativeTransaction')):
+        trans_amounts = _find(transaction, 'transactionAmounts')
+        post_amounts = _find(transaction, 'postTransactionAmounts')
+        transactions[f"transaction{ind + 1}"] = {
+            'security': _text(_find(transaction, 'securityTitle')).strip(),
+            'date': _text(_find(transaction, 'transactionDate')).strip(),
+            'code': _text(_find(trans_amounts, 'transactionAcquiredDisposedCode')).strip(),
+            'amount': _text(_find(trans_amounts, 'transactionShares')).strip(),
+            'price': _text(_find(trans_amounts, 'transactionPricePerShare')).strip(),
+            'holding_after': _text(_find(post_amounts, 'sharesOwnedFollowingTransaction')).strip()}
+
+    return transactions
+
+
+def extract_issuer_info(root):
+    """
+    Find information about issuer.
+    :param root: ownership document element
+    :return: dict
+    """
+    issuer = _find(root, 'issuer')
+
+    return {'cik': _text(_find(issuer, 'issuerCik')),
+            'company': _text(_find(issuer, 'issuerName')),
+            'ticker': _text(_find(issuer, 'issuerTradingSymbol'))}
+
+
+def extract_holding_info(root):
+    """
+    Find before/after holdings info.
+    :param root: ownership document element
+    :return: dict
+    """
+    holding = _find(root, 'nonDerivativeTable')
+
+    post_amounts = holding.find('.//postTransactionAmounts')
+    holding_before = '' if post_amounts is None else _valid_string(post_amounts, 'sharesOwnedFollowingTransaction')
+
+    ownership = holding.find('.//ownershipNature')
+    if ownership is None:
+        ownership_status, ownership_nature = '', ''
+    else:
+        ownership_status = _valid_string(ownership, 'directOrIndirectOwnership')
+        ownership_nature = _valid_string(ownership, 'natureOfOwnership')
+
+    return {'holding_before': holding_before,
+            'ownership_status': ownership_status,
+            'ownership_nature': ownership_nature}
+
+
+def extract_content(data):
+    """
+    Extract form content from the raw submission.
+    :param data: bytes, raw EDGAR .txt submission
+    :return: dict with "owner", "issuer", "transactions" and "holding" info, same as `Form.get_content()`
+    """
+    root = parse_document(data)
+
+    # Same extraction order as `Form.extract_info`, transactions fail first
+    transactions = extract_transaction_info(root)
+    content = {
+        "owner": extract_owner_info(root),
+        "issuer": extract_issuer_info(root),
+        "transactions": transactions,
+        "holding": extract_holding_info(root)
+    }
+
+    return content
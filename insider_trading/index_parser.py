@@ -0,0 +1,228 @@
+"""
+Bulk parser of EDGAR form index files (daily `form.YYYYMMDD.idx` and quarterly `form.idx`).
+
+Index entries are laid out in fixed width columns:
+    Form Type   Company Name   CIK   Date Filed   File Name
+The column offsets are read from the header line and the whole file is parsed with numpy: entries are
+filtered by form type on the raw bytes and the columns are sliced at their offsets, so no Python objects are
+created for lines of other form types. Entries that don't fit the layout are parsed with a regular expression.
+"""
+from collections import namedtuple
+import logging
+import re
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+FORM_4_TYPES = ('4', '4/A')
+HEADER = re.compile(rb'^Form Type +Company Name +CIK +Date Filed +File Name *\r?$', re.M)
+COLUMNS = (b'Company Name', b'CIK', b'Date Filed', b'File Name')
+# Daily indices have dates formatted as YYYYMMDD, quarterly ones as YYYY-MM-DD
+DATE_WIDTH = 10
+ENTRY = rb'^(%s) +(.*?) +(\d+) +(\d{4})-?(\d{2})-?(\d{2}) +(\S+)\s*$'
+
+SPACE, DASH, NEWLINE, ZERO, NINE = b' -\n09'
+
+LOG = logging.getLogger(__name__)
+
+IndexEntries = namedtuple('IndexEntries', ['form', 'company', 'cik', 'date', 'path'])
+IndexEntries.__doc__ = """
+Index entries in columns: `form`, `company` and `path` are str arrays, `cik` is an int64 array and `date` is
+a datetime64[D] array.
+"""
+
+
+def column_offsets(data):
+    """
+    Offsets of the index columns from the header line.
+    :param data: bytes, index file content
+    :return: tuple of offsets (company, cik, date, path) or None if the header is not found
+    """
+    match = HEADER.search(data)
+    if match is None:
+        return None
+    header = match.group(0)
+    return tuple(header.index(column) for column in COLUMNS)
+
+
+def _line_bounds(buffer):
+    newlines = np.flatnonzero(buffer == NEWLINE)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(buffer)]))
+    return starts, ends
+
+
+def _form_mask(buffer, starts, ends, forms):
+    """
+    Lines starting with one of the `forms` followed by a space, checked column by column.
+    """
+    mask = np.zeros(len(starts), dtype=bool)
+    for form in forms:
+        form = form.encode('ascii') + b' '
+        form_mask = ends - starts >= len(form)
+        for i, char in enumerate(form):
+            index = np.minimum(starts + i, len(buffer) - 1)
+            form_mask &= buffer[index] == char
+        mask |= form_mask
+    return mask
+
+
+def _is_digit(chars):
+    return (chars >= ZERO) & (chars <= NINE)
+
+
+def _to_dates(years, months, days):
+    dates = (years - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (months - 1).astype('timedelta64[M]')
+    return dates.astype('datetime64[D]') + (days - 1).astype('timedelta64[D]')
+
+
+def _number(digits):
+    """
+    Numbers from rows of digits, ignoring non digit values (e.g. padding).
+    """
+    value = np.zeros(len(digits), dtype=np.int64)
+    for i in range(digits.shape[1]):
+        digit = digits[:, i]
+        value = np.where((digit >= 0) & (digit <= 9), value * 10 + digit, value)
+    return value
+
+
+def _parse_dates(chars):
+    """
+    Parse YYYYMMDD or YYYY-MM-DD dates.
+    :param chars: uint8 array (entries, DATE_WIDTH)
+    """
+    digits = chars.astype(np.int64) - ZERO
+    dashed = chars[:, 4] == DASH
+    years = _number(digits[:, :4])
+    months = np.where(dashed, _number(digits[:, 5:7]), _number(digits[:, 4:6]))
+    days = np.where(dashed, _number(digits[:, 8:10]), _number(digits[:, 6:8]))
+    return _to_dates(years, months, days)
+
+
+def _valid_dates(chars):
+    dashed = chars[:, 4] == DASH
+    daily = _is_digit(chars[:, :8]).all(axis=1) & (chars[:, 8:] == SPACE).all(axis=1)
+    quarterly = dashed & (chars[:, 7] == DASH) & _is_digit(chars[:, [0, 1, 2, 3, 5, 6, 8, 9]]).all(axis=1)
+    return daily | quarterly
+
+
+def _strings(chars):
+    """
+    Convert rows of latin-1 chars to a str array, dropping trailing spaces.
+    """
+    width = chars.shape[1]
+    # Code points of latin-1 chars are their byte values, so rows are converted to UCS4 strings by widening.
+    # Trailing spaces are replaced by NUL padding
+    last = np.where(chars != SPACE, np.arange(width), -1).max(axis=1)
+    codes = chars.astype(np.uint32)
+    codes[np.arange(width) > last[:, None]] = 0
+    return codes.view(f'U{width}').ravel()
+
+
+def _parse_fixed_width(buffer, starts, ends, offsets):
+    """
+    Slice index columns of the entries at the header offsets.
+    :return: tuple (`IndexEntries` of the entries fitting the layout, boolean mask of the entries fitting it)
+    """
+    company, cik, date, path = offsets
+    width = int((ends - starts).max())
+    if starts[-1] + width > len(buffer):
+        buffer = np.concatenate((buffer, np.full(width, SPACE, dtype=np.uint8)))
+    rows = sliding_window_view(buffer, width)[starts]
+    lengths = ends - starts
+
+    cik_chars = rows[:, cik:date]
+    cik_digits = _is_digit(cik_chars)
+    valid = ((lengths > path) & (rows[:, cik - 1] == SPACE) & cik_digits[:, 0] &
+             (cik_digits | (cik_chars == SPACE)).all(axis=1) &
+             _valid_dates(rows[:, date:date + DATE_WIDTH]) & (rows[:, date + DATE_WIDTH:path] == SPACE).all(axis=1))
+    rows = rows[valid]
+    lengths = lengths[valid]
+
+    path_chars = rows[:, path:].copy()
+    path_chars[np.arange(width - path) >= (lengths - path)[:, None]] = SPACE
+    entries = IndexEntries(form=_strings(rows[:, :company]),
+                           company=_strings(rows[:, company:cik]),
+                           cik=_number(cik_chars[valid].astype(np.int64) - ZERO),
+                           date=_parse_dates(rows[:, date:date + DATE_WIDTH]),
+                           path=_strings(path_chars))
+    return entries, valid
+
+
+def _parse_lines(lines, forms):
+    """
+    Parse whitespace separated index entries.
+    :param lines: list of bytes
+    :param forms: form types of the entries
+    :return: tuple (`IndexEntries` of the parsed entries, boolean mask of the parsed lines)
+    """
+    pattern = re.compile(ENTRY % b'|'.join(re.escape(form.encode('ascii'))
+                                           for form in sorted(forms, key=len, reverse=True)))
+    matches = [pattern.match(line) for line in lines]
+    parsed = np.array([match is not None for match in matches], dtype=bool)
+    matches = [match.groups() for match in matches if match is not None]
+    if not matches:
+        return empty(), parsed
+    form, company, cik, years, months, days, path = zip(*matches)
+    entries = IndexEntries(form=np.array([f.decode('ascii') for f in form], dtype=str),
+                           company=np.array([c.decode('latin-1') for c in company], dtype=str),
+                           cik=np.array(cik, dtype=np.int64),
+                           date=_to_dates(np.array(years, dtype=np.int64), np.array(months, dtype=np.int64),
+                                          np.array(days, dtype=np.int64)),
+                           path=np.array([p.decode('ascii') for p in path], dtype=str))
+    return entries, parsed
+
+
+def empty():
+    return IndexEntries(np.array([], dtype=str), np.array([], dtype=str), np.array([], dtype=np.int64),
+                        np.array([], dtype='datetime64[D]'), np.array([], dtype=str))
+
+
+def concatenate(entries):
+    """
+    Concatenate `IndexEntries` column by column.
+    """
+    entries = [e for e in entries if len(e.path)]
+    if not entries:
+        return empty()
+    return IndexEntries(*[np.concatenate(column) for column in zip(*entries)])
+
+
+def parse(data, forms=FORM_4_TYPES):
+    """
+    Parse entries of the given form types from the index file.
+    :param data: bytes, index file content
+    :param forms: form types to keep
+    :return: `IndexEntries`, in the order of the index file
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if not len(buffer):
+        return empty()
+    starts, ends = _line_bounds(buffer)
+    selected = _form_mask(buffer, starts, ends, forms)
+    starts = starts[selected]
+    ends = ends[selected]
+    # Drop carriage returns of CRLF line endings
+    ends = ends - (buffer[np.maximum(ends - 1, 0)] == ord('\r'))
+    if not len(starts):
+        return empty()
+
+    offsets = column_offsets(data)
+    if offsets is None:
+        LOG.debug('Index header not found, parsing whitespace separated columns')
+        entries, _ = _parse_lines([data[start:end] for start, end in zip(starts, ends)], forms)
+        return entries
+
+    entries, valid = _parse_fixed_width(buffer, starts, ends, offsets)
+    if valid.all():
+        return entries
+
+    # Entries overflowing their columns are parsed separately and merged back in the file order
+    invalid = np.flatnonzero(~valid)
+    LOG.debug(f'{len(invalid)} index entries do not fit the column layout')
+    others, parsed = _parse_lines([data[starts[i]:ends[i]] for i in invalid], forms)
+    order = np.argsort(np.concatenate((np.flatnonzero(valid), invalid[parsed])))
+    merged = concatenate([entries, others])
+    return IndexEntries(*[column[order] for column in merged])
@@ -0,0 +1,217 @@
+"""
+Durable manifests stored in local SQLite files.
+
+`Manifest` keeps per-day and per-accession status (pending / done / failed / skipped) of long backfills, so an
+interrupted or partially failed run can be resumed fetching only what is missing.
+
+`TickerManifest` keeps market data freshness per ticker (last market date, last refresh date, number of rows,
+status), so tickers to update are selected without opening their market data files. It also keeps the download
+backlog carried across runs and the number of API requests made per day.
+"""
+import logging
+import sqlite3
+import time
+
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+STATUSES = [PENDING, DONE, FAILED, SKIPPED]
+# Statuses that don't need to be processed again
+FINISHED = (DONE, SKIPPED)
+FINISHED_PLACEHOLDERS = ', '.join('?' for _ in FINISHED)
+
+DATE_FORMAT = '%Y-%m-%d'
+
+LOG = logging.getLogger(__name__)
+
+
+class Manifest:
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS days '
+                               '(date TEXT PRIMARY KEY, status TEXT, forms INTEGER, updated REAL)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS forms '
+                               '(accession TEXT PRIMARY KEY, date TEXT, status TEXT, error TEXT, updated REAL)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS forms_date ON forms (date)')
+
+    def __repr__(self):
+        return f"Manifest {self.path}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def mark_day(self, date, status, forms=None):
+        """
+        :param date: datetime
+        :param status: one of `STATUSES`
+        :param forms: number of valid forms of the day
+        """
+        with self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO days VALUES (?, ?, ?, ?)',
+                               (date.strftime(DATE_FORMAT), status, forms, time.time()))
+
+    def mark_forms(self, date, accessions, status, error=None):
+        """
+        :param date: datetime, report date
+        :param accessions: list of accession numbers
+        :param status: one of `STATUSES`
+        :param error: error message for failed forms
+        """
+        stamp = time.time()
+        with self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO forms VALUES (?, ?, ?, ?, ?)',
+                                   [(accession, date.strftime(DATE_FORMAT), status, error, stamp)
+                                    for accession in accessions])
+
+    def finished_days(self):
+        """
+        :return: set of dates (strings) that don't need to be processed again
+        """
+        rows = self._conn.execute(f'SELECT date FROM days WHERE status IN ({FINISHED_PLACEHOLDERS})', FINISHED)
+        return set(row[0] for row in rows)
+
+    def pending_days(self, days):
+        """
+        Filter out days that don't need to be processed again.
+        :param days: list of datetime
+        :return: list of datetime
+        """
+        finished = self.finished_days()
+        return [day for day in days if day.strftime(DATE_FORMAT) not in finished]
+
+    def finished_forms(self, date):
+        """
+        :param date: datetime
+        :return: set of accession numbers of the day that don't need to be processed again
+        """
+        rows = self._conn.execute(f'SELECT accession FROM forms WHERE date = ? AND status IN ({FINISHED_PLACEHOLDERS})',
+                                  (date.strftime(DATE_FORMAT), *FINISHED))
+        return set(row[0] for row in rows)
+
+    def count_failed(self, date):
+        row = self._conn.execute('SELECT COUNT(*) FROM forms WHERE date = ? AND status = ?',
+                                 (date.strftime(DATE_FORMAT), FAILED)).fetchone()
+        return row[0]
+
+    def summary(self):
+        """
+        :return: dict with days and forms counts per status and the list of days with failures
+        """
+        days = dict(self._conn.execute('SELECT status, COUNT(*) FROM days GROUP BY status'))
+        forms = dict(self._conn.execute('SELECT status, COUNT(*) FROM forms GROUP BY status'))
+        failed_days = [row[0] for row in
+                       self._conn.execute('SELECT date FROM days WHERE status = ? ORDER BY date', (FAILED,))]
+        return {'days': {status: days.get(status, 0) for status in STATUSES},
+                'forms': {status: forms.get(status, 0) for status in STATUSES},
+                'failed_days': failed_days}
+
+
+class TickerManifest:
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS tickers '
+                               '(ticker TEXT PRIMARY KEY, last_date TEXT, last_refreshed TEXT, rows INTEGER, '
+                               'status TEXT, updated REAL)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS backlog '
+                               '(ticker TEXT PRIMARY KEY, queued TEXT, failures INTEGER)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS requests (date TEXT PRIMARY KEY, count INTEGER)')
+
+    def __repr__(self):
+        return f"TickerManifest {self.path}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def mark_tickers(self, entries, status=DONE):
+        """
+        :param entries: list of tuples (ticker, last market date, last refresh date, number of rows), dates
+                        formatted as "%Y-%m-%d", last market date is None if there is no data
+        :param status: one of `STATUSES`
+        """
+        stamp = time.time()
+        with self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO tickers VALUES (?, ?, ?, ?, ?, ?)',
+                                   [entry + (status, stamp) for entry in entries])
+
+    def mark_failed(self, tickers):
+        """
+        Mark tickers which could not be downloaded, their last dates are kept.
+        """
+        stamp = time.time()
+        with self._conn:
+            self._conn.executemany('INSERT INTO tickers (ticker, rows, status, updated) VALUES (?, 0, ?, ?) '
+                                   'ON CONFLICT (ticker) DO UPDATE SET status = excluded.status, '
+                                   'updated = excluded.updated',
+                                   [(ticker, FAILED, stamp) for ticker in tickers])
+
+    def entries(self):
+        """
+        :return: dict ticker -> tuple (last market date, last refresh date, number of rows, status)
+        """
+        rows = self._conn.execute('SELECT ticker, last_date, last_refreshed, rows, status FROM tickers')
+        return {row[0]: row[1:] for row in rows}
+
+    def backlog(self):
+        """
+        :return: dict ticker -> tuple (date queued formatted as "%Y-%m-%d", number of failed downloads)
+        """
+        rows = self._conn.execute('SELECT ticker, queued, failures FROM backlog')
+        return {row[0]: row[1:] for row in rows}
+
+    def update_backlog(self, tickers, date, done=(), failed=()):
+        """
+        Replace the backlog with tickers still to download. Tickers already waiting keep their queue date.
+        :param tickers: list of tickers that need to be downloaded
+        :param date: datetime, queue date of new tickers
+        :param done: tickers downloaded since, removed from the backlog
+        :param failed: tickers which could not be downloaded, their failures count is incremented
+        """
+        backlog = self.backlog()
+        done, failed = set(done), set(failed)
+        rows = []
+        for ticker in tickers:
+            if ticker in done:
+                continue
+            queued, failures = backlog.get(ticker, (date.strftime(DATE_FORMAT), 0))
+            rows.append((ticker, queued, failures + (ticker in failed)))
+        with self._conn:
+            self._conn.execute('DELETE FROM backlog')
+            self._conn.executemany('INSERT INTO backlog VALUES (?, ?, ?)', rows)
+
+    def add_requests(self, date, count):
+        """
+        :param date: datetime
+        :param count: number of API requests made
+        """
+        with self._conn:
+            self._conn.execute('INSERT INTO requests VALUES (?, ?) '
+                               'ON CONFLICT (date) DO UPDATE SET count = count + excluded.count',
+                               (date.strftime(DATE_FORMAT), count))
+
+    def count_requests(self, date):
+        row = self._conn.execute('SELECT count FROM requests WHERE date = ?', (date.strftime(DATE_FORMAT),)).fetchone()
+        return row[0] if row else 0
@@ -1,38 +1,41 @@
-import requests
 import json
 import os
 import logging
 
 import asyncio, aiohttp
-from asyncio import Semaphore
 import urllib
 
+from insider_trading.client import get_client
+from insider_trading.metrics import get_metrics
+from insider_trading.rate import RateGovernor, TokenBucket, AdaptiveConcurrency
+
 BASE_URL = "https://www.alphavantage.co"
 ENDPOINT = "/query"
 
 API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY", "")
-RATE_LIMIT_WAIT = 30
-MAX_REQUESTS_PER_SEC = 0.05
+MAX_REQUESTS_PER_MIN = int(os.getenv("ALPHA_VANTAGE_REQUESTS_PER_MIN", 5))
+MAX_REQUESTS_PER_DAY = int(os.getenv("ALPHA_VANTAGE_REQUESTS_PER_DAY", 500))
+MAX_RETRIES = 3
+# Functions returning only the latest 100 bars with `outputsize=compact`
+COMPACT_FUNCTIONS = ['TIME_SERIES_DAILY', 'TIME_SERIES_DAILY_ADJUSTED']
 
 LOG = logging.getLogger(__name__)
 
 
 class API:
 
-    def __init__(self, function, outputsize=None):
+    def __init__(self, function, outputsize=None, client=None):
         self.url = urllib.parse.urljoin(BASE_URL, ENDPOINT)
-        self.limit_wait = RATE_LIMIT_WAIT
+        self.client = client or get_client()
+        self.governor = create_governor()
         self.function = function
         self.outputsize = outputsize
         self.API_KEY = API_KEY
 
-    async def _async_request(self, params):
+    async def _async_request(self, params, limiter):
         try:
-            await asyncio.sleep(self.limit_wait)
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.url, params=params) as url:
-                    data = await url.read()
-                    data = json.loads(data)
+            data = await self.client.get(self.url, params=params, governor=limiter)
+            data = json.loads(data)
         except json.decoder.JSONDecodeError as e:
             LOG.exception(f'JSON decoding error while downloading {params["symbol"]} data: {e}')
             return None
@@ -43,42 +46,77 @@ class API:
         return data
 
     async def request(self, parameters, limiter):
-        async with limiter:
-            data = await self._async_request(parameters)
+        for attempt in range(MAX_RETRIES + 1):
+            data = await self._async_request(parameters, limiter)
+            # AlphaVantage reports exceeded call frequency with a `Note` in a regular response
+            if data is None or not data.get('Note') or attempt == MAX_RETRIES:
+                break
+            LOG.debug(f'Throttled while downloading {parameters["symbol"]} data: {data.get("Note")}')
+            limiter.backoff()
+            get_metrics().inc('market_retries')
 
         return data
 
-    async def get_symbol_info(self, symbol, limiter, rejected):
+    @property
+    def supports_compact(self):
+        return self.function in COMPACT_FUNCTIONS
+
+    async def get_symbol_info(self, symbol, limiter, rejected, outputsize=None):
         parameters = {"function": self.function,
                       "symbol": symbol,
                       "apikey": self.API_KEY}
-        if self.outputsize:
-            parameters.update({'outputsize': self.outputsize})
-        info = await self.request(parameters, limiter)
+        outputsize = outputsize or self.outputsize
+        if outputsize:
+            parameters.update({'outputsize': outputsize})
+        metrics = get_metrics()
+        with metrics.timer('stage', stage='market_fetch'):
+            info = await self.request(parameters, limiter)
+        metrics.progress('tickers', unit='ticker').update()
         if info is None:
             LOG.warning(f'Error while downloading {symbol} data')
+            metrics.inc('tickers', status='error')
+            return None
+        if info.get('Note'):
+            LOG.warning(f'Rate limit exceeded while downloading {symbol} data')
+            metrics.inc('tickers', status='throttled')
             return None
         if info.get('Error Message'):
             LOG.warning(f'Error while downloading {symbol} data: {info.get("Error Message")}')
+            metrics.inc('tickers', status='rejected')
             rejected.add(symbol)
             return None
 
         LOG.info(f'Got {symbol} market data.')
+        metrics.inc('tickers', status='done')
         return info
 
-    def get_symbols_data(self, symbols, rejected=set()):
+    def get_symbols_data(self, symbols, rejected=set(), outputsize=None):
+        """
+        :param outputsize: `compact` or `full`, overrides the API output size for these symbols
+        """
+
+        progress = get_metrics().progress('tickers', unit='ticker')
+        progress.total = (progress.total or 0) + len(symbols)
 
         async def get_contents(symbols, limiter):
-            coros = [self.get_symbol_info(sym, limiter, rejected) for sym in symbols]
+            coros = [self.get_symbol_info(sym, limiter, rejected, outputsize) for sym in symbols]
             contents = await asyncio.gather(*coros)
             valid_contents = [c for c in contents if c]  # Filter only valid data
 
             return valid_contents
 
         loop = asyncio.get_event_loop()
-        limiter = Semaphore(MAX_REQUESTS_PER_SEC, loop=loop)
-
-        symbols_data = loop.run_until_complete(get_contents(symbols, limiter))
+        symbols_data = loop.run_until_complete(get_contents(symbols, self.governor))
+        LOG.info(f"Rate stats: {self.governor.stats()}")
 
         return symbols_data, rejected
 
+
+def create_governor():
+    """
+    Rate governor for AlphaVantage requests: per-minute and per-day quotas.
+    """
+    buckets = [TokenBucket(MAX_REQUESTS_PER_MIN, per=60.),
+               TokenBucket(MAX_REQUESTS_PER_DAY, per=24 * 60 * 60.)]
+    return RateGovernor(buckets, AdaptiveConcurrency(initial=1, maximum=MAX_REQUESTS_PER_MIN), name='alphavantage')
+
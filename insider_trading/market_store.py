@@ -0,0 +1,241 @@
+"""
+Columnar store of market data: one uncompressed `<TICKER>.npz` file per ticker.
+
+AlphaVantage payloads are converted once, when they are downloaded, to typed columns sorted by date:
+`date` as datetime64[D] and prices and volumes as float64. Loading a ticker is then a few array reads instead
+of parsing JSON and dates row by row.
+
+Every write also records the ticker last dates in the folder `manifest.TickerManifest`.
+"""
+import io
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from insider_trading import manifest
+from insider_trading.config import DATE, OPEN, CLOSE, HIGH, LOW, VOLUME, ADJUSTED_CLOSE, DIVIDEND_AMOUNT, TICKER
+
+SUFFIX = '.npz'
+JSON_SUFFIX = '.json'
+MANIFEST = 'manifest.sqlite'
+# Metadata keys
+SYMBOL = 'symbol'
+LAST_REFRESHED = 'last_refreshed'
+DATE_FORMAT = '%Y-%m-%d'
+# Data frame columns order, other columns of the payload follow
+COLUMNS = [DATE, OPEN, CLOSE, HIGH, LOW, VOLUME, ADJUSTED_CLOSE, DIVIDEND_AMOUNT]
+
+LOG = logging.getLogger(__name__)
+
+
+def ticker_path(root, symbol):
+    return Path(root) / (symbol + SUFFIX)
+
+
+def exists(root, symbol):
+    return ticker_path(root, symbol).exists()
+
+
+def manifest_path(root):
+    return Path(root) / MANIFEST
+
+
+def manifest_entry(columns, meta):
+    """
+    :return: tuple (symbol, last market date, last refresh date, number of rows), see `manifest.TickerManifest`
+    """
+    dates = columns[DATE]
+    return meta[SYMBOL], str(dates[-1]) if len(dates) else None, meta[LAST_REFRESHED], len(dates)
+
+
+def read_manifest_entry(root, symbol):
+    """
+    Manifest entry of the ticker from its data file, `.npz` or AlphaVantage `.json`.
+    Last dates of a file with invalid format are None.
+    :return: tuple, see `manifest_entry`, None if there is no data file
+    """
+    json_path = Path(root) / (symbol + JSON_SUFFIX)
+    try:
+        if exists(root, symbol):
+            columns, meta = load(root, symbol)
+        elif json_path.exists():
+            with open(json_path, 'r') as fin:
+                columns, meta = from_payload(json.load(fin))
+        else:
+            return None
+    except (KeyError, ValueError) as e:
+        LOG.warning(f'Market data of {symbol} has invalid format: {e}')
+        return symbol, None, None, 0
+    meta[SYMBOL] = symbol
+    return manifest_entry(columns, meta)
+
+
+def series_key(payload):
+    """
+    Time series key of the AlphaVantage payload, e.g. `Weekly Adjusted Time Series`.
+    """
+    for key in payload:
+        if 'Time Series' in key:
+            return key
+    raise KeyError('No time series in the payload')
+
+
+def from_payload(payload):
+    """
+    Convert AlphaVantage payload to columns.
+    :param payload: dict, AlphaVantage time series response
+    :return: tuple (dict of columns sorted by date, dict of metadata)
+    """
+    series = payload[series_key(payload)]
+    meta = {SYMBOL: payload['Meta Data']['2. Symbol'],
+            LAST_REFRESHED: payload['Meta Data']['3. Last Refreshed']}
+    if not series:
+        return {DATE: np.array([], dtype='datetime64[D]')}, meta
+
+    # Payload keys are numbered, e.g. `5. adjusted close`
+    items = list(next(iter(series.values())))
+    dates = np.array(list(series), dtype='datetime64[D]')
+    values = np.array([[values[item] for item in items] for values in series.values()], dtype=np.float64)
+
+    order = np.argsort(dates, kind='stable')
+    columns = {DATE: dates[order]}
+    for i, item in enumerate(items):
+        columns[item[3:]] = values[order, i]
+    return columns, meta
+
+
+def write(root, columns, meta):
+    """
+    Atomically save ticker columns, readers never see a partially written file.
+    :param root: market data folder
+    :param columns: dict of arrays
+    :param meta: dict with the ticker symbol and last refresh date
+    """
+    path = ticker_path(root, meta[SYMBOL])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    names = [name for name in columns if name != DATE]
+    # Float columns are kept in one block, a few large reads are faster than many small ones
+    values = np.stack([columns[name] for name in names], axis=1) if names else np.empty((0, 0))
+    buffer = io.BytesIO()
+    np.savez(buffer, date=columns[DATE], values=values, names=np.array(names, dtype=str),
+             meta=np.array(json.dumps(meta)))
+    tmp_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as fout:
+        fout.write(buffer.getbuffer())
+    os.replace(tmp_path, path)
+
+    with manifest.TickerManifest(manifest_path(root)) as tickers:
+        tickers.mark_tickers([manifest_entry(columns, meta)])
+    return path
+
+
+def write_payload(root, payload):
+    """
+    Convert AlphaVantage payload and save it.
+    :return: path of the saved file
+    """
+    columns, meta = from_payload(payload)
+    return write(root, columns, meta)
+
+
+def merge_columns(columns, update):
+    """
+    Merge recent bars into stored columns, bars of the update replace stored bars from its first date on.
+    Stored bars on the overlap must match the update, except the last one which may be a partial period. A mismatch
+    means that the adjusted history was revised (split, dividend), and the update can't be merged.
+    :param columns: stored columns, see `load`
+    :param update: columns of recent bars, see `from_payload`
+    :return: merged columns, None if the full history has to be downloaded again
+    """
+    dates, new_dates = columns[DATE], update[DATE]
+    if not len(dates):
+        return update
+    # The update must reach the stored data, otherwise bars in between are missing
+    if not len(new_dates) or new_dates[0] > dates[-1] or set(columns) != set(update):
+        return None
+
+    start = np.searchsorted(dates, new_dates[0])
+    overlap = dates[start:-1]
+    positions = np.searchsorted(new_dates, overlap)
+    if np.any(positions >= len(new_dates)) or np.any(new_dates[positions] != overlap):
+        return None
+    for name in columns:
+        if name != DATE and not np.array_equal(columns[name][start:-1], update[name][positions], equal_nan=True):
+            return None
+
+    return {name: np.concatenate([columns[name][:start], update[name]]) for name in columns}
+
+
+def merge_payload(root, payload):
+    """
+    Merge AlphaVantage payload of recent bars (e.g. `outputsize=compact`) into the stored ticker.
+    :return: path of the saved file, None if the ticker isn't stored or the full history has to be downloaded again,
+             see `merge_columns`
+    """
+    update, meta = from_payload(payload)
+    if not exists(root, meta[SYMBOL]):
+        return None
+    columns, _ = load(root, meta[SYMBOL])
+    merged = merge_columns(columns, update)
+    if merged is None:
+        return None
+    return write(root, merged, meta)
+
+
+def load(root, symbol):
+    """
+    Load ticker columns.
+    :return: tuple (dict of arrays, dict of metadata)
+    """
+    with np.load(ticker_path(root, symbol)) as data:
+        columns = {DATE: data['date']}
+        values = data['values']
+        for i, name in enumerate(data['names']):
+            columns[str(name)] = values[:, i]
+        meta = json.loads(str(data['meta']))
+    return columns, meta
+
+
+def load_frame(root, symbol):
+    """
+    Load ticker market data as a data frame sorted by date, with a `TICKER` column.
+    """
+    columns, _ = load(root, symbol)
+    order = [c for c in COLUMNS if c in columns] + [c for c in columns if c not in COLUMNS]
+    df = pd.DataFrame({c: columns[c] for c in order})
+    df[DATE] = df[DATE].astype('datetime64[ns]')
+    df[TICKER] = symbol
+    return df
+
+
+def last_dates(root, symbol):
+    """
+    :return: tuple (last refresh date, last market date) formatted as "%Y-%m-%d", last market date is None
+             if there is no data
+    """
+    columns, meta = load(root, symbol)
+    last_date = str(columns[DATE][-1]) if len(columns[DATE]) else None
+    return meta[LAST_REFRESHED], last_date
+
+
+def migrate_json(path, remove=False):
+    """
+    Convert AlphaVantage `<TICKER>.json` file to the store next to it.
+    :param path: json file
+    :param remove: remove json file after conversion
+    :return: path of the saved file
+    """
+    path = Path(path)
+    with open(path, 'r') as fin:
+        payload = json.load(fin)
+    columns, meta = from_payload(payload)
+    # File name is the ticker used to look up the data
+    meta[SYMBOL] = path.stem
+    saved = write(path.parent, columns, meta)
+    if remove:
+        path.unlink()
+    return saved
@@ -0,0 +1,289 @@
+"""
+Run metrics: counters, timers and gauges recorded by pipeline stages, and the run report written at the end of a
+`bin/*` invocation.
+
+Metrics have a name and optional labels, e.g. `forms{status=done}`:
+    counters  running totals (requests, bytes, rows, retries, rejects by reason)
+    timers    count, total and max seconds of a stage (index fetch, form fetch, parse, write, rate limit waits)
+    gauges    last and max value (queue depths, requests in flight)
+
+The report is saved as JSON and as a Prometheus textfile (node_exporter textfile collector format), metric names
+are prefixed with `PROMETHEUS_PREFIX`. Live progress bars with throughput and ETA need the `tqdm` package.
+
+Usage:
+    metrics = get_metrics()
+    metrics.inc('forms', status='done')
+    with metrics.timer('stage', stage='parse'):
+        ...
+    metrics.write_report('run.json', command='update-database')
+"""
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import threading
+import time
+
+
+PROMETHEUS_SUFFIX = '.prom'
+PROMETHEUS_PREFIX = 'insider_trading_'
+
+LOG = logging.getLogger(__name__)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _label_string(labels):
+    return ','.join(f'{label}={value}' for label, value in labels)
+
+
+def _prometheus_name(name):
+    return PROMETHEUS_PREFIX + re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def _prometheus_labels(labels, extra=()):
+    labels = list(labels) + list(extra)
+    if not labels:
+        return ''
+    escaped = [(label, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+               for label, value in labels]
+    return '{' + ','.join(f'{label}="{value}"' for label, value in escaped) + '}'
+
+
+class Metrics:
+
+    def __init__(self, progress=False):
+        """
+        :param progress: show live progress bars, see `progress`
+        """
+        self.show_progress = progress
+        self.started = time.time()
+        self.counters = {}
+        # (count, total seconds, max seconds)
+        self.timers = {}
+        # (last value, max value)
+        self.gauges = {}
+        self._bars = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Metrics ({len(self.counters)} counters, {len(self.timers)} timers, {len(self.gauges)} gauges)"
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            count, total, maximum = self.timers.get(key, (0, 0., 0.))
+            self.timers[key] = (count + 1, total + seconds, max(maximum, seconds))
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Time the block, the time is recorded when the block raises as well.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def gauge(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            maximum = self.gauges[key][1] if key in self.gauges else value
+            self.gauges[key] = (value, max(maximum, value))
+
+    def progress(self, name, total=0, unit='it'):
+        """
+        Progress bar shared by all stages reporting progress under `name`, grow its `total` when more work is
+        known. Without `show_progress` or `tqdm` the bar is disabled, updating it costs nothing.
+        :return: `tqdm.tqdm` or a disabled bar with the same `total`, `update` and `close`
+        """
+        if name not in self._bars:
+            self._bars[name] = _progress_bar(name, total, unit, self.show_progress)
+        return self._bars[name]
+
+    def close(self):
+        for bar in self._bars.values():
+            bar.close()
+        self._bars = {}
+
+    def report(self, **info):
+        """
+        :param info: run information to add to the report, e.g. command and arguments
+        :return: dict, metrics values by name and labels formatted as `label=value,...`
+        """
+        finished = time.time()
+        counters, timers, gauges = {}, {}, {}
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                counters.setdefault(name, {})[_label_string(labels)] = value
+            for (name, labels), (count, total, maximum) in sorted(self.timers.items()):
+                timers.setdefault(name, {})[_label_string(labels)] = {'count': count, 'seconds': total,
+                                                                      'max_seconds': maximum}
+            for (name, labels), (value, maximum) in sorted(self.gauges.items()):
+                gauges.setdefault(name, {})[_label_string(labels)] = {'value': value, 'max': maximum}
+        return {**info,
+                'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+                'finished': datetime.fromtimestamp(finished).isoformat(timespec='seconds'),
+                'seconds': finished - self.started,
+                'counters': counters,
+                'timers': timers,
+                'gauges': gauges}
+
+    def prometheus(self, **info):
+        """
+        :param info: labels of the run added to every sample, e.g. command
+        :return: string, metrics in Prometheus text exposition format
+        """
+        run_labels = sorted(info.items())
+        lines = []
+
+        def add(name, kind, samples):
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(f'{name}{labels} {value}' for labels, value in samples)
+
+        with self._lock:
+            by_name = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                by_name.setdefault(name, []).append((_prometheus_labels(labels, run_labels), value))
+            for name, samples in by_name.items():
+                add(_prometheus_name(name) + '_total', 'counter', samples)
+
+            by_name = {}
+            for (name, labels), timer in sorted(self.timers.items()):
+                by_name.setdefault(name, []).append((_prometheus_labels(labels, run_labels), timer))
+            for name, samples in by_name.items():
+                metric = _prometheus_name(name) + '_seconds'
+                lines.append(f'# TYPE {metric} summary')
+                for labels, (count, total, _) in samples:
+                    lines.append(f'{metric}_sum{labels} {total}')
+                    lines.append(f'{metric}_count{labels} {count}')
+                add(metric + '_max', 'gauge', [(labels, timer[2]) for labels, timer in samples])
+
+            by_name = {}
+            for (name, labels), gauge in sorted(self.gauges.items()):
+                by_name.setdefault(name, []).append((_prometheus_labels(labels, run_labels), gauge))
+            for name, samples in by_name.items():
+                add(_prometheus_name(name), 'gauge', [(labels, gauge[0]) for labels, gauge in samples])
+                add(_prometheus_name(name) + '_max', 'gauge', [(labels, gauge[1]) for labels, gauge in samples])
+
+        labels = _prometheus_labels(run_labels)
+        add(_prometheus_name('run_duration_seconds'), 'gauge', [(labels, time.time() - self.started)])
+        add(_prometheus_name('run_finished_timestamp_seconds'), 'gauge', [(labels, time.time())])
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """
+        :return: list of lines with stage timings and counters, for the log
+        """
+        lines = [f'{name}{{{_label_string(labels)}}}: {count} in {total:.2f} s (max {maximum:.2f} s)'
+                 for (name, labels), (count, total, maximum) in sorted(self.timers.items())]
+        lines += [f'{name}{{{_label_string(labels)}}}: {value}'
+                  for (name, labels), value in sorted(self.counters.items())]
+        return lines
+
+    def write_report(self, path, command=None):
+        """
+        Atomically save the run report as JSON to `path` and as Prometheus textfile next to it
+        (`<path stem>.prom`).
+        :param command: name of the command that ran, added to the report and as a Prometheus label
+        :return: tuple (JSON path, Prometheus textfile path)
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        info = {'command': command} if command else {}
+        prometheus_path = path.with_suffix(PROMETHEUS_SUFFIX)
+        report = self.report(**info)
+        _write_atomic(path, json.dumps(report, indent=2))
+        _write_atomic(prometheus_path, self.prometheus(**info))
+        return path, prometheus_path
+
+
+def _write_atomic(path, text):
+    tmp_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as fout:
+        fout.write(text)
+    os.replace(tmp_path, path)
+
+
+class _NullProgress:
+    """
+    Disabled progress bar, when `tqdm` isn't installed.
+    """
+
+    def __init__(self, total=0):
+        self.total = total
+        self.n = 0
+
+    def update(self, n=1):
+        self.n += n
+
+    def refresh(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _progress_bar(name, total, unit, enabled):
+    try:
+        from tqdm import tqdm
+    except ImportError:
+        if enabled:
+            LOG.warning('Install tqdm to show progress')
+        return _NullProgress(total)
+    return tqdm(total=total or None, desc=name, unit=unit, disable=not enabled, dynamic_ncols=True)
+
+
+_METRICS = None
+
+
+def get_metrics():
+    """
+    Get process-wide metrics.
+    """
+    global _METRICS
+    if _METRICS is None:
+        _METRICS = Metrics()
+    return _METRICS
+
+
+def configure_metrics(**kwargs):
+    """
+    Replace process-wide metrics with new ones created with `kwargs`.
+    """
+    global _METRICS
+    _METRICS = Metrics(**kwargs)
+    return _METRICS
+
+
+def add_arguments(parser):
+    """
+    Add run report and progress options to a `bin/*` argument parser.
+    """
+    parser.add_argument('--metrics', type=Path, default=None,
+                        help='JSON file to save the run report to, a Prometheus textfile with the same metrics is '
+                             'saved next to it (.prom). DEFAULT: no report')
+    parser.add_argument('--progress', action='store_true', help='Show live progress with throughput and ETA')
+
+
+def finish(metrics, path=None, command=None):
+    """
+    Close progress bars, log the metrics summary and save the run report if `path` is given.
+    """
+    metrics.close()
+    for line in metrics.summary():
+        LOG.info(line)
+    if path is not None:
+        json_path, prometheus_path = metrics.write_report(path, command)
+        LOG.info(f'Saved run report to {json_path} and {prometheus_path}')
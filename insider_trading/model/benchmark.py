@@ -7,48 +7,55 @@ from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 
-from insider_trading.preprocess import feature_engineering as feat_eng
+from insider_trading.database import filings
+from insider_trading.preprocess import pipeline
 from insider_trading.config import *
 
 
-def prepare_data(data_path):
+def prepare_data(data_path, columns=None, start=None, end=None, panel=None):
     """
     Load the data and perform basic preprocessing.
-    :param data_path: path to the merged data csv file.
+    :param data_path: path to the merged data csv or parquet file.
+    :param columns: columns to load, all if None.
+    :param start: first report date to load, inclusive.
+    :param end: last report date to load, inclusive.
+    :param panel: `price_panel.PricePanel` to look up shifted prices in, dataframe itself if None.
     :return: prepared daataframe.
     """
     # Load data
-    df = pd.read_csv(data_path)
+    df = filings.read_filings(data_path, columns=columns, start=start, end=end)
 
-    # Apply shifts
     ma_cols = df.filter(regex=f'{ADJUSTED_CLOSE}_ma_\d').columns.to_list()
-    df = feat_eng.add_shifted(df, cols=[ADJUSTED_CLOSE, *ma_cols,
-                              SPX_ADJUSTED_CLOSE, f'{SPX_ADJUSTED_CLOSE}_ma_4'], dt_days=180)
+    return prepare_pipeline(ma_cols, panel).run(df)
 
-    # Compute relative gains
-    ma_ = ma_cols[0]
-    df = feat_eng.add_gains(df, new_col=f'{ma_}_180', ref_col=ma_,
-                            new_col_name=f'change_{ma_}')
-    df = feat_eng.add_gains(df, new_col=f'{SPX_ADJUSTED_CLOSE}_ma_4_180', ref_col=f'{SPX_ADJUSTED_CLOSE}_ma_4',
-                            new_col_name=f'change_{SPX_ADJUSTED_CLOSE}_ma_4')
-
-    # SPX benchmark gains
-    df[SPX_GAIN] = df[f'change_{ma_},%'] - df[f'change_{SPX_ADJUSTED_CLOSE}_ma_4,%']
-
-    # Clean and Validate
-    df = feat_eng.drop_zeros(df)
-    df = feat_eng.process_ppu_outliers(df)
-    df = feat_eng.validate_ppu_to_market(df)
-
-    # Compute relative holdings change
-    df = feat_eng.add_holding_change_perc(df, new_col=HOLDING_CHANGE, cap=True)
 
-    # Handle booleans
-    df = feat_eng.process_booleans(df)
-    df = feat_eng.process_aquired(df)
-    df = feat_eng.process_direct_ownership(df)
-
-    return df
+def prepare_pipeline(ma_cols, panel=None):
+    """
+    Basic preprocessing steps, see `prepare_data`.
+    :param ma_cols: moving average columns of adjusted close, gains are computed for the first one
+    :return: `pipeline.FeaturePipeline`
+    """
+    ma_ = ma_cols[0]
+    return (pipeline.FeaturePipeline()
+            # Apply shifts
+            .shifted(cols=[ADJUSTED_CLOSE, *ma_cols, SPX_ADJUSTED_CLOSE, f'{SPX_ADJUSTED_CLOSE}_ma_4'], dt_days=180,
+                     panel=panel)
+            # Compute relative gains
+            .gains(new_col=f'{ma_}_180', ref_col=ma_, new_col_name=f'change_{ma_}')
+            .gains(new_col=f'{SPX_ADJUSTED_CLOSE}_ma_4_180', ref_col=f'{SPX_ADJUSTED_CLOSE}_ma_4',
+                   new_col_name=f'change_{SPX_ADJUSTED_CLOSE}_ma_4')
+            # SPX benchmark gains
+            .difference(SPX_GAIN, f'change_{ma_},%', f'change_{SPX_ADJUSTED_CLOSE}_ma_4,%')
+            # Clean and Validate
+            .drop_zeros()
+            .ppu_outliers()
+            .validate_ppu()
+            # Compute relative holdings change
+            .holding_change(new_col=HOLDING_CHANGE, cap=True)
+            # Handle booleans
+            .booleans()
+            .aquired()
+            .direct_ownership())
 
 
 def prepare_train_test(df, target_cols=[], features_cols=[],
@@ -10,6 +10,8 @@ from pathlib import Path
 import numpy as np
 from bs4 import BeautifulSoup
 
+from insider_trading import index_parser
+
 BASE_ENDPOINT = 'https://www.sec.gov/Archives/'
 DAILY_INDEX_ENDPOINT = 'https://www.sec.gov/Archives/edgar/daily-index/'
 
@@ -28,6 +30,8 @@ def parse_entry(entry):
     """
      Parse index form entry:
           Form Company CIK Date Filename
+     Reference line parser of `index_parser` (see `perf.index_parser`), entries are parsed in bulk by
+     `read_form_index_entries`.
      """
     entry_list = entry.strip().split(' ')
     entry_list = list(filter(lambda x: x != '', entry_list))
@@ -43,12 +47,15 @@ def parse_entry(entry):
 def read_form_index_entries(filename):
     """
      Read form index from file and return 4/A form entries iteratively.
+     :return: generator of tuples (form, company, cik, date, filename), date is a `datetime.date`, other
+              values are strings
      """
-    with open(filename, 'r') as f:
-        for line in f:
-            if line.startswith('4 ') or line.startswith('4/A'):
-                entry = parse_entry(line)
-                yield entry
+    entries = index_parser.parse(Path(filename).read_bytes())
+    # Plain Python values, not numpy scalars
+    columns = [entries.form.tolist(), entries.company.tolist(), entries.cik.astype(str).tolist(),
+               entries.date.tolist(), entries.path.tolist()]
+    for entry in zip(*columns):
+        yield entry
 
 
 def append_valid_string(tag_name):
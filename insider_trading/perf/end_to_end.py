@@ -0,0 +1,226 @@
+"""
+Offline end-to-end throughput benchmark of `bin/update-database` and `bin/update-market-data` against local
+EDGAR and AlphaVantage stand-ins (see `stand_in`).
+
+Scenarios, each run by the real script in a fresh process:
+    day     update-database for one day (--date)
+    month   update-database --update-range for the month of --date
+    market  update-market-data for --tickers tickers without stored data
+
+Reported per scenario: items (forms or tickers) per second, requests per second, p50 / p99 latency of HTTP
+requests as seen by the client, peak RSS of the main process and of the largest worker process.
+SEC and AlphaVantage rate limits are lifted to --rate requests per second, so that the code is measured rather
+than the quotas. Results are saved as JSON with the current commit, to compare runs across commits.
+
+Usage:
+    python -m insider_trading.perf.end_to_end [--scenarios day month market] [--output end_to_end.json]
+"""
+import argparse
+from datetime import datetime, timedelta
+import csv
+import importlib.util
+from importlib.machinery import SourceFileLoader
+import json
+import logging
+import multiprocessing
+from pathlib import Path
+import platform
+import queue
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from insider_trading.perf import stand_in, synthetic
+
+SCENARIOS = ['day', 'month', 'market']
+BIN = Path(__file__).resolve().parents[2] / 'bin'
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS,
+                        help='Scenarios to run. DEFAULT: all')
+    parser.add_argument('--output', type=Path, default=Path('end_to_end.json'),
+                        help='JSON file to save results to. DEFAULT: end_to_end.json')
+    parser.add_argument('--date', default='2019-09-13', help='Day of the day scenario, its month is used for the '
+                                                             'month scenario. DEFAULT: 2019-09-13')
+    parser.add_argument('--entries-per-day', dest='entries_per_day', type=int, default=2500,
+                        help='Daily index entries, about 40%% are Form 4. DEFAULT: 2500')
+    parser.add_argument('--tickers', type=int, default=500, help='Tickers of the market scenario. DEFAULT: 500')
+    parser.add_argument('--latency', type=float, default=0.02, help='Mean response latency, seconds. DEFAULT: 0.02')
+    parser.add_argument('--error-rate', dest='error_rate', type=float, default=0.,
+                        help='Share of requests failing with 500. DEFAULT: 0')
+    parser.add_argument('--throttle-rate', dest='throttle_rate', type=float, default=0.,
+                        help='Share of throttled requests. DEFAULT: 0')
+    parser.add_argument('--rate', type=float, default=1000.,
+                        help='Client rate limit, requests per second. DEFAULT: 1000')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='update-database --workers. DEFAULT: the script default')
+    return parser.parse_args(argv)
+
+
+def load_script(name):
+    loader = SourceFileLoader(name.replace('-', '_'), str(BIN / name))
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader(loader.name, loader))
+    loader.exec_module(module)
+    return module
+
+
+def instrument(base_url, rate):
+    """
+    Point EDGAR and AlphaVantage endpoints to the stand-in, lift the rate limits and record request latencies.
+    :return: list the latencies are appended to
+    """
+    from insider_trading import client, data_parser, market_api, store
+
+    data_parser.BASE_FORM_ENDPOINT = base_url + '/Archives/'
+    data_parser.DAILY_INDEX_ENDPOINT = base_url + '/Archives/edgar/daily-index/'
+    data_parser.FULL_INDEX_ENDPOINT = store.FULL_INDEX_ENDPOINT = base_url + '/Archives/edgar/full-index/'
+    market_api.BASE_URL = base_url
+    store.MAX_REQUESTS_PER_SEC = rate
+    market_api.MAX_REQUESTS_PER_MIN = int(rate * 60)
+    market_api.MAX_REQUESTS_PER_DAY = int(rate * 24 * 60 * 60)
+
+    latencies = []
+    get = client.Client._get
+
+    async def timed_get(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await get(self, *args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    client.Client._get = timed_get
+    return latencies
+
+
+def run_edgar(args, root, days):
+    from insider_trading import manifest
+
+    manifest_path = root / 'manifest.sqlite'
+    argv = [str(root / 'database.csv'), '--date', (days[0] - timedelta(days=1)).strftime('%Y-%m-%d'),
+            '--update-range', '--end-date', days[-1].strftime('%Y-%m-%d'), '--manifest', str(manifest_path)]
+    if args.workers is not None:
+        argv += ['--workers', str(args.workers)]
+    load_script('update-database').main(argv)
+
+    with manifest.Manifest(manifest_path) as run_manifest:
+        summary = run_manifest.summary()
+    return summary['forms'][manifest.DONE], summary['forms'][manifest.FAILED]
+
+
+def run_market(args, root):
+    from insider_trading.config import FILINGS_COLUMNS
+
+    # Tickers read back as NaN from the csv, e.g. `NA`, are left out
+    symbols = [symbol for symbol in synthetic.ticker_symbols(args.tickers) if symbol not in ('NA', 'NAN', 'NULL')]
+    database = root / 'database.csv'
+    with open(database, 'w', newline='') as fout:
+        writer = csv.writer(fout)
+        writer.writerow(FILINGS_COLUMNS)
+        writer.writerows(synthetic.filings_rows(symbols, args.tickers * 10))
+    market_root = root / 'market_data'
+    load_script('update-market-data').main(['--database', str(database), '--output_folder', str(market_root),
+                                            '--rejects', str(root / 'rejects.txt'),
+                                            '--symbols_queue_size', str(args.tickers),
+                                            '--daily_budget', str(args.tickers * 2)])
+    saved = len(list(market_root.glob('*.npz')))
+    return saved, len(symbols) - saved
+
+
+def month_days(date):
+    first = date.replace(day=1)
+    last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)
+            if (first + timedelta(days=i)).isoweekday() <= 5]
+
+
+def run_scenario(scenario, args, base_url, results):
+    """
+    Run the scenario in the current process and put its measures to the `results` queue.
+    """
+    # Scripts configure logging only if it isn't configured yet
+    logging.basicConfig(level=logging.WARNING)
+    latencies = instrument(base_url, args.rate)
+    date = datetime.strptime(args.date, '%Y-%m-%d')
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        if scenario == 'market':
+            items, failed = run_market(args, Path(root))
+        else:
+            items, failed = run_edgar(args, Path(root), [date] if scenario == 'day' else month_days(date))
+        elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    results.put({'items': items,
+                 'failed': failed,
+                 'seconds': elapsed,
+                 'items_per_sec': items / elapsed,
+                 'requests': len(latencies),
+                 'requests_per_sec': len(latencies) / elapsed,
+                 'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+                 'latency_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+                 # Linux reports max RSS in kilobytes
+                 'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                 'peak_rss_workers_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024})
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BIN.parent, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    argv = argv or sys.argv[1:]
+    args = parse_arguments(argv)
+
+    process, base_url = stand_in.start(entries_per_day=args.entries_per_day, latency=args.latency,
+                                       error_rate=args.error_rate, throttle_rate=args.throttle_rate)
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    try:
+        for scenario in args.scenarios:
+            measures = context.Queue()
+            # Fresh process per scenario, so that peak RSS isn't inherited from the previous one
+            runner = context.Process(target=run_scenario, args=(scenario, args, base_url, measures))
+            runner.start()
+            while True:
+                try:
+                    result = measures.get(timeout=1.)
+                    break
+                except queue.Empty:
+                    if not runner.is_alive():
+                        raise RuntimeError(f'Scenario {scenario} failed')
+            runner.join()
+            results[scenario] = result
+            print(f"{scenario}: {result['items']} items in {result['seconds']:.1f} s "
+                  f"({result['items_per_sec']:.1f} items/sec, {result['requests_per_sec']:.1f} req/sec), "
+                  f"latency p50 {result['latency_p50_ms']:.1f} ms, p99 {result['latency_p99_ms']:.1f} ms, "
+                  f"peak RSS {result['peak_rss_mb']:.0f} MB (workers {result['peak_rss_workers_mb']:.0f} MB), "
+                  f"{result['failed']} failed")
+        served = stand_in.fetch_stats(base_url)
+    finally:
+        stand_in.stop(process)
+
+    report = {'commit': current_commit(),
+              'timestamp': datetime.now().isoformat(timespec='seconds'),
+              'python': platform.python_version(),
+              'config': {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+              'results': results,
+              'served': served}
+    with open(args.output, 'w') as fout:
+        json.dump(report, fout, indent=2)
+    print(f'Saved results to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Parity check and throughput benchmark of `form_parser` against the BeautifulSoup `Form` extraction.
+
+Usage:
+    python -m insider_trading.perf.form_parser [--forms FOLDER] [--n 500]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from insider_trading import form_parser
+from insider_trading.data_parser import Form
+from insider_trading.perf import synthetic
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--forms', type=Path, default=None,
+                        help='Folder with recorded EDGAR .txt submissions. DEFAULT: synthetic forms')
+    parser.add_argument('--n', type=int, default=500, help='Number of synthetic forms. DEFAULT: 500')
+    return parser.parse_args(argv)
+
+
+def load_forms(folder=None, n=500):
+    if folder is None:
+        return [synthetic.form4_submission(seed) for seed in range(n)]
+    return [path.read_bytes() for path in sorted(Path(folder).glob('*.txt'))]
+
+
+def soup_content(data):
+    form = Form('')
+    form.extract_soup_info(BeautifulSoup(data, 'html.parser'))
+    return form.get_content()
+
+
+def _run(extract, data):
+    try:
+        return extract(data)
+    except AttributeError:
+        return None
+
+
+def check_parity(forms):
+    """
+    Compare contents extracted with both engines.
+    :param forms: list of raw submissions
+    :return: list of indices of forms with different content
+    """
+    return [i for i, data in enumerate(forms)
+            if _run(soup_content, data) != _run(form_parser.extract_content, data)]
+
+
+def forms_per_sec(extract, forms):
+    start = time.perf_counter()
+    for data in forms:
+        _run(extract, data)
+    return len(forms) / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    argv = argv or sys.argv[1:]
+    args = parse_arguments(argv)
+
+    forms = load_forms(args.forms, args.n)
+    mismatches = check_parity(forms)
+    print(f'Parity: {len(forms) - len(mismatches)} / {len(forms)} forms identical')
+    for i in mismatches[:10]:
+        print(f'\tMismatch in form #{i}')
+
+    soup_rate = forms_per_sec(soup_content, forms)
+    fast_rate = forms_per_sec(form_parser.extract_content, forms)
+    print(f'BeautifulSoup: {soup_rate:.1f} forms/sec per core')
+    print(f'form_parser:   {fast_rate:.1f} forms/sec per core ({fast_rate / soup_rate:.1f}x)')
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
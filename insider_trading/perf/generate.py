@@ -0,0 +1,79 @@
+"""
+Generate a synthetic dataset: a filings database with a skewed ticker distribution and per-ticker market data.
+
+Output folder layout, same as the real data:
+    database.csv        filings, see `synthetic.filings_frame`
+    market_data/        one file per ticker and S&P500 (`SPX`), `.npz` market store files or AlphaVantage `.json`
+
+Usage:
+    python -m insider_trading.perf.generate data/synthetic [--rows 1000000] [--tickers 5000] [--bars 520]
+                                                           [--freq W] [--format npz]
+"""
+import argparse
+import logging
+from pathlib import Path
+import sys
+import time
+
+from insider_trading.perf import synthetic
+
+SP500 = 'SPX'
+
+LOG = logging.getLogger(__name__)
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('output', type=Path, help='Output folder')
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of filings. DEFAULT: 1000000')
+    parser.add_argument('--tickers', type=int, default=5000, help='Number of tickers. DEFAULT: 5000')
+    parser.add_argument('--bars', type=int, default=520, help='Price bars per ticker. DEFAULT: 520')
+    parser.add_argument('--freq', choices=['W', 'D'], default='W', help='Weekly or daily bars. DEFAULT: W')
+    parser.add_argument('--format', dest='fmt', choices=['npz', 'json'], default='npz',
+                        help='Market data files format. DEFAULT: npz')
+    parser.add_argument('--skew', type=float, default=1.1,
+                        help='Zipf exponent of the ticker distribution of filings. DEFAULT: 1.1')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed. DEFAULT: 0')
+    parser.add_argument('--verbose', '-v', action='store_true', default=False, help='Show debug messages')
+    return parser.parse_args(argv)
+
+
+def symbols(n_tickers):
+    """
+    Ticker symbols of the dataset, symbols read back as NaN from a csv, e.g. `NA`, are left out.
+    """
+    return [symbol for symbol in synthetic.ticker_symbols(n_tickers) if symbol not in ('NA', 'NAN', 'NULL')]
+
+
+def generate(output, n_rows, n_tickers, n_bars=520, freq='W', fmt='npz', skew=1.1, seed=0):
+    """
+    Write the dataset to the `output` folder.
+    :return: tuple (filings database path, market data folder)
+    """
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    tickers = symbols(n_tickers)
+
+    database = output / 'database.csv'
+    synthetic.filings_frame(tickers, n_rows, seed, skew=skew).to_csv(database, index=False)
+    LOG.info(f'Saved {n_rows} filings of {len(tickers)} tickers to {database}')
+
+    market_root = output / 'market_data'
+    synthetic.write_price_files(market_root, tickers + [SP500], n_bars, freq, fmt, seed)
+    LOG.info(f'Saved {n_bars} bars of {len(tickers) + 1} tickers to {market_root}')
+    return database, market_root
+
+
+def main(argv=None):
+    argv = argv or sys.argv[1:]
+    args = parse_arguments(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+
+    start = time.perf_counter()
+    generate(args.output, args.rows, args.tickers, args.bars, args.freq, args.fmt, args.skew, args.seed)
+    LOG.info(f'Done in {time.perf_counter() - start:.1f} s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
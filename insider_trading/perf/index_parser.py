@@ -0,0 +1,105 @@
+"""
+Parity check and throughput benchmark of `index_parser` against the line by line index parsing.
+
+Usage:
+    python -m insider_trading.perf.index_parser [--index FILE] [--entries 350000] [--daily]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from insider_trading import index_parser
+from insider_trading.parse_index import parse_entry
+from insider_trading.perf import synthetic
+
+
+# A quarterly full-index/form.idx has about 350 000 entries
+QUARTER_ENTRIES = 350000
+REPEATS = 3
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--index', type=Path, default=None,
+                        help='Recorded EDGAR form index file. DEFAULT: synthetic quarterly index')
+    parser.add_argument('--entries', type=int, default=QUARTER_ENTRIES,
+                        help=f'Number of synthetic index entries. DEFAULT: {QUARTER_ENTRIES}')
+    parser.add_argument('--daily', action='store_true', help='Synthetic daily index dates (YYYYMMDD)')
+    return parser.parse_args(argv)
+
+
+def line_entries(data):
+    """
+    Form 4 entries parsed line by line, like `data_parser.Index` did.
+    """
+    entries = []
+    for entry in data.decode('latin-1').split('\n'):
+        if entry.startswith('4 ') or entry.startswith('4/A'):
+            entries.append(parse_entry(entry))
+    return entries
+
+
+def bulk_entries(data):
+    return index_parser.parse(data)
+
+
+def check_parity(data):
+    """
+    :return: number of entries and list of indices of different entries
+    """
+    expected = line_entries(data)
+    entries = bulk_entries(data)
+    dates = np.datetime_as_string(entries.date)
+    mismatches = []
+    for i, (form, company, cik, date, path) in enumerate(expected):
+        if i >= len(entries.path):
+            mismatches.append(i)
+            continue
+        if (form, company, int(cik), date.replace('-', ''), path) != \
+                (entries.form[i], entries.company[i], entries.cik[i], dates[i].replace('-', ''), entries.path[i]):
+            mismatches.append(i)
+    if len(entries.path) > len(expected):
+        mismatches.extend(range(len(expected), len(entries.path)))
+    return len(expected), mismatches
+
+
+def seconds(parse, data):
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        parse(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    argv = argv or sys.argv[1:]
+    args = parse_arguments(argv)
+
+    if args.index is not None:
+        data = args.index.read_bytes()
+    else:
+        data = synthetic.form_index(args.entries, quarterly=not args.daily)
+    lines = data.count(b'\n')
+
+    count, mismatches = check_parity(data)
+    print(f'Parity: {count - len(mismatches)} / {count} form 4 entries identical')
+    for i in mismatches[:10]:
+        print(f'\tMismatch in entry #{i}')
+
+    line_time = seconds(line_entries, data)
+    bulk_time = seconds(bulk_entries, data)
+    print(f'Index of {lines} lines, {len(data) / 2 ** 20:.1f} MB')
+    print(f'Line by line: {line_time * 1000:.1f} ms ({lines / line_time:.0f} lines/sec)')
+    print(f'index_parser: {bulk_time * 1000:.1f} ms ({lines / bulk_time:.0f} lines/sec, '
+          f'{line_time / bulk_time:.1f}x)')
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
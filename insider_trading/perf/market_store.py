@@ -0,0 +1,94 @@
+"""
+Parity check and load time benchmark of `market_store` against parsing AlphaVantage .json files.
+
+Usage:
+    python -m insider_trading.perf.market_store [--market-root FOLDER] [--tickers 1000] [--weeks 1000]
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from insider_trading import market_store
+from insider_trading.config import DATE
+from insider_trading.perf import synthetic
+from insider_trading.preprocess import merge
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--market-root', dest='market_root', type=Path, default=None,
+                        help='Folder with AlphaVantage .json files. DEFAULT: synthetic tickers in a temporary folder')
+    parser.add_argument('--tickers', type=int, default=1000, help='Number of synthetic tickers. DEFAULT: 1000')
+    parser.add_argument('--weeks', type=int, default=1000, help='Weeks of synthetic market data. DEFAULT: 1000')
+    return parser.parse_args(argv)
+
+
+def write_json_tickers(root, n_tickers, n_weeks):
+    symbols = synthetic.ticker_symbols(n_tickers)
+    for seed, symbol in enumerate(symbols):
+        with open(Path(root) / (symbol + '.json'), 'w') as fout:
+            json.dump(synthetic.alphavantage_payload(symbol, n_weeks, seed), fout)
+    return symbols
+
+
+def load_json(symbols, root):
+    frames = []
+    for symbol in symbols:
+        df = merge.json_to_csv(symbol, root)
+        df[DATE] = df[DATE].astype('datetime64[ns]')
+        frames.append(df.reset_index(drop=True))
+    return frames
+
+
+def load_store(symbols, root):
+    return [market_store.load_frame(root, symbol) for symbol in symbols]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def run(root, symbols):
+    _, migrate_time = timed(lambda: [market_store.migrate_json(Path(root) / (s + '.json')) for s in symbols])
+    json_frames, json_time = timed(load_json, symbols, root)
+    store_frames, store_time = timed(load_store, symbols, root)
+
+    mismatches = [symbol for symbol, expected, df in zip(symbols, json_frames, store_frames)
+                  if not expected.equals(df)]
+    print(f'Parity: {len(symbols) - len(mismatches)} / {len(symbols)} tickers identical')
+    for symbol in mismatches[:10]:
+        print(f'\tMismatch in {symbol}')
+    print(f'One-time migration: {migrate_time:.2f} s')
+    print(f'json:         {json_time:.2f} s ({len(symbols) / json_time:.0f} tickers/sec)')
+    print(f'market_store: {store_time:.2f} s ({len(symbols) / store_time:.0f} tickers/sec, '
+          f'{json_time / store_time:.1f}x)')
+    return mismatches
+
+
+def main(argv=None):
+    argv = argv or sys.argv[1:]
+    args = parse_arguments(argv)
+
+    if args.market_root is not None:
+        # Migrated files are written to a temporary copy, not to the real market data folder
+        with tempfile.TemporaryDirectory() as root:
+            symbols = []
+            for path in sorted(args.market_root.glob('*.json')):
+                (Path(root) / path.name).write_bytes(path.read_bytes())
+                symbols.append(path.stem)
+            mismatches = run(root, symbols)
+    else:
+        with tempfile.TemporaryDirectory() as root:
+            symbols = write_json_tickers(root, args.tickers, args.weeks)
+            mismatches = run(root, symbols)
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
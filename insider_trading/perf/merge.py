@@ -0,0 +1,68 @@
+"""
+Parity check and benchmark of loading per-ticker market data in worker processes in `merge.merge_forms_market`.
+
+Usage:
+    python -m insider_trading.perf.merge [--tickers 5000] [--weeks 500] [--rows 200000] [--workers 4]
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from insider_trading import market_store
+from insider_trading.config import FILINGS_COLUMNS
+from insider_trading.perf import synthetic
+from insider_trading.preprocess import merge
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tickers', type=int, default=5000, help='Number of synthetic tickers. DEFAULT: 5000')
+    parser.add_argument('--weeks', type=int, default=500, help='Weeks of synthetic market data. DEFAULT: 500')
+    parser.add_argument('--rows', type=int, default=200000, help='Number of synthetic filings. DEFAULT: 200000')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Number of worker processes. DEFAULT: CPU count')
+    return parser.parse_args(argv)
+
+
+def write_data(root, n_tickers, n_weeks, n_rows):
+    # Tickers read back as NaN from the csv, e.g. `NAN`, are left out
+    symbols = [symbol for symbol in synthetic.ticker_symbols(n_tickers) if symbol not in ('NA', 'NAN', 'NULL')]
+    for seed, symbol in enumerate(symbols + ['SPX']):
+        market_store.write_payload(root, synthetic.alphavantage_payload(symbol, n_weeks, seed))
+    forms_csv = Path(root) / 'database.csv'
+    with open(forms_csv, 'w', newline='') as fout:
+        writer = csv.writer(fout)
+        writer.writerow(FILINGS_COLUMNS)
+        writer.writerows(synthetic.filings_rows(symbols, n_rows))
+    return forms_csv
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    argv = argv or sys.argv[1:]
+    args = parse_arguments(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        forms_csv = write_data(root, args.tickers, args.weeks, args.rows)
+        serial_df, serial_time = timed(merge.merge_forms_market, forms_csv, root, ma_windows=[4, 12])
+        parallel_df, parallel_time = timed(merge.merge_forms_market, forms_csv, root, ma_windows=[4, 12],
+                                           workers=args.workers)
+
+    identical = serial_df.equals(parallel_df)
+    print(f'Parity: merged data frames {"identical" if identical else "DIFFER"} ({len(serial_df)} rows)')
+    print(f'serial:     {serial_time:.2f} s')
+    print(f'{args.workers} workers: {parallel_time:.2f} s ({serial_time / parallel_time:.1f}x)')
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Parity check and benchmark of `pipeline.FeaturePipeline` against the `feature_engineering` functions chained by
+`benchmark.prepare_data` before, on synthetic merged data (see `generate`).
+
+Usage:
+    python -m insider_trading.perf.pipeline [--rows 1000000] [--tickers 5000] [--weeks 520]
+"""
+import argparse
+import gc
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from insider_trading.config import *
+from insider_trading.database import filings
+from insider_trading.perf import generate
+from insider_trading.preprocess import feature_engineering as feat_eng
+from insider_trading.preprocess import merge, pipeline
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of synthetic filings. DEFAULT: 1000000')
+    parser.add_argument('--tickers', type=int, default=5000, help='Number of synthetic tickers. DEFAULT: 5000')
+    parser.add_argument('--weeks', type=int, default=520, help='Weeks of synthetic market data. DEFAULT: 520')
+    return parser.parse_args(argv)
+
+
+def chained(df, ma_cols):
+    """
+    Preprocessing steps of `benchmark.prepare_data` as separate `feature_engineering` calls.
+    """
+    ma_ = ma_cols[0]
+    df = feat_eng.add_shifted(df, cols=[ADJUSTED_CLOSE, *ma_cols,
+                              SPX_ADJUSTED_CLOSE, f'{SPX_ADJUSTED_CLOSE}_ma_4'], dt_days=180)
+    df = feat_eng.add_gains(df, new_col=f'{ma_}_180', ref_col=ma_, new_col_name=f'change_{ma_}')
+    df = feat_eng.add_gains(df, new_col=f'{SPX_ADJUSTED_CLOSE}_ma_4_180', ref_col=f'{SPX_ADJUSTED_CLOSE}_ma_4',
+                            new_col_name=f'change_{SPX_ADJUSTED_CLOSE}_ma_4')
+    df[SPX_GAIN] = df[f'change_{ma_},%'] - df[f'change_{SPX_ADJUSTED_CLOSE}_ma_4,%']
+    df = feat_eng.drop_zeros(df)
+    df = feat_eng.process_ppu_outliers(df)
+    df = feat_eng.validate_ppu_to_market(df)
+    df = feat_eng.add_holding_change_perc(df, new_col=HOLDING_CHANGE, cap=True)
+    df = feat_eng.process_booleans(df)
+    df = feat_eng.process_aquired(df)
+    df = feat_eng.process_direct_ownership(df)
+    return df.reset_index(drop=True)
+
+
+def fused(df, ma_cols):
+    # Same steps as `benchmark.prepare_pipeline`, without the model dependencies
+    ma_ = ma_cols[0]
+    return (pipeline.FeaturePipeline()
+            .shifted(cols=[ADJUSTED_CLOSE, *ma_cols, SPX_ADJUSTED_CLOSE, f'{SPX_ADJUSTED_CLOSE}_ma_4'], dt_days=180)
+            .gains(new_col=f'{ma_}_180', ref_col=ma_, new_col_name=f'change_{ma_}')
+            .gains(new_col=f'{SPX_ADJUSTED_CLOSE}_ma_4_180', ref_col=f'{SPX_ADJUSTED_CLOSE}_ma_4',
+                   new_col_name=f'change_{SPX_ADJUSTED_CLOSE}_ma_4')
+            .difference(SPX_GAIN, f'change_{ma_},%', f'change_{SPX_ADJUSTED_CLOSE}_ma_4,%')
+            .drop_zeros()
+            .ppu_outliers()
+            .validate_ppu()
+            .holding_change(new_col=HOLDING_CHANGE, cap=True)
+            .booleans()
+            .aquired()
+            .direct_ownership()
+            .run(df))
+
+
+def measure(function, df, ma_cols):
+    """
+    :return: tuple (result, seconds, peak traced memory in MB), the input frame is copied for each run
+    """
+    data = df.copy()
+    gc.collect()
+    start = time.perf_counter()
+    result = function(data, ma_cols)
+    seconds = time.perf_counter() - start
+
+    data = df.copy()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(data, ma_cols)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak / 2 ** 20
+
+
+def main(argv=None):
+    argv = argv or sys.argv[1:]
+    args = parse_arguments(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        database, market_root = generate.generate(root, args.rows, args.tickers, args.weeks)
+        merged_csv = f'{root}/merged.csv'
+        merge.merge_forms_market(database, market_root, ma_windows=[4]).to_csv(merged_csv, index=False)
+        df = filings.read_filings(merged_csv)
+    ma_cols = df.filter(regex=f'{ADJUSTED_CLOSE}_ma_\\d').columns.to_list()
+
+    chained_df, chained_time, chained_peak = measure(chained, df, ma_cols)
+    fused_df, fused_time, fused_peak = measure(fused, df, ma_cols)
+
+    try:
+        pd.testing.assert_frame_equal(chained_df, fused_df)
+        identical = True
+    except AssertionError as e:
+        print(e)
+        identical = False
+    print(f'{len(df)} merged rows, {len(fused_df)} prepared, identical: {identical}')
+    print(f'chained: {chained_time:.2f} s, peak {chained_peak:.0f} MB')
+    print(f'fused:   {fused_time:.2f} s, peak {fused_peak:.0f} MB '
+          f'({chained_time / fused_time:.1f}x faster, {chained_peak / fused_peak:.1f}x less memory)')
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
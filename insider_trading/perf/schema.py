@@ -0,0 +1,81 @@
+"""
+Memory and speed of merged data read with `schema` types against `pd.read_csv` defaults, on synthetic data
+(see `generate`).
+
+Reported for both: read time, memory of the data frame (strings included), time of a groupby by ticker, of
+dropping duplicated rows and of a merge on ticker.
+
+Usage:
+    python -m insider_trading.perf.schema [--rows 1000000] [--tickers 5000] [--weeks 520]
+"""
+import argparse
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from insider_trading.config import *
+from insider_trading.database import filings
+from insider_trading.perf import generate
+from insider_trading.preprocess import merge
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of synthetic filings. DEFAULT: 1000000')
+    parser.add_argument('--tickers', type=int, default=5000, help='Number of synthetic tickers. DEFAULT: 5000')
+    parser.add_argument('--weeks', type=int, default=520, help='Weeks of synthetic market data. DEFAULT: 520')
+    return parser.parse_args(argv)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def groupby_ticker(df):
+    return df.groupby(TICKER, observed=True)[[PRICE_PER_UNIT, ADJUSTED_CLOSE]].mean()
+
+
+def merge_ticker(df):
+    # Latest report date per ticker joined back to the filings
+    latest = df.groupby(TICKER, observed=True)[REPORT_DATE].max().rename('latest').reset_index()
+    return df.merge(latest, on=TICKER, how='left')
+
+
+def measure(df):
+    """
+    :return: dict of memory in MB and operation times in seconds
+    """
+    return {'memory': df.memory_usage(deep=True).sum() / 2 ** 20,
+            'groupby': timed(groupby_ticker, df)[1],
+            'drop_duplicates': timed(df.drop_duplicates)[1],
+            'merge': timed(merge_ticker, df)[1]}
+
+
+def main(argv=None):
+    argv = argv or sys.argv[1:]
+    args = parse_arguments(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        database, market_root = generate.generate(root, args.rows, args.tickers, args.weeks)
+        merged_csv = f'{root}/merged.csv'
+        merge.merge_forms_market(database, market_root, ma_windows=[4]).to_csv(merged_csv, index=False)
+
+        default_df, default_read = timed(pd.read_csv, merged_csv)
+        typed_df, typed_read = timed(filings.read_filings, merged_csv)
+
+    default, typed = measure(default_df), measure(typed_df)
+    print(f'{len(typed_df)} merged rows, {len(typed_df.columns)} columns')
+    print(f'{"":16} {"default":>10} {"schema":>10}')
+    print(f'{"read, s":16} {default_read:10.2f} {typed_read:10.2f}')
+    for name, unit in [('memory', 'MB'), ('groupby', 's'), ('drop_duplicates', 's'), ('merge', 's')]:
+        print(f'{name + ", " + unit:16} {default[name]:10.2f} {typed[name]:10.2f} '
+              f'({default[name] / typed[name]:.1f}x)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Local stand-ins of EDGAR and AlphaVantage HTTP endpoints for offline benchmarks.
+
+Responses are synthetic (see `synthetic`) and deterministic for a given path:
+    /Archives/edgar/daily-index/.../form.YYYYMMDD.idx    daily index of the day
+    /Archives/edgar/full-index/.../form.idx              quarterly index
+    /Archives/edgar/data/<cik>/<accession>.txt           Form 4 submission
+    /query?function=...&symbol=...                       AlphaVantage weekly adjusted time series
+    /stats                                               json counts of served requests by kind and status
+
+Every response is delayed by an exponentially distributed latency. A share of the requests fails with 500, and
+another share is throttled: with 429 on EDGAR paths, with a `Note` payload on `/query` like AlphaVantage does.
+
+Usage:
+    process, url = stand_in.start(latency=0.02, error_rate=0.01)
+    ...
+    stand_in.stop(process)
+"""
+import asyncio
+from collections import Counter
+from datetime import datetime
+import json
+import multiprocessing
+import random
+import re
+import socket
+import time
+import urllib.request
+import zlib
+
+from aiohttp import web
+
+from insider_trading.perf import synthetic
+
+DAILY_INDEX = re.compile(r'form\.(\d{8})\.idx$')
+COMPACT_SIZE = 100
+STARTUP_TIMEOUT = 30.
+
+
+def create_app(entries_per_day=2500, weeks=1000, latency=0.02, error_rate=0., throttle_rate=0., seed=0):
+    """
+    :param entries_per_day: number of entries of daily indices, about 40% are Form 4
+    :param weeks: weeks of AlphaVantage time series
+    :param latency: mean response latency, seconds
+    :param error_rate: share of requests failing with 500
+    :param throttle_rate: share of throttled requests
+    :return: `aiohttp.web.Application`
+    """
+    rng = random.Random(seed)
+    stats = Counter()
+    quarterly = {}
+
+    async def respond(kind, make_response, throttled):
+        if latency:
+            await asyncio.sleep(rng.expovariate(1. / latency))
+        draw = rng.random()
+        if draw < error_rate:
+            response = web.Response(status=500)
+        elif draw < error_rate + throttle_rate:
+            response = throttled()
+        else:
+            response = make_response()
+        stats[f'{kind} {response.status}'] += 1
+        return response
+
+    def edgar_throttled():
+        return web.Response(status=429)
+
+    async def daily_index(request):
+        match = DAILY_INDEX.search(request.path)
+        if match is None:
+            return web.Response(status=404)
+        day = datetime.strptime(match.group(1), '%Y%m%d')
+        return await respond('daily-index', lambda: web.Response(
+            body=synthetic.form_index(entries_per_day, seed=day.toordinal(), day=day)), edgar_throttled)
+
+    async def full_index(request):
+        def make_response():
+            if request.path not in quarterly:
+                # A quarter has about 63 business days
+                quarterly[request.path] = synthetic.form_index(entries_per_day * 63, quarterly=True,
+                                                               seed=zlib.crc32(request.path.encode()))
+            return web.Response(body=quarterly[request.path])
+        return await respond('full-index', make_response, edgar_throttled)
+
+    async def form(request):
+        return await respond('form', lambda: web.Response(
+            body=synthetic.form4_submission(zlib.crc32(request.path.encode()))), edgar_throttled)
+
+    async def query(request):
+        symbol = request.query.get('symbol', '')
+
+        def make_response():
+            payload = synthetic.alphavantage_payload(symbol, weeks, zlib.crc32(symbol.encode()))
+            if request.query.get('outputsize') == 'compact':
+                series = payload['Weekly Adjusted Time Series']
+                payload['Weekly Adjusted Time Series'] = dict(list(series.items())[:COMPACT_SIZE])
+            return web.json_response(payload)
+
+        def throttled():
+            return web.json_response({'Note': 'Thank you for using Alpha Vantage! Our standard API call frequency '
+                                              'is 5 calls per minute and 500 calls per day.'})
+        return await respond('query', make_response, throttled)
+
+    async def get_stats(request):
+        return web.json_response(dict(stats))
+
+    app = web.Application()
+    app.router.add_get('/Archives/edgar/daily-index/{tail:.*}', daily_index)
+    app.router.add_get('/Archives/edgar/full-index/{tail:.*}', full_index)
+    app.router.add_get('/Archives/edgar/data/{tail:.*}', form)
+    app.router.add_get('/query', query)
+    app.router.add_get('/stats', get_stats)
+    return app
+
+
+def run(port, **config):
+    web.run_app(create_app(**config), host='127.0.0.1', port=port, print=None, handle_signals=True)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start(**config):
+    """
+    Start stand-in server in a separate process, see `create_app` for the configuration.
+    :return: tuple (process, base url)
+    """
+    port = _free_port()
+    process = multiprocessing.get_context('spawn').Process(target=run, args=(port,), kwargs=config, daemon=True)
+    process.start()
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while True:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1.):
+                break
+        except OSError:
+            if time.monotonic() > deadline or not process.is_alive():
+                process.terminate()
+                raise RuntimeError(f'Stand-in server did not start on port {port}')
+            time.sleep(0.05)
+    return process, f'http://127.0.0.1:{port}'
+
+
+def stop(process):
+    process.terminate()
+    process.join()
+
+
+def fetch_stats(url):
+    """
+    :return: dict of served requests counts by kind and status
+    """
+    with urllib.request.urlopen(url + '/stats') as response:
+        return json.loads(response.read())
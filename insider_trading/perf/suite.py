@@ -0,0 +1,228 @@
+"""
+Micro-benchmarks of preprocessing hot spots at several dataset scales, on synthetic data (see `generate`).
+
+Cases:
+    json_to_csv          `merge.json_to_csv` of every ticker
+    add_ma               `feature_engineering.add_ma` per ticker on the market data of all tickers
+    merge_forms_market   `merge.merge_forms_market` with 4 weeks moving averages and S&P500
+    add_shifted          `feature_engineering.add_shifted` on the merged data
+    process_ppu_outliers `feature_engineering.process_ppu_outliers` on the merged data
+    prepare_data         `benchmark.prepare_data` of the merged data csv
+
+A scale is a number of filings, tickers grow with it (ROWS_PER_TICKER filings per ticker, from MIN_TICKERS to
+MAX_TICKERS). Each case reports the best time of --repeat runs and the peak memory allocated during a separate
+run traced by `tracemalloc`. Between consecutive scales the scaling exponent log(t2 / t1) / log(n2 / n1) of
+the time over the input size of the case is reported, cases above --max-exponent (e.g. going quadratic) are
+flagged. A case failing, e.g. on a missing dependency, is reported and doesn't stop the others.
+
+Usage:
+    python -m insider_trading.perf.suite [--scales 10000 30000 100000] [--cases add_ma add_shifted]
+                                         [--output suite.json]
+"""
+import argparse
+from datetime import datetime
+from functools import cached_property
+import gc
+import json
+import math
+from pathlib import Path
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from insider_trading.config import *
+from insider_trading.perf import generate, synthetic
+from insider_trading.perf.end_to_end import current_commit
+from insider_trading.preprocess import feature_engineering as feat_eng
+from insider_trading.preprocess import merge
+
+ROWS_PER_TICKER = 50
+MIN_TICKERS = 20
+MAX_TICKERS = 5000
+# Times below are too noisy for scaling exponents
+MIN_SECONDS = 0.01
+
+
+class Dataset:
+    """
+    Synthetic dataset of a scale, inputs of the cases are computed on first use and shared by the cases.
+    """
+
+    def __init__(self, root, n_rows, n_bars=520, freq='W', seed=0):
+        self.root = Path(root)
+        self.n_rows = n_rows
+        self.n_bars = n_bars
+        n_tickers = min(max(n_rows // ROWS_PER_TICKER, MIN_TICKERS), MAX_TICKERS)
+        self.database, self.market_root = generate.generate(self.root, n_rows, n_tickers, n_bars, freq, seed=seed)
+        self.symbols = generate.symbols(n_tickers)
+        self.freq = freq
+        self.seed = seed
+
+    @cached_property
+    def json_root(self):
+        json_root = self.root / 'json_data'
+        synthetic.write_price_files(json_root, self.symbols, self.n_bars, self.freq, 'json', self.seed)
+        return json_root
+
+    @cached_property
+    def market_df(self):
+        return merge.load_market(self.symbols, self.market_root)
+
+    @cached_property
+    def merged_df(self):
+        return merge.merge_forms_market(self.database, self.market_root, ma_windows=[4])
+
+    @cached_property
+    def merged_csv(self):
+        path = self.root / 'merged.csv'
+        self.merged_df.to_csv(path, index=False)
+        return path
+
+
+# A case prepares its input and returns a tuple (function to measure, input size)
+
+def json_to_csv(data):
+    symbols, json_root = data.symbols, data.json_root
+
+    def run():
+        for symbol in symbols:
+            merge.json_to_csv(symbol, json_root)
+    return run, len(symbols) * data.n_bars
+
+
+def add_ma(data):
+    df = data.market_df.copy()
+    return lambda: feat_eng.add_ma(df, [ADJUSTED_CLOSE], window=4, by=TICKER), len(df)
+
+
+def merge_forms_market(data):
+    database, market_root = data.database, data.market_root
+    return lambda: merge.merge_forms_market(database, market_root, ma_windows=[4]), data.n_rows
+
+
+def add_shifted(data):
+    df = data.merged_df
+    return lambda: feat_eng.add_shifted(df, cols=[ADJUSTED_CLOSE, f'{ADJUSTED_CLOSE}_ma_4']), len(df)
+
+
+def process_ppu_outliers(data):
+    df = data.merged_df
+    return lambda: feat_eng.process_ppu_outliers(df), len(df)
+
+
+def prepare_data(data):
+    # Model dependencies are optional, the case fails without them
+    from insider_trading.model import benchmark
+
+    path = data.merged_csv
+    return lambda: benchmark.prepare_data(path), len(data.merged_df)
+
+
+CASES = {case.__name__: case for case in [json_to_csv, add_ma, merge_forms_market, add_shifted,
+                                          process_ppu_outliers, prepare_data]}
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', type=int, nargs='+', default=[10000, 30000, 100000],
+                        help='Numbers of filings. DEFAULT: 10000 30000 100000')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES),
+                        help='Cases to run. DEFAULT: all')
+    parser.add_argument('--bars', type=int, default=520, help='Price bars per ticker. DEFAULT: 520')
+    parser.add_argument('--freq', choices=['W', 'D'], default='W', help='Weekly or daily bars. DEFAULT: W')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case, best is kept. DEFAULT: 3')
+    parser.add_argument('--max-exponent', dest='max_exponent', type=float, default=1.3,
+                        help='Scaling exponent above which a case is flagged. DEFAULT: 1.3')
+    parser.add_argument('--output', type=Path, default=None, help='JSON file to save results to')
+    return parser.parse_args(argv)
+
+
+def measure(case, data, repeat):
+    """
+    :return: dict with the input size, best time in seconds and peak traced memory in MB
+    """
+    seconds = []
+    for _ in range(repeat):
+        run, size = case(data)
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+        del run
+
+    run, size = case(data)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'size': size, 'seconds': min(seconds), 'peak_mb': peak / 2 ** 20}
+
+
+def scaling_exponent(smaller, larger):
+    """
+    :return: exponent of the time growth over the input size growth, None if it can't be estimated
+    """
+    if smaller['seconds'] < MIN_SECONDS or larger['size'] <= smaller['size']:
+        return None
+    return math.log(larger['seconds'] / smaller['seconds']) / math.log(larger['size'] / smaller['size'])
+
+
+def main(argv=None):
+    argv = argv or sys.argv[1:]
+    args = parse_arguments(argv)
+
+    results = {name: {} for name in args.cases}
+    for n_rows in sorted(args.scales):
+        with tempfile.TemporaryDirectory() as root:
+            data = Dataset(root, n_rows, args.bars, args.freq)
+            print(f'Scale {n_rows} filings, {len(data.symbols)} tickers')
+            for name in args.cases:
+                try:
+                    result = measure(CASES[name], data, args.repeat)
+                except Exception as e:
+                    result = {'error': f'{type(e).__name__}: {e}'}
+                results[name][n_rows] = result
+                if 'error' in result:
+                    print(f"    {name:<22} FAILED {result['error']}")
+                else:
+                    print(f"    {name:<22} {result['seconds']:9.3f} s {result['peak_mb']:9.1f} MB "
+                          f"(size {result['size']})")
+
+    print('\nScaling exponents (time over input size):')
+    flagged = []
+    for name, by_scale in results.items():
+        scales = [scale for scale in sorted(by_scale) if 'error' not in by_scale[scale]]
+        exponents = []
+        for smaller, larger in zip(scales, scales[1:]):
+            exponent = scaling_exponent(by_scale[smaller], by_scale[larger])
+            by_scale[larger]['exponent'] = exponent
+            exponents.append('-' if exponent is None else f'{exponent:.2f}')
+            if exponent is not None and exponent > args.max_exponent:
+                flagged.append(f'{name} {smaller} -> {larger}: {exponent:.2f}')
+        print(f"    {name:<22} {' '.join(exponents) or '-'}")
+    if flagged:
+        print(f'SUPERLINEAR (exponent > {args.max_exponent}):')
+        for line in flagged:
+            print(f'    {line}')
+
+    if args.output:
+        report = {'commit': current_commit(),
+                  'timestamp': datetime.now().isoformat(timespec='seconds'),
+                  'python': platform.python_version(),
+                  'config': {key: str(value) if isinstance(value, Path) else value
+                             for key, value in vars(args).items()},
+                  'results': results,
+                  'flagged': flagged}
+        with open(args.output, 'w') as fout:
+            json.dump(report, fout, indent=2)
+        print(f'Saved results to {args.output}')
+    return 1 if flagged else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
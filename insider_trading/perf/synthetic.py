@@ -0,0 +1,430 @@
+"""
+Synthetic EDGAR and market data for benchmarks.
+
+Generators returning data frames or arrays (`filings_frame`, `price_columns`) are vectorized, for datasets of
+millions of filings and thousands of tickers.
+"""
+from datetime import datetime, timedelta
+import io
+import json
+from pathlib import Path
+import random
+import tarfile
+
+import numpy as np
+import pandas as pd
+
+from insider_trading.config import *
+
+SECURITIES = ['Common Stock', 'Class A Common Stock', 'Ordinary Shares', 'Common Stock, par value $0.01']
+OFFICER_TITLES = ['Chief Executive Officer', 'CFO', 'EVP, General Counsel', 'President &amp; COO']
+
+
+def _value(tag, value, footnote=False):
+    footnote_id = '<footnoteId id="F1"/>' if footnote else ''
+    return f"<{tag}>\n<value>{value}</value>\n{footnote_id}\n</{tag}>"
+
+
+def _transaction(rng, tag='nonDerivativeTransaction'):
+    code = rng.choice(['A', 'D'])
+    amount = rng.randint(100, 100000)
+    price = round(rng.uniform(1, 500), 2)
+    holding_after = rng.randint(0, 1000000)
+    return f"""<{tag}>
+{_value('securityTitle', rng.choice(SECURITIES))}
+{_value('transactionDate', f'2019-09-{rng.randint(1, 28):02d}')}
+<transactionCoding>
+<transactionFormType>4</transactionFormType>
+<transactionCode>{'P' if code == 'A' else 'S'}</transactionCode>
+<equitySwapInvolved>0</equitySwapInvolved>
+</transactionCoding>
+<transactionAmounts>
+{_value('transactionShares', amount)}
+{_value('transactionPricePerShare', price, footnote=rng.random() < 0.3)}
+{_value('transactionAcquiredDisposedCode', code)}
+</transactionAmounts>
+<postTransactionAmounts>
+{_value('sharesOwnedFollowingTransaction', holding_after)}
+</postTransactionAmounts>
+<ownershipNature>
+{_value('directOrIndirectOwnership', rng.choice(['D', 'I']))}
+</ownershipNature>
+</{tag}>"""
+
+
+def form4_submission(seed=0, n_transactions=None, ticker=None):
+    """
+    Generate a realistic Form 4 `.txt` submission (SEC header, ownership XML and an exhibit).
+    :param seed: random seed
+    :param n_transactions: number of non derivative transactions, random if None
+    :param ticker: issuer ticker, random if None
+    :return: bytes
+    """
+    rng = random.Random(seed)
+    n_transactions = rng.randint(1, 6) if n_transactions is None else n_transactions
+    ticker = ticker or ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(rng.randint(1, 4)))
+    owner_cik = f'{rng.randint(1, 1999999):010d}'
+    issuer_cik = f'{rng.randint(1, 1999999):010d}'
+    accession = f'{owner_cik}-19-{seed % 1000000:06d}'
+    is_officer = rng.random() < 0.6
+    relationship = '<isDirector>1</isDirector>' if rng.random() < 0.5 else '<isDirector>0</isDirector>'
+    if is_officer:
+        relationship += f"\n<isOfficer>1</isOfficer>\n<officerTitle>{rng.choice(OFFICER_TITLES)}</officerTitle>"
+    transactions = '\n'.join(_transaction(rng) for _ in range(n_transactions))
+    derivative = '\n'.join(_transaction(rng, 'derivativeTransaction') for _ in range(rng.randint(0, 2)))
+
+    text = f"""<SEC-DOCUMENT>{accession}.txt : 20190913
+<SEC-HEADER>{accession}.hdr.sgml : 20190913
+<ACCEPTANCE-DATETIME>20190913163012
+ACCESSION NUMBER:\t\t{accession}
+CONFORMED SUBMISSION TYPE:\t4
+PUBLIC DOCUMENT COUNT:\t\t2
+CONFORMED PERIOD OF REPORT:\t20190911
+FILED AS OF DATE:\t\t20190913
+DATE AS OF CHANGE:\t\t20190913
+
+REPORTING-OWNER:\t
+
+\tOWNER DATA:\t
+\t\tCOMPANY CONFORMED NAME:\t\t\tDOE JOHN {seed}
+\t\tCENTRAL INDEX KEY:\t\t\t{owner_cik}
+</SEC-HEADER>
+<DOCUMENT>
+<TYPE>4
+<SEQUENCE>1
+<FILENAME>form4.xml
+<TEXT>
+<XML>
+<?xml version="1.0"?>
+<ownershipDocument>
+
+    <schemaVersion>X0306</schemaVersion>
+
+    <documentType>4</documentType>
+
+    <periodOfReport>2019-09-11</periodOfReport>
+
+    <notSubjectToSection16>0</notSubjectToSection16>
+
+    <issuer>
+        <issuerCik>{issuer_cik}</issuerCik>
+        <issuerName>Company &amp; Sons {seed}, Inc.</issuerName>
+        <issuerTradingSymbol>{ticker}</issuerTradingSymbol>
+    </issuer>
+
+    <reportingOwner>
+        <reportingOwnerId>
+            <rptOwnerCik>{owner_cik}</rptOwnerCik>
+            <rptOwnerName>Doe John {seed}</rptOwnerName>
+        </reportingOwnerId>
+        <reportingOwnerAddress>
+            <rptOwnerStreet1>1 MAIN ST</rptOwnerStreet1>
+            <rptOwnerCity>NEW YORK</rptOwnerCity>
+            <rptOwnerState>NY</rptOwnerState>
+            <rptOwnerZipCode>10001</rptOwnerZipCode>
+        </reportingOwnerAddress>
+        <reportingOwnerRelationship>
+            {relationship}
+        </reportingOwnerRelationship>
+    </reportingOwner>
+
+    <nonDerivativeTable>
+{transactions}
+    </nonDerivativeTable>
+
+    <derivativeTable>
+{derivative}
+    </derivativeTable>
+
+    <footnotes>
+        <footnote id="F1">Weighted average price, range of prices available upon request.</footnote>
+    </footnotes>
+
+    <ownerSignature>
+        <signatureName>/s/ Attorney-in-fact</signatureName>
+        <signatureDate>2019-09-13</signatureDate>
+    </ownerSignature>
+</ownershipDocument>
+</XML>
+</TEXT>
+</DOCUMENT>
+<DOCUMENT>
+<TYPE>EX-24
+<SEQUENCE>2
+<FILENAME>poa.txt
+<TEXT>
+POWER OF ATTORNEY
+Know all by these presents, that the undersigned hereby constitutes and appoints the attorney-in-fact.
+</TEXT>
+</DOCUMENT>
+</SEC-DOCUMENT>
+"""
+    return text.encode('utf-8')
+
+
+FORM_TYPES = ['10-K', '10-Q', '13F-HR', '3', '4', '4/A', '424B2', '5', '8-K', 'D', 'S-1', 'SC 13G', 'SC 13G/A']
+# Approximate share of each form type in EDGAR indices
+FORM_WEIGHTS = [2, 6, 3, 5, 40, 2, 20, 1, 10, 4, 1, 5, 1]
+COMPANY_WORDS = ['ACME', 'CAPITAL', 'HOLDINGS', 'PHARMACEUTICALS', 'SMITH JOHN', 'TECHNOLOGIES', 'BANCORP',
+                 'ENERGY', 'PARTNERS', 'L.P.', 'INC', 'TRUST', 'GLOBAL', 'FUND', 'DOE JANE A']
+
+
+def form_index(n_entries=1000, quarterly=False, seed=0, day=None):
+    """
+    EDGAR form index file, sorted by form type like the real ones.
+    :param n_entries: number of entries
+    :param quarterly: quarterly `full-index/form.idx` dates (YYYY-MM-DD) if True,
+                      daily `form.YYYYMMDD.idx` dates (YYYYMMDD) otherwise
+    :param day: datetime, date of daily index entries. DEFAULT: 2019-09-13
+    :return: bytes
+    """
+    rng = random.Random(seed)
+    forms = sorted(rng.choices(FORM_TYPES, FORM_WEIGHTS, k=n_entries))
+    lines = []
+    for i, form in enumerate(forms):
+        company = ' '.join(rng.sample(COMPANY_WORDS, rng.randint(1, 5)))[:60]
+        cik = rng.randint(1000, 1800000)
+        if quarterly:
+            date = f'2019-{rng.randint(7, 9):02d}-{rng.randint(1, 30):02d}'
+        else:
+            date = day.strftime('%Y%m%d') if day else '20190913'
+        path = f'edgar/data/{cik}/{cik:010d}-19-{i:06d}.txt'
+        lines.append(f'{form:<12}{company:<62}{cik:<12}{date:<12}{path}')
+
+    description = 'Master Index' if quarterly else 'Daily Index'
+    header = f"""Description:           {description} of EDGAR Dissemination Feed by Form Type
+Last Data Received:    September 30, 2019
+Comments:              webmaster@sec.gov
+Anonymous FTP:         ftp://ftp.sec.gov/edgar/
+ 
+ 
+ 
+ 
+Form Type   Company Name                                                  CIK         Date Filed  File Name
+{'-' * 141}
+"""
+    return (header + '\n'.join(lines) + '\n').encode('ascii')
+
+
+def feed_submission(seed=0, form_type='4'):
+    """
+    EDGAR feed `.nc` submission. Form 4 submissions carry the same document as `form4_submission`.
+    :return: tuple (accession, bytes)
+    """
+    rng = random.Random(seed)
+    accession = f'{rng.randint(1000000, 1800000):010d}-19-{seed % 1000000:06d}'
+    if form_type in ('4', '4/A'):
+        document = form4_submission(seed).split(b'</SEC-HEADER>\n', 1)[1]
+    else:
+        text = '\n'.join(f'Item {i}. ' + 'Lorem ipsum dolor sit amet. ' * rng.randint(10, 200) for i in range(20))
+        document = f'<DOCUMENT>\n<TYPE>{form_type}\n<SEQUENCE>1\n<TEXT>\n{text}\n</TEXT>\n</DOCUMENT>\n'.encode()
+    header = f"""<SUBMISSION>
+<ACCESSION-NUMBER>{accession}
+<TYPE>{form_type}
+<PUBLIC-DOCUMENT-COUNT>1
+<FILING-DATE>20190913
+<DATE-OF-FILING-DATE-CHANGE>20190913
+<FILER>
+<COMPANY-DATA>
+<CONFORMED-NAME>SYNTHETIC FILER {seed}
+<CIK>{rng.randint(1000, 1800000):010d}
+</COMPANY-DATA>
+</FILER>
+"""
+    return accession, header.encode() + document + b'</SUBMISSION>\n'
+
+
+def feed_archive(path, n_forms=100, n_other=100, seed=0):
+    """
+    Write EDGAR daily feed archive (`YYYYMMDD.nc.tar.gz`) with Form 4 and other submissions.
+    :return: list of accessions of Form 4 submissions in the archive order
+    """
+    rng = random.Random(seed)
+    form_types = ['4'] * n_forms + [rng.choice(['8-K', '10-Q', 'SC 13G', '424B2']) for _ in range(n_other)]
+    rng.shuffle(form_types)
+    accessions = []
+    with tarfile.open(path, 'w:gz') as archive:
+        for i, form_type in enumerate(form_types):
+            accession, data = feed_submission(seed * len(form_types) + i, form_type)
+            if form_type == '4':
+                accessions.append(accession)
+            member = tarfile.TarInfo(f'{accession}.nc')
+            member.size = len(data)
+            archive.addfile(member, io.BytesIO(data))
+    return accessions
+
+
+def alphavantage_payload(symbol, n_weeks=1000, seed=0, last_date='2019-09-13'):
+    """
+    AlphaVantage TIME_SERIES_WEEKLY_ADJUSTED response, dates in descending order like the real ones.
+    """
+    rng = random.Random(seed)
+    last = datetime.strptime(last_date, '%Y-%m-%d')
+    price = rng.uniform(5, 500)
+    series = {}
+    for week in range(n_weeks):
+        close = round(price, 4)
+        high = round(close * (1 + rng.uniform(0, 0.05)), 4)
+        low = round(close * (1 - rng.uniform(0, 0.05)), 4)
+        series[(last - timedelta(weeks=week)).strftime('%Y-%m-%d')] = {
+            '1. open': f'{round(rng.uniform(low, high), 4):.4f}',
+            '2. high': f'{high:.4f}',
+            '3. low': f'{low:.4f}',
+            '4. close': f'{close:.4f}',
+            '5. adjusted close': f'{close * 0.98:.4f}',
+            '6. volume': str(rng.randint(10000, 10000000)),
+            '7. dividend amount': '0.0000' if rng.random() < 0.9 else f'{rng.uniform(0.1, 1):.4f}'}
+        price = max(1., price * (1 + rng.gauss(0, 0.03)))
+
+    return {'Meta Data': {'1. Information': 'Weekly Adjusted Prices and Volumes',
+                          '2. Symbol': symbol,
+                          '3. Last Refreshed': last_date,
+                          '4. Time Zone': 'US/Eastern'},
+            'Weekly Adjusted Time Series': series}
+
+
+def ticker_symbols(n):
+    """
+    `n` distinct alphabetic ticker symbols.
+    """
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    symbols = []
+    for i in range(n):
+        symbol = ''
+        i += 26
+        while i:
+            i, rest = divmod(i, 26)
+            symbol = letters[rest] + symbol
+        symbols.append(symbol)
+    return symbols
+
+
+def filings_rows(symbols, n_rows=100000, seed=0, start='2010-01-01', end='2019-09-13'):
+    """
+    Filings database rows ordered as `FILINGS_COLUMNS`, sorted by report date.
+    """
+    rng = random.Random(seed)
+    first = datetime.strptime(start, '%Y-%m-%d')
+    n_days = (datetime.strptime(end, '%Y-%m-%d') - first).days
+    report_dates = sorted(first + timedelta(days=rng.randrange(n_days)) for _ in range(n_rows))
+    rows = []
+    for report_date in report_dates:
+        row = dict.fromkeys(FILINGS_COLUMNS, '')
+        row[REPORT_DATE] = report_date.strftime('%Y-%m-%d')
+        row[TICKER] = rng.choice(symbols)
+        row[AQUIRED] = rng.choice('AD')
+        row[AMOUNT] = str(rng.randint(100, 100000))
+        row[PRICE_PER_UNIT] = f'{rng.uniform(5, 500):.2f}'
+        rows.append([row[column] for column in FILINGS_COLUMNS])
+    return rows
+
+
+def zipf_weights(n, skew=1.1):
+    """
+    Probabilities of `n` items following Zipf's law, the first item is the most frequent.
+    """
+    weights = 1. / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+def filings_frame(symbols, n_rows=1000000, seed=0, start='2010-01-01', end='2019-09-13', skew=1.1):
+    """
+    Filings database with `FILINGS_COLUMNS`, sorted by report date.
+    Ticker frequencies follow Zipf's law like real insider activity, about 1% of prices per unit are reported
+    for the whole amount, see `feature_engineering.process_ppu_outliers`.
+    """
+    rng = np.random.default_rng(seed)
+    first = np.datetime64(start, 'D')
+    report_dates = np.sort(first + rng.integers(0, (np.datetime64(end, 'D') - first).astype(int), n_rows))
+    issuers = rng.choice(len(symbols), n_rows, p=zipf_weights(len(symbols), skew))
+    owners = rng.integers(1000, 2000000, n_rows)
+    amount = rng.integers(1, 1000, n_rows) * 100.
+    holding_before = np.where(rng.random(n_rows) < 0.05, 0., amount * rng.uniform(0.5, 50, n_rows).round())
+    aquired = rng.choice(np.array(['A', 'D']), n_rows)
+    price = rng.lognormal(3.5, 1., n_rows).round(2)
+    price = np.where(rng.random(n_rows) < 0.01, price * amount, price)
+    flags = np.array(['true', 'false', '1', '0'])
+
+    return pd.DataFrame({
+        REPORT_DATE: np.datetime_as_string(report_dates),
+        OWNER_CIK: owners,
+        OWNER_NAME: np.char.add('OWNER ', owners.astype(str)),
+        IS_DIRECTOR: flags[rng.integers(0, 4, n_rows)],
+        IS_OFFICER: flags[rng.integers(0, 4, n_rows)],
+        IS_MAJOR_OWNER: flags[rng.integers(0, 4, n_rows)],
+        IS_OTHER: flags[rng.integers(0, 4, n_rows)],
+        COMMENTS: '',
+        ISSUER_CIK: issuers + 1000,
+        ISSUER_COMPANY: np.char.add(np.asarray(symbols)[issuers], ' INC'),
+        TICKER: np.asarray(symbols)[issuers],
+        EQUITY: np.asarray(SECURITIES)[rng.integers(0, len(SECURITIES), n_rows)],
+        TRANSACTION_DATE: np.datetime_as_string(report_dates - rng.integers(0, 3, n_rows)),
+        AQUIRED: aquired,
+        AMOUNT: amount,
+        PRICE_PER_UNIT: price,
+        HOLDING_BEFORE: holding_before,
+        HOLDING_AFTER: np.where(aquired == 'A', holding_before + amount, np.maximum(holding_before - amount, 0.)),
+        OWNERSHIP_STATUS: rng.choice(np.array(['D', 'I']), n_rows, p=[0.8, 0.2]),
+        OWNERSHIP_NATURE: '',
+    }, columns=FILINGS_COLUMNS)
+
+
+def price_columns(n_bars=520, freq='W', seed=0, last_date='2019-09-13'):
+    """
+    Market data columns (see `market_store.load`) of a geometric random walk.
+    :param n_bars: number of bars
+    :param freq: `W` for weekly bars ending on Fridays, `D` for daily bars on business days
+    :return: dict of arrays sorted by date
+    """
+    rng = np.random.default_rng(seed)
+    last = np.datetime64(last_date, 'D')
+    if freq == 'W':
+        dates = last - 7 * np.arange(n_bars)[::-1]
+    else:
+        dates = np.busday_offset(last, -np.arange(n_bars)[::-1], roll='backward')
+    sigma = 0.03 if freq == 'W' else 0.013
+    close = (rng.uniform(5, 500) * np.exp(np.cumsum(rng.normal(0, sigma, n_bars)))).round(4)
+    high = (close * (1 + rng.uniform(0, 0.05, n_bars))).round(4)
+    low = (close * (1 - rng.uniform(0, 0.05, n_bars))).round(4)
+    dividends = np.where(rng.random(n_bars) < 0.05, rng.uniform(0.1, 1, n_bars).round(4), 0.)
+    return {DATE: dates,
+            OPEN: rng.uniform(low, high).round(4),
+            CLOSE: close,
+            HIGH: high,
+            LOW: low,
+            VOLUME: rng.integers(10000, 10000000, n_bars).astype(np.float64),
+            ADJUSTED_CLOSE: (close * 0.98).round(4),
+            DIVIDEND_AMOUNT: dividends}
+
+
+def payload_from_columns(symbol, columns, last_refreshed='2019-09-13'):
+    """
+    AlphaVantage TIME_SERIES_WEEKLY_ADJUSTED response of the columns, dates in descending order.
+    """
+    items = ['1. open', '2. high', '3. low', '4. close', '5. adjusted close', '6. volume', '7. dividend amount']
+    values = np.stack([columns[item[3:]] for item in items], axis=1)[::-1]
+    dates = np.datetime_as_string(columns[DATE][::-1])
+    series = {date: {item: f'{value:.4f}' for item, value in zip(items, row)}
+              for date, row in zip(dates, values.tolist())}
+    return {'Meta Data': {'1. Information': 'Weekly Adjusted Prices and Volumes',
+                          '2. Symbol': symbol,
+                          '3. Last Refreshed': last_refreshed,
+                          '4. Time Zone': 'US/Eastern'},
+            'Weekly Adjusted Time Series': series}
+
+
+def write_price_files(root, symbols, n_bars=520, freq='W', fmt='npz', seed=0):
+    """
+    Write per-ticker market data files, `<TICKER>.npz` (see `market_store`) or AlphaVantage `<TICKER>.json`.
+    """
+    from insider_trading import market_store
+
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    for i, symbol in enumerate(symbols):
+        columns = price_columns(n_bars, freq, seed + i)
+        if fmt == 'json':
+            with open(root / (symbol + market_store.JSON_SUFFIX), 'w') as fout:
+                json.dump(payload_from_columns(symbol, columns), fout)
+        else:
+            market_store.write(root, columns, {market_store.SYMBOL: symbol, market_store.LAST_REFRESHED: '2019-09-13'})
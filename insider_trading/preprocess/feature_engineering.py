@@ -6,6 +6,7 @@ from datetime import timedelta
 import numpy as np
 import pandas as pd
 
+from insider_trading import schema
 from insider_trading.config import *
 
 DATE_FORMAT = '%Y-%m-%d'
@@ -20,16 +21,41 @@ def add_adjusted(df):
 
 
 def add_ma(df, cols=[ADJUSTED_CLOSE, ADJUSTED_HIGH, ADJUSTED_LOW],
-           window=4, shift=True):
+           window=4, shift=True, by=None):
     """
     Add moving average for each column in `cols`.
     If `shift` is True, shifts MA columns backward by window / 2.
+    If `by` is given, moving averages are computed within each group of rows, e.g. per `TICKER` for
+    market data of several tickers.
     """
     for c in cols:
         c_name = f'{c}_ma_{window}'
-        df[c_name] = df[c].rolling(window=window).mean()
-        if shift:
-            df[c_name] = df[c_name].shift(-window // 2)
+        if by is None:
+            df[c_name] = df[c].rolling(window=window).mean()
+            if shift:
+                df[c_name] = df[c_name].shift(-window // 2)
+        else:
+            ma = df.groupby(by, sort=False)[c].rolling(window=window).mean()
+            df[c_name] = ma.reset_index(level=0, drop=True)
+            if shift:
+                df[c_name] = df.groupby(by, sort=False)[c_name].shift(-window // 2)
+
+
+def add_market_features(df, cols, by=TICKER):
+    """
+    Add columns `cols` missing in market data, works inplace.
+    Supports adjusted high and low and moving averages named `<column>_ma_<window>`.
+    :param df: market data of one or several tickers, rows of each ticker sorted by date
+    :param cols: columns to add
+    :param by: column grouping rows of a ticker, None for a single ticker
+    """
+    if {ADJUSTED_HIGH, ADJUSTED_LOW} & set(cols + [c.rsplit('_ma_', 1)[0] for c in cols]):
+        add_adjusted(df)
+    for c in cols:
+        if c in df.columns:
+            continue
+        base, _, window = c.rpartition('_ma_')
+        add_ma(df, [base], window=int(window), by=by)
 
 
 def shift_price_date(df, tdelta=timedelta(days=180), cols=None):
@@ -45,26 +71,77 @@ def shift_price_date(df, tdelta=timedelta(days=180), cols=None):
 
     df_shifted = df[cols].copy()
     df_shifted[DATE] = pd.to_datetime(df_shifted[DATE], format=DATE_FORMAT)
-    df_shifted[SHIFTED_DATE] = df_shifted[DATE].apply(lambda x: x - tdelta)
+    df_shifted[SHIFTED_DATE] = df_shifted[DATE] - tdelta
 
     return df_shifted
 
 
-def add_shifted(df, date_col=DATE, cols=[ADJUSTED_CLOSE], dt_days=180):
+def _merge_shifted(df, market_df, cols, dt_days, by=TICKER):
+    """
+    Merge `cols` of market data `dt_days` after the report date, rows without market data are dropped.
+    """
+    keys = [DATE, by] if by else [DATE]
+    df_shifted = shift_price_date(market_df, tdelta=timedelta(days=dt_days), cols=cols + keys)
+    df_shifted.rename(columns={col: col + f'_{dt_days}' for col in cols}, inplace=True)
+    df_shifted.drop(DATE, axis=1, inplace=True)
+    df_shifted = df_shifted.sort_values(by=SHIFTED_DATE)
+    if by:
+        schema.match_categories(df_shifted, df, by)
+    df_new = pd.merge_asof(df, df_shifted, by=by, left_on=REPORT_DATE, right_on=SHIFTED_DATE,
+                           tolerance=pd.Timedelta(days=7))
+
+    df_new = df_new[~df_new[SHIFTED_DATE].isnull()]
+    df_new.drop(SHIFTED_DATE, axis=1, inplace=True)
+    return df_new
+
+
+def add_shifted_from_panel(df, panel, cols=[ADJUSTED_CLOSE], dt_days=180):
+    """
+    Add `dt_days` shifted data from `cols` to the dataframe, reading market data from the price panel.
+    Unlike `add_shifted`, shifted prices are looked up in the whole market history of the tickers, not only on
+    the report dates of the dataframe. S&P500 columns (`SPX_ADJUSTED_CLOSE*`) are read from the `SPX` ticker.
+    :param df: dataframe sorted by report date
+    :param panel: `price_panel.PricePanel`
+    :param cols: columns to shift, market data columns or features supported by `add_market_features`
+    :param dt_days: timedelta, how much time backward to shift
+    :return: dataframe with added columns
+    """
+    df_new = df.copy()
+    df_new[REPORT_DATE] = pd.to_datetime(df[REPORT_DATE], format=DATE_FORMAT).astype('datetime64[ns]')
+
+    spx_cols = [c for c in cols if c.startswith(SPX_ADJUSTED_CLOSE)]
+    stock_cols = [c for c in cols if c not in spx_cols]
+    if stock_cols:
+        market_df = panel.frame(df_new[TICKER].unique())
+        add_market_features(market_df, stock_cols)
+        df_new = _merge_shifted(df_new, market_df, stock_cols, dt_days)
+    if spx_cols:
+        spx_df = panel.frame(['SPX']).rename(columns={ADJUSTED_CLOSE: SPX_ADJUSTED_CLOSE})
+        add_market_features(spx_df, spx_cols, by=None)
+        df_new = _merge_shifted(df_new, spx_df, spx_cols, dt_days, by=None)
+
+    return df_new
+
+
+def add_shifted(df, date_col=DATE, cols=[ADJUSTED_CLOSE], dt_days=180, panel=None):
     """
     Add `dt_days` shifted data from `cols` to the dataframe.
     :param df: dataframe
     :param date_col: column name of date to shift
     :param cols: columns to shift, excluding date column
     :param dt_days: timedelta, how much time backward to shift
+    :param panel: `price_panel.PricePanel` to read market data from, see `add_shifted_from_panel`.
+                  If None, shifted data is looked up in the dataframe itself.
     :return: dataframe with added columns
     """
+    if panel is not None:
+        return add_shifted_from_panel(df, panel, cols, dt_days)
+
     shifted_cols = cols + [TICKER]
     df_shifted = shift_price_date(df, tdelta=timedelta(days=dt_days), cols=shifted_cols+[date_col])
     df_shifted.rename(columns={col: col + f'_{dt_days}' for col in cols}, inplace=True)
 
-    df_new = df.copy()
-    df_new[REPORT_DATE] = pd.to_datetime(df[REPORT_DATE], format=DATE_FORMAT)
+    df_new = df.assign(**{REPORT_DATE: pd.to_datetime(df[REPORT_DATE], format=DATE_FORMAT)})
 
     df_shifted.drop(DATE, axis=1, inplace=True)
     df_shifted = df_shifted.sort_values(by=SHIFTED_DATE)
@@ -93,11 +170,11 @@ def add_gains(df, new_col='adjusted close_ma_4_180', ref_col='adjusted close_ma_
     change_col_rel = f'{new_col_name},%'
 
     df[change_col] = df[new_col] - df[ref_col]
-    df[sell][change_col] *= -1
+    df.loc[sell, change_col] *= -1
 
     if perc:
         df[change_col_rel] = (df[new_col] - df[ref_col]) / df[ref_col]
-        df[sell][change_col_rel] *= -1
+        df.loc[sell, change_col_rel] *= -1
 
     return df
 
@@ -115,16 +192,18 @@ def process_ppu_outliers(df, thr=6000., tol=0.5, replace=True):
     :return:
     """
     df_slice = df[df[PRICE_PER_UNIT] > thr]
-    df_slice['NORM_PPU'] = df_slice[PRICE_PER_UNIT] / df_slice[AMOUNT]
+    norm_ppu = df_slice[PRICE_PER_UNIT] / df_slice[AMOUNT]
 
-    tol_cond = abs(df_slice['NORM_PPU'] - df_slice[ADJUSTED_CLOSE]) / df_slice['NORM_PPU'] < tol
+    tol_cond = abs(norm_ppu - df_slice[ADJUSTED_CLOSE]) / norm_ppu < tol
     ids = df_slice.index[tol_cond]
     nan_ids = df_slice.index[~tol_cond]
 
     data = df.copy()
-    data.loc[ids, PRICE_PER_UNIT] = df_slice.loc[ids]['NORM_PPU']
+    # Prices keep their type, e.g. float32 (see `schema`)
+    dtype = df[PRICE_PER_UNIT].dtype
+    data.loc[ids, PRICE_PER_UNIT] = norm_ppu.loc[ids].astype(dtype)
     if replace:
-        data.loc[nan_ids, PRICE_PER_UNIT] = df_slice.loc[nan_ids][ADJUSTED_CLOSE]
+        data.loc[nan_ids, PRICE_PER_UNIT] = df_slice.loc[nan_ids, ADJUSTED_CLOSE].astype(dtype)
     else:
         data.loc[nan_ids, PRICE_PER_UNIT] = np.nan
 
@@ -155,12 +234,12 @@ def add_holding_change_perc(df, new_col='HOLDING_CHANGE,%', cap=False):
     :return: dataframe with additional holding change column
     """
     df[new_col] = df[AMOUNT] / df[HOLDING_BEFORE]
-    df[new_col].loc[df[AMOUNT] == 0] = 0
-    df[new_col].loc[(df[AMOUNT] != 0) & (df[HOLDING_BEFORE] == 0)] = 1.
+    df.loc[df[AMOUNT] == 0, new_col] = 0
+    df.loc[(df[AMOUNT] != 0) & (df[HOLDING_BEFORE] == 0), new_col] = 1.
 
     if cap:
         large = df[new_col] > 1.
-        df[new_col].loc[large] = 1.
+        df.loc[large, new_col] = 1.
 
     return df
 
@@ -174,6 +253,20 @@ def _replace_bools(x):
     return x
 
 
+def replace_bools(values):
+    """
+    Replace 'true' / '1' with 1 and 'false' / '0' with 0, other values are kept.
+    Each distinct value is replaced once, the column has only a few of them.
+    :param values: series
+    :return: series
+    """
+    if not len(values) or values.dtype == schema.FLAG:
+        return values
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    replaced = pd.Series([_replace_bools(x) for x in uniques], dtype=object).infer_objects().to_numpy()
+    return pd.Series(replaced[codes], index=values.index, name=values.name)
+
+
 def process_booleans(df):
     """
     Format booleans as 0/1 integers.
@@ -182,7 +275,8 @@ def process_booleans(df):
     """
     boolean_cols = [IS_DIRECTOR, IS_OFFICER, IS_MAJOR_OWNER, IS_OTHER]
 
-    df[boolean_cols] = df[boolean_cols].applymap(_replace_bools)
+    for col in boolean_cols:
+        df[col] = replace_bools(df[col])
 
     return df
 
@@ -191,7 +285,7 @@ def process_aquired(df):
     """
     Binarize aquired/disposed column.
     """
-    df[AQUIRED] = df[AQUIRED].apply(lambda x: 1 if x == 'A' else 0)
+    df[AQUIRED] = (df[AQUIRED] == 'A').astype(int)
 
     return df
 
@@ -200,6 +294,6 @@ def process_direct_ownership(df):
     """
     Binarize direct ownership column.
     """
-    df[IS_DIRECT_OWNER] = df[OWNERSHIP_STATUS].apply(lambda x: 1 if x == 'D' else 0)
+    df[IS_DIRECT_OWNER] = (df[OWNERSHIP_STATUS] == 'D').astype(int)
 
     return df
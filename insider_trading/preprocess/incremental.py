@@ -0,0 +1,192 @@
+"""
+Incremental merge of filings with market data.
+
+The merge state is saved next to the output (`<output>.state.npz`):
+    processed  hashes of all filings merged so far, including the ones without market data
+    rows       hash of the filing of each output row, in the output order
+    meta       json with merge parameters and the market data version of each ticker
+
+On update only new filings and all filings of tickers whose market data changed are merged, the other rows are
+kept from the previous output. S&P500 columns are merged again for all rows when its market data changed.
+"""
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from insider_trading import market_store, price_panel, schema
+from insider_trading.database import filings
+from insider_trading.metrics import get_metrics
+from insider_trading.preprocess import merge
+from insider_trading.config import *
+
+STATE_SUFFIX = '.state.npz'
+SP500 = 'SPX'
+
+LOG = logging.getLogger(__name__)
+
+
+def state_path(output):
+    output = Path(output)
+    return output.with_name(output.name + STATE_SUFFIX)
+
+
+def load_state(path):
+    """
+    :return: tuple (processed filings hashes, output rows hashes, dict of metadata), None if there is no state
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    with np.load(path) as data:
+        return data['processed'], data['rows'], json.loads(str(data['meta']))
+
+
+def save_state(path, processed, rows, meta):
+    """
+    Atomically save the merge state.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as fout:
+        np.savez(fout, processed=processed, rows=rows, meta=np.array(json.dumps(meta)))
+    os.replace(tmp_path, path)
+
+
+def hash_filings(forms_df):
+    """
+    :return: uint64 hash of each filing row
+    """
+    return pd.util.hash_pandas_object(forms_df, index=False).to_numpy()
+
+
+def ticker_version(symbol, market_root, panel=None):
+    """
+    Version of the ticker market data, changes when the ticker is refreshed.
+    :return: string, None if there is no market data
+    """
+    if panel is not None and symbol in panel:
+        return json.dumps(panel.index[symbol])
+    for suffix in [market_store.SUFFIX, market_store.JSON_SUFFIX]:
+        path = Path(market_root) / (str(symbol) + suffix)
+        if path.exists():
+            stat = path.stat()
+            return f'{suffix}:{stat.st_mtime_ns}:{stat.st_size}'
+    return None
+
+
+def read_output(path):
+    """
+    Load merged data saved as .csv or .parquet, columns have `schema` types.
+    """
+    path = Path(path)
+    if path.suffix == '.parquet':
+        return schema.apply(pd.read_parquet(path))
+    return schema.read_csv(path)
+
+
+def write_output(df, path):
+    """
+    Atomically save merged data as .csv or .parquet, depending on the file extension.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    if path.suffix == '.parquet':
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def update(forms_path, market_root, output, ma_windows=[], ma_cols=[ADJUSTED_CLOSE, ADJUSTED_HIGH, ADJUSTED_LOW],
+           add_sp500=True, start=None, end=None, panel=None, workers=0):
+    """
+    Update merged output with new filings and refreshed market data, see `merge.merge_forms_market`.
+    Everything is merged again if there is no state or merge parameters changed.
+    :param output: merged data file (.csv or .parquet), its state is saved next to it
+    :return: tuple (number of merged filings, number of output rows)
+    """
+    if panel is not None and not isinstance(panel, price_panel.PricePanel):
+        panel = price_panel.PricePanel(panel)
+    params = {'market': str(panel.path if panel is not None else market_root), 'ma_windows': list(ma_windows),
+              'ma_cols': list(ma_cols), 'add_sp500': add_sp500, 'start': start, 'end': end}
+
+    metrics = get_metrics()
+    with metrics.timer('stage', stage='read_filings'):
+        forms_df = filings.read_filings(forms_path, start=start, end=end)
+        forms_df.drop_duplicates(inplace=True)
+        forms_df.reset_index(drop=True, inplace=True)
+        hashes = hash_filings(forms_df)
+    metrics.inc('rows', len(forms_df), stage='read_filings')
+    versions = {symbol: ticker_version(symbol, market_root, panel) for symbol in set(forms_df[TICKER])}
+    sp500_version = ticker_version(SP500, market_root, panel) if add_sp500 else None
+
+    state = load_state(state_path(output))
+    if state is not None and (state[2]['params'] != params or not Path(output).exists()):
+        LOG.info('Merge parameters changed, merging all filings')
+        state = None
+
+    if state is None:
+        processed, rows = np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.uint64)
+        previous_versions, previous_sp500 = {}, None
+        old_df = None
+    else:
+        processed, rows, meta = state
+        previous_versions, previous_sp500 = meta['tickers'], meta['sp500']
+        with metrics.timer('stage', stage='read_output'):
+            old_df = read_output(output)
+
+    changed = {symbol for symbol, version in versions.items() if previous_versions.get(symbol) != version}
+    new = ~np.isin(hashes, processed)
+    delta = new | np.isin(forms_df[TICKER].to_numpy(), list(changed))
+    LOG.info(f'Merging {np.count_nonzero(delta)} filings: {np.count_nonzero(new)} new, '
+             f'{len(changed)} tickers with new market data')
+
+    # S&P500 is merged later for the whole output if it changed
+    sp500_changed = add_sp500 and sp500_version != previous_sp500
+    if delta.any():
+        delta_df = forms_df[delta]
+        # Market data of tickers of the delta only
+        with metrics.timer('stage', stage='load_market'):
+            market_df = merge.load_market(set(delta_df[TICKER]), market_root, ma_windows, ma_cols, panel, workers)
+        metrics.inc('rows', len(market_df), stage='load_market')
+        with metrics.timer('stage', stage='merge'):
+            delta_df = merge.merge_frames(delta_df, market_df, market_root, add_sp500 and not sp500_changed, panel)
+            found = ~delta_df[DATE].isnull().to_numpy()
+            delta_df = delta_df[found]
+        delta_rows = hashes[delta][found]
+        metrics.inc('rows', len(delta_df), stage='merge')
+    else:
+        delta_df, delta_rows = None, np.empty(0, dtype=np.uint64)
+
+    if old_df is not None:
+        # Rows of filings removed from the database and of refreshed tickers are replaced
+        keep = np.isin(rows, hashes) & ~np.isin(old_df[TICKER].to_numpy(), list(changed))
+        old_df = old_df[keep]
+        if sp500_changed:
+            old_df = old_df.drop(columns=[SPX_DATE, SPX_ADJUSTED_CLOSE, f'{SPX_ADJUSTED_CLOSE}_ma_4'], errors='ignore')
+        # Categories of the two parts differ, they are merged again
+        merged_df = schema.apply(pd.concat([old_df, delta_df], ignore_index=True)) if delta_df is not None else old_df
+        rows = np.concatenate([rows[keep], delta_rows])
+    elif delta_df is not None:
+        merged_df = delta_df.reset_index(drop=True)
+        rows = delta_rows
+    else:
+        raise ValueError(f'No filings to merge in {forms_path}')
+
+    # Same order as a full merge: filings database order
+    order = np.argsort(pd.Index(hashes).get_indexer(rows), kind='stable')
+    merged_df = merged_df.iloc[order].reset_index(drop=True)
+    rows = rows[order]
+    if sp500_changed:
+        merged_df = merge.add_sp500_data(merged_df, market_root, panel)
+
+    with metrics.timer('stage', stage='write'):
+        write_output(merged_df, output)
+    meta = {'params': params, 'tickers': {str(symbol): version for symbol, version in versions.items()},
+            'sp500': sp500_version}
+    save_state(state_path(output), np.unique(hashes), rows, meta)
+    return len(delta_rows), len(merged_df)
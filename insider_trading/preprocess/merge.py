@@ -1,15 +1,24 @@
 """
 Merge all data pieces into a single dataframe, that can be than used for modeling.
 """
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from itertools import repeat
 import json
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+from insider_trading import market_store, price_panel, schema
+from insider_trading.database import filings
+from insider_trading.metrics import get_metrics
 from insider_trading.preprocess import feature_engineering as feat_eng
 from insider_trading.config import *
 
+# Tickers loaded by a worker at a time
+CHUNK_SIZE = 100
+
 
 def json_to_csv(symbol, data_root):
     """
@@ -47,65 +56,213 @@ def json_to_csv(symbol, data_root):
     return csv_data
 
 
+def load_market_data(symbol, data_root):
+    """
+    Load ticker market data from the market store, or from AlphaVantage .json file if it's not migrated yet.
+    :param symbol: string, ticker symbol
+    :param data_root: path to the data location
+    :return: data frame sorted by date
+    """
+    if market_store.exists(data_root, symbol):
+        return market_store.load_frame(data_root, symbol)
+
+    df = json_to_csv(symbol, data_root)
+    df[DATE] = df[DATE].astype('datetime64[ns]')
+    return df
+
+
+def load_tickers(symbols, market_root, ma_windows=[], ma_cols=[ADJUSTED_CLOSE, ADJUSTED_HIGH, ADJUSTED_LOW]):
+    """
+    Load market data of the tickers and add features.
+    Results are plain arrays, cheap to send back from a worker process.
+    :param symbols: ticker symbols
+    :param market_root: path to the folder storing market data
+    :param ma_windows: moving average windows to add
+    :param ma_cols: columns to compute moving average for
+    :return: tuple (dict of columns of all tickers in `symbols` order, list of tuples (symbol, error message))
+    """
+    frames = []
+    errors = []
+    for symb in symbols:
+        try:
+            df = load_market_data(symb, market_root)
+        except Exception as e:
+            errors.append((symb, str(e)))
+            continue
+        feat_eng.add_adjusted(df)
+        for window in ma_windows:
+            feat_eng.add_ma(df, ma_cols, window)
+        frames.append(df)
+
+    if not frames:
+        return {}, errors
+    market_df = pd.concat(frames)
+    return {c: market_df[c].to_numpy() for c in market_df.columns}, errors
+
+
+def load_market_frame(symbols, market_root, ma_windows=[], ma_cols=[ADJUSTED_CLOSE, ADJUSTED_HIGH, ADJUSTED_LOW],
+                      executor=None):
+    """
+    Load market data of the tickers with features in one data frame, in chunks of tickers on the `executor`.
+    Rows are in `symbols` order whatever the executor is.
+    :param executor: `concurrent.futures.Executor`, tickers are loaded in the current process if None
+    :return: data frame, without rows if no ticker has market data
+    """
+    if executor is None:
+        results = [load_tickers(symbols, market_root, ma_windows, ma_cols)]
+    else:
+        chunks = [symbols[i:i + CHUNK_SIZE] for i in range(0, len(symbols), CHUNK_SIZE)]
+        results = executor.map(load_tickers, chunks, repeat(market_root), repeat(ma_windows), repeat(ma_cols))
+
+    chunks = []
+    for columns, errors in results:
+        for symb, error in errors:
+            print(f"Error loading {symb}: {error}")
+        if columns:
+            chunks.append(columns)
+
+    if not chunks:
+        # E.g. new tickers whose market data is not downloaded yet
+        return empty_market_frame(ma_windows, ma_cols)
+    return pd.DataFrame({c: np.concatenate([chunk[c] for chunk in chunks]) for c in chunks[0]})
+
+
+def empty_market_frame(ma_windows=[], ma_cols=[ADJUSTED_CLOSE, ADJUSTED_HIGH, ADJUSTED_LOW]):
+    """
+    Market data frame without rows, with the columns of `load_tickers` results.
+    """
+    df = pd.DataFrame({c: np.empty(0, dtype='datetime64[ns]' if c == DATE else np.float64)
+                       for c in market_store.COLUMNS})
+    df[TICKER] = pd.Series(dtype=object)
+    feat_eng.add_adjusted(df)
+    for window in ma_windows:
+        feat_eng.add_ma(df, ma_cols, window)
+    return df
+
+
+def load_panel_market_data(panel, symbols, ma_windows=[], ma_cols=[ADJUSTED_CLOSE, ADJUSTED_HIGH, ADJUSTED_LOW]):
+    """
+    Load market data of the tickers from the price panel in one data frame and add features.
+    :param panel: `price_panel.PricePanel`
+    :param symbols: ticker symbols
+    :return: data frame
+    """
+    missing = [symb for symb in symbols if symb not in panel]
+    if missing:
+        print(f"No market data for {len(missing)} tickers: {missing[:10]}")
+    market_df = panel.frame(symbols)
+    feat_eng.add_adjusted(market_df)
+    for window in ma_windows:
+        feat_eng.add_ma(market_df, ma_cols, window, by=TICKER)
+    return market_df
+
+
+def load_market(symbols, market_root, ma_windows=[], ma_cols=[ADJUSTED_CLOSE, ADJUSTED_HIGH, ADJUSTED_LOW],
+                panel=None, workers=0):
+    """
+    Load market data of the tickers with features, sorted by date.
+    :param symbols: ticker symbols
+    :param market_root: path to the folder storing market data
+    :param panel: `price_panel.PricePanel` to load market data from instead of per-ticker files in `market_root`
+    :param workers: number of processes loading per-ticker files, 0 loads them in the current process
+    :return: data frame with `schema` types
+    """
+    symbols = sorted(symbols, key=str)
+    if panel is not None:
+        market_df = load_panel_market_data(panel, symbols, ma_windows, ma_cols)
+    elif workers:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            market_df = load_market_frame(symbols, market_root, ma_windows, ma_cols, executor)
+    else:
+        market_df = load_market_frame(symbols, market_root, ma_windows, ma_cols)
+    market_df.sort_values(by=DATE, inplace=True)
+    return schema.apply(market_df)
+
+
+def add_sp500_data(merged_df, market_root, panel=None):
+    """
+    Merge S&P500 benchmark adjusted close and its 4 weeks moving average to the report dates.
+    :param merged_df: data frame sorted by report date
+    :return: merged data frame
+    """
+    if panel is not None and 'SPX' in panel:
+        df = panel.frame(['SPX'])
+    else:
+        df = load_market_data('SPX', market_root)
+    feat_eng.add_ma(df, [ADJUSTED_CLOSE], window=4)
+    df.rename(columns={ADJUSTED_CLOSE: SPX_ADJUSTED_CLOSE,
+                       f'{ADJUSTED_CLOSE}_ma_4': f'{SPX_ADJUSTED_CLOSE}_ma_4',
+                       DATE: SPX_DATE}, inplace=True)
+    df.sort_values(by=SPX_DATE, inplace=True)
+    return schema.apply(pd.merge_asof(merged_df, df[[SPX_DATE, SPX_ADJUSTED_CLOSE, f'{SPX_ADJUSTED_CLOSE}_ma_4']],
+                                      left_on=REPORT_DATE, right_on=SPX_DATE,
+                                      tolerance=pd.Timedelta(days=7)))
+
+
+def merge_frames(forms_df, market_df, market_root=None, add_sp500=True, panel=None):
+    """
+    Merge filings with market data of the week of the report.
+    :param forms_df: filings data frame sorted by report date
+    :param market_df: market data sorted by date, see `load_market`
+    :return: merged data frame with `schema` types, one row per filing in the same order, including filings
+             without market data. Ownership flags are 0 / 1 (missing flags are 0), market prices and their moving
+             averages are float64.
+    """
+    forms_df = schema.apply(forms_df.copy())
+    # Tickers are merged by category codes
+    market_df = schema.match_categories(market_df.copy(), forms_df, TICKER)
+
+    merged_df = schema.apply(pd.merge_asof(forms_df, market_df,
+                                           by=TICKER, left_on=REPORT_DATE, right_on=DATE,
+                                           tolerance=pd.Timedelta(days=7)))
+    if add_sp500:
+        merged_df = add_sp500_data(merged_df, market_root, panel)
+    return merged_df
+
+
 def merge_forms_market(forms_csv, market_root, ma_windows=[],
                        ma_cols=[ADJUSTED_CLOSE, ADJUSTED_HIGH, ADJUSTED_LOW],
-                       add_sp500=True):
+                       add_sp500=True, start=None, end=None, panel=None, workers=0):
     """
     Merge form filings data with market data.
     Adds adjusted high and low, keeps all other columns from market data.
-    :param forms_csv: path to the csv file storing forms filing info.
+    :param forms_csv: path to the filings database (csv file or parquet folder).
     :param market_root: path to the folder storing market data.
     :param ma_windows: moving average windows to add
     :param ma_cols: columns to compute moving average for
     :param add_sp500: boolean, include S&P500 benchmark or not
+    :param start: first report date to merge, inclusive
+    :param end: last report date to merge, inclusive
+    :param panel: `price_panel.PricePanel` or path to the panel file to load market data from instead of
+                  per-ticker files in `market_root`
+    :param workers: number of processes loading per-ticker files, 0 loads them in the current process
     :return: merged data frame
     """
 
+    metrics = get_metrics()
+
     # load forms data
-    forms_df = pd.read_csv(forms_csv)
-    forms_symb = set(forms_df[TICKER])
+    with metrics.timer('stage', stage='read_filings'):
+        forms_df = filings.read_filings(forms_csv, start=start, end=end)
 
-    # drop duplicated
-    forms_df.drop_duplicates(inplace=True)
+        # drop duplicated
+        forms_df.drop_duplicates(inplace=True)
+    metrics.inc('rows', len(forms_df), stage='read_filings')
 
     # load market data
-    market_df = []
-
-    for symb in forms_symb:
-        try:
-            df = json_to_csv(symb, market_root)
-        except Exception as e:
-            print(f"Error loading {symb}: {e}")
-            continue
-        feat_eng.add_adjusted(df)
-        for window in ma_windows:
-            feat_eng.add_ma(df, ma_cols, window)
-        market_df.append(df)
-
-    market_df = pd.concat(market_df)
-    market_df.sort_values(by=DATE, inplace=True)
-
-    # Parse dates
-    forms_df[REPORT_DATE] = pd.to_datetime(forms_df[REPORT_DATE])
+    if panel is not None and not isinstance(panel, price_panel.PricePanel):
+        panel = price_panel.PricePanel(panel)
+    with metrics.timer('stage', stage='load_market'):
+        market_df = load_market(set(forms_df[TICKER]), market_root, ma_windows, ma_cols, panel, workers)
+    metrics.inc('rows', len(market_df), stage='load_market')
 
     # merge
-    merged_df = pd.merge_asof(forms_df, market_df,
-                              by=TICKER, left_on=REPORT_DATE, right_on=DATE,
-                              tolerance=pd.Timedelta(days=7))
+    with metrics.timer('stage', stage='merge'):
+        merged_df = merge_frames(forms_df, market_df, market_root, add_sp500, panel)
 
-    if add_sp500:
-        df = json_to_csv('SPX', market_root)
-        feat_eng.add_ma(df, [ADJUSTED_CLOSE], window=4)
-        df.rename(columns={ADJUSTED_CLOSE: SPX_ADJUSTED_CLOSE,
-                           f'{ADJUSTED_CLOSE}_ma_4': f'{SPX_ADJUSTED_CLOSE}_ma_4',
-                           DATE: SPX_DATE}, inplace=True)
-        df.sort_values(by=SPX_DATE, inplace=True)
-        merged_df = pd.merge_asof(merged_df, df[[SPX_DATE, SPX_ADJUSTED_CLOSE, f'{SPX_ADJUSTED_CLOSE}_ma_4']],
-                                  left_on=REPORT_DATE, right_on=SPX_DATE,
-                                  tolerance=pd.Timedelta(days=7))
-
-    # drop nans
-    merged_df = merged_df[~merged_df[DATE].isnull()]
+        # drop nans
+        merged_df = merged_df[~merged_df[DATE].isnull()]
+    metrics.inc('rows', len(merged_df), stage='merge')
 
     return merged_df
 
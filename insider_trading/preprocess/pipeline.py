@@ -0,0 +1,237 @@
+"""
+Fused feature engineering pipeline.
+
+Steps are declared once and run over a single data frame: columns are computed with vectorized operations on the
+whole frame and assigned in place, masks shared by several steps (e.g. sell transactions) are computed once, and
+row filters are combined into one mask applied at the end. The frame is copied once at most, instead of once per
+step. The output has the same columns as the `feature_engineering` functions chained in the same order, with
+rows renumbered from 0.
+
+Usage:
+    pipeline = FeaturePipeline().shifted([ADJUSTED_CLOSE]).drop_zeros().aquired()
+    df = pipeline.run(df)
+"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from insider_trading.preprocess import feature_engineering as feat_eng
+from insider_trading.config import *
+
+# Position of the market data row in the frame, column of the shifted dates lookup
+ROW = '_row'
+
+
+class _State:
+    """
+    Frame being processed, rows to keep and masks computed so far.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.keep = np.ones(len(df), dtype=bool)
+        self._masks = {}
+
+    def mask(self, name, compute):
+        if name not in self._masks:
+            self._masks[name] = compute()
+        return self._masks[name]
+
+    def filter(self, mask):
+        self.keep &= mask
+
+    def result(self):
+        df = self.df if self.keep.all() else self.df[self.keep]
+        return df.reset_index(drop=True)
+
+    def reset(self, df):
+        self.df = df
+        self.keep = np.ones(len(df), dtype=bool)
+        self._masks = {}
+
+
+def _column(df, col):
+    # Values keep their type, e.g. float32 prices (see `schema`), results have the same type as with pandas
+    return df[col].to_numpy()
+
+
+def _dates(values):
+    """
+    Parse dates, each distinct date once.
+    """
+    codes, uniques = pd.factorize(values)
+    return pd.to_datetime(uniques, format=feat_eng.DATE_FORMAT).take(codes, allow_fill=True)
+
+
+def _shifted(state, cols, dt_days, panel):
+    if panel is not None:
+        # Rows are dropped by the merge, pending filters are applied first
+        state.reset(feat_eng.add_shifted_from_panel(state.result(), panel, cols, dt_days))
+        return
+
+    df = state.df
+    report_dates = _dates(df[REPORT_DATE])
+    df[REPORT_DATE] = report_dates
+    # Only the keys and row positions are merged, shifted columns are taken by position. Prices are looked up in
+    # the rows kept by the previous steps, as in the frame `add_shifted` gets
+    kept = np.flatnonzero(state.keep)
+    market = pd.DataFrame({TICKER: df[TICKER].array[kept],
+                           SHIFTED_DATE: _dates(df[DATE].array[kept]) - timedelta(days=dt_days),
+                           ROW: kept})
+    market = market.sort_values(by=SHIFTED_DATE)
+    rows = pd.merge_asof(pd.DataFrame({TICKER: df[TICKER].array, REPORT_DATE: report_dates}),
+                         market, by=TICKER, left_on=REPORT_DATE, right_on=SHIFTED_DATE,
+                         tolerance=pd.Timedelta(days=7))[ROW].to_numpy()
+    found = ~np.isnan(rows)
+    rows = np.where(found, rows, 0).astype(np.intp)
+    for col in cols:
+        df[f'{col}_{dt_days}'] = np.where(found, _column(df, col)[rows], np.nan)
+    state.filter(found)
+
+
+def _gains(state, new_col, ref_col, new_col_name, perc):
+    df = state.df
+    sell = state.mask('sell', lambda: (df[AQUIRED] == 'D').to_numpy())
+    new, ref = _column(df, new_col), _column(df, ref_col)
+    change = new - ref
+    df[new_col_name] = np.where(sell, -change, change)
+    if perc:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change_rel = change / ref
+        df[f'{new_col_name},%'] = np.where(sell, -change_rel, change_rel)
+
+
+def _difference(state, new_col, col, ref_col):
+    state.df[new_col] = _column(state.df, col) - _column(state.df, ref_col)
+
+
+def _drop_zeros(state, column):
+    state.filter(_column(state.df, column) != 0.)
+
+
+def _ppu_outliers(state, thr, tol, replace):
+    df = state.df
+    ppu, amount, close = _column(df, PRICE_PER_UNIT), _column(df, AMOUNT), _column(df, ADJUSTED_CLOSE)
+    high = ppu > thr
+    with np.errstate(divide='ignore', invalid='ignore'):
+        norm_ppu = ppu / amount
+        close_enough = np.abs(norm_ppu - close) / norm_ppu < tol
+    replaced = np.where(high & close_enough, norm_ppu, ppu)
+    replaced = np.where(high & ~close_enough, close if replace else np.nan, replaced)
+    df[PRICE_PER_UNIT] = replaced.astype(ppu.dtype)
+
+
+def _validate_ppu(state, max_ratio):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = _column(state.df, PRICE_PER_UNIT) / _column(state.df, ADJUSTED_CLOSE)
+    state.filter((ratio < max_ratio) & (ratio > 1. / max_ratio))
+
+
+def _holding_change(state, new_col, cap):
+    df = state.df
+    amount, holding = _column(df, AMOUNT), _column(df, HOLDING_BEFORE)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = amount / holding
+    change = np.where(amount == 0, 0., change)
+    change = np.where((amount != 0) & (holding == 0), 1., change)
+    if cap:
+        change = np.where(change > 1., 1., change)
+    df[new_col] = change
+
+
+def _booleans(state, cols):
+    for col in cols:
+        state.df[col] = feat_eng.replace_bools(state.df[col])
+
+
+def _equals(state, new_col, col, value):
+    state.df[new_col] = (state.df[col] == value).to_numpy().astype(int)
+
+
+class FeaturePipeline:
+    """
+    Declarative chain of feature engineering steps, each method adds a step and returns the pipeline.
+    """
+
+    def __init__(self):
+        self.steps = []
+
+    def __repr__(self):
+        return f"FeaturePipeline ({', '.join(step.__name__.lstrip('_') for step, _ in self.steps)})"
+
+    def _add(self, step, **kwargs):
+        self.steps.append((step, kwargs))
+        return self
+
+    def shifted(self, cols=[ADJUSTED_CLOSE], dt_days=180, panel=None):
+        """
+        See `feature_engineering.add_shifted`, rows without shifted data are dropped.
+        """
+        return self._add(_shifted, cols=cols, dt_days=dt_days, panel=panel)
+
+    def gains(self, new_col='adjusted close_ma_4_180', ref_col='adjusted close_ma_4',
+              new_col_name='change_adj_close_ma_4', perc=True):
+        """
+        See `feature_engineering.add_gains`.
+        """
+        return self._add(_gains, new_col=new_col, ref_col=ref_col, new_col_name=new_col_name, perc=perc)
+
+    def difference(self, new_col, col, ref_col):
+        """
+        Add `new_col` = `col` - `ref_col`.
+        """
+        return self._add(_difference, new_col=new_col, col=col, ref_col=ref_col)
+
+    def drop_zeros(self, column=PRICE_PER_UNIT):
+        """
+        See `feature_engineering.drop_zeros`.
+        """
+        return self._add(_drop_zeros, column=column)
+
+    def ppu_outliers(self, thr=6000., tol=0.5, replace=True):
+        """
+        See `feature_engineering.process_ppu_outliers`.
+        """
+        return self._add(_ppu_outliers, thr=thr, tol=tol, replace=replace)
+
+    def validate_ppu(self, max_ratio=10):
+        """
+        See `feature_engineering.validate_ppu_to_market`.
+        """
+        return self._add(_validate_ppu, max_ratio=max_ratio)
+
+    def holding_change(self, new_col=HOLDING_CHANGE, cap=False):
+        """
+        See `feature_engineering.add_holding_change_perc`.
+        """
+        return self._add(_holding_change, new_col=new_col, cap=cap)
+
+    def booleans(self, cols=[IS_DIRECTOR, IS_OFFICER, IS_MAJOR_OWNER, IS_OTHER]):
+        """
+        See `feature_engineering.process_booleans`.
+        """
+        return self._add(_booleans, cols=cols)
+
+    def aquired(self):
+        """
+        See `feature_engineering.process_aquired`.
+        """
+        return self._add(_equals, new_col=AQUIRED, col=AQUIRED, value='A')
+
+    def direct_ownership(self):
+        """
+        See `feature_engineering.process_direct_ownership`.
+        """
+        return self._add(_equals, new_col=IS_DIRECT_OWNER, col=OWNERSHIP_STATUS, value='D')
+
+    def run(self, df):
+        """
+        Run the steps over the data frame, its columns are replaced and added in place.
+        :param df: data frame, e.g. merged filings and market data sorted by report date
+        :return: data frame of the rows kept by all steps
+        """
+        state = _State(df)
+        for step, kwargs in self.steps:
+            step(state, **kwargs)
+        return state.result()
@@ -0,0 +1,219 @@
+"""
+Price panel: market data of all tickers in a single memory-mapped file.
+
+Layout of the file:
+    header   magic, offset and size of the index
+    records  per ticker blocks of `RECORD` rows sorted by date, contiguous
+    index    json footer: ticker -> (byte offset, number of rows, last refresh date)
+
+A ticker slice is a zero-copy view of the mapped file. Updated tickers are appended after the last index and a
+new index is written after them, the header is switched to it last, so readers never see a partial update.
+Blocks of replaced tickers, previous indexes and alignment padding are dead space until the panel is compacted.
+"""
+import json
+import logging
+import mmap
+import os
+from pathlib import Path
+import struct
+
+import numpy as np
+import pandas as pd
+
+from insider_trading import market_store
+from insider_trading.config import DATE, TICKER
+
+MAGIC = b'ITPANEL1'
+HEADER = struct.Struct('<8sQQ')
+# Records are aligned to their size, so views never straddle a record boundary
+RECORD = np.dtype([(DATE, '<M8[D]')] + [(column, '<f8') for column in market_store.COLUMNS[1:]])
+DATA_START = 64
+# Compact on append when dead space exceeds live data
+COMPACT_RATIO = 1.0
+
+LOG = logging.getLogger(__name__)
+
+
+def to_records(columns):
+    """
+    Convert ticker columns (see `market_store.load`) to panel records, missing columns are NaN.
+    """
+    records = np.empty(len(columns[DATE]), dtype=RECORD)
+    for name in RECORD.names:
+        records[name] = columns[name] if name in columns else np.nan
+    return records
+
+
+def _read_header(fin):
+    magic, index_offset, index_size = HEADER.unpack(fin.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f'Not a price panel file: {fin.name}')
+    return index_offset, index_size
+
+
+def _read_index(fin):
+    index_offset, index_size = _read_header(fin)
+    if not index_size:
+        return {'tickers': {}, 'dead': 0}
+    fin.seek(index_offset)
+    return json.loads(fin.read(index_size).decode('utf-8'))
+
+
+def _pad(fout):
+    position = fout.seek(0, os.SEEK_END)
+    padding = -position % RECORD.itemsize
+    fout.write(b'\0' * padding)
+    return position + padding
+
+
+class PricePanel:
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as fin:
+            index = _read_index(fin)
+        self.index = index['tickers']
+        self.dead = index['dead']
+        with open(self.path, 'rb') as fin:
+            self._mmap = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        self._data = np.frombuffer(self._mmap, dtype=np.uint8)
+
+    def __repr__(self):
+        return f"PricePanel {self.path} ({len(self.index)} tickers)"
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def tickers(self):
+        return list(self.index)
+
+    def records(self, symbol):
+        """
+        Ticker records sorted by date, a read-only view of the mapped file.
+        """
+        offset, length, _ = self.index[symbol]
+        return self._data[offset:offset + length * RECORD.itemsize].view(RECORD)
+
+    def views(self, symbols):
+        """
+        :return: dict of records views by symbol, symbols missing in the panel are skipped
+        """
+        return {symbol: self.records(symbol) for symbol in symbols if symbol in self.index}
+
+    def last_dates(self, symbol):
+        """
+        :return: tuple (last refresh date, last market date) formatted as "%Y-%m-%d", last market date is None
+                 if there is no data
+        """
+        _, length, last_refreshed = self.index[symbol]
+        last_date = str(self.records(symbol)[DATE][-1]) if length else None
+        return last_refreshed, last_date
+
+    def frame(self, symbols):
+        """
+        Market data of the tickers in one data frame, rows of each ticker sorted by date.
+        Columns are the same as `market_store.load_frame`, symbols missing in the panel are skipped.
+        """
+        views = self.views(symbols)
+        records = np.concatenate(list(views.values())) if views else np.empty(0, dtype=RECORD)
+        df = pd.DataFrame({name: records[name] for name in RECORD.names})
+        df[DATE] = df[DATE].astype('datetime64[ns]')
+        codes = np.repeat(np.arange(len(views)), [len(v) for v in views.values()])
+        df[TICKER] = pd.Categorical.from_codes(codes, categories=list(views))
+        return df
+
+    def close(self):
+        """
+        Unmap the file, views of the panel must be released before.
+        """
+        self._data = None
+        self._mmap.close()
+
+
+def append(path, items):
+    """
+    Add or replace tickers, without rewriting the other ones.
+    :param path: panel file, created if it doesn't exist
+    :param items: iterable of tuples (symbol, columns, last refresh date), columns as in `market_store.load`
+    :return: number of tickers written
+    """
+    path = Path(path)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as fout:
+            fout.write(HEADER.pack(MAGIC, 0, 0).ljust(DATA_START, b'\0'))
+
+    with open(path, 'r+b') as fout:
+        _, index_size = _read_header(fout)
+        fout.seek(0)
+        index = _read_index(fout)
+        # The current index is dead space once the new one is written
+        index['dead'] += index_size
+        tickers = index['tickers']
+        count = 0
+        for symbol, columns, last_refreshed in items:
+            records = to_records(columns)
+            end = fout.seek(0, os.SEEK_END)
+            offset = _pad(fout)
+            fout.write(records.tobytes())
+            index['dead'] += offset - end
+            if symbol in tickers:
+                index['dead'] += tickers[symbol][1] * RECORD.itemsize
+            tickers[symbol] = [offset, len(records), last_refreshed]
+            count += 1
+
+        # Index is written after the data, and the header is switched to it once both are on disk
+        index_offset = fout.seek(0, os.SEEK_END)
+        encoded = json.dumps(index).encode('utf-8')
+        fout.write(encoded)
+        fout.flush()
+        os.fsync(fout.fileno())
+        fout.seek(0)
+        fout.write(HEADER.pack(MAGIC, index_offset, len(encoded)))
+        fout.flush()
+        os.fsync(fout.fileno())
+
+    live = sum(length for _, length, _ in tickers.values()) * RECORD.itemsize
+    if index['dead'] > COMPACT_RATIO * live:
+        compact(path)
+    return count
+
+
+def compact(path):
+    """
+    Rewrite the panel without dead space, tickers in alphabetical order.
+    """
+    path = Path(path)
+    panel = PricePanel(path)
+    tmp_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    if tmp_path.exists():
+        tmp_path.unlink()
+    items = ((symbol, {name: records[name] for name in RECORD.names}, panel.index[symbol][2])
+             for symbol, records in sorted(panel.views(panel.tickers).items()))
+    append(tmp_path, items)
+    panel.close()
+    os.replace(tmp_path, path)
+    LOG.info(f'Compacted {path}')
+
+
+def from_market_store(root, path, symbols=None):
+    """
+    Add tickers of the market store folder to the panel.
+    :param root: market data folder with `<TICKER>.npz` files
+    :param path: panel file
+    :param symbols: tickers to add, all tickers of the folder if None
+    :return: number of tickers written
+    """
+    if symbols is None:
+        symbols = sorted(p.name[:-len(market_store.SUFFIX)] for p in Path(root).glob('*' + market_store.SUFFIX))
+
+    def items():
+        for symbol in symbols:
+            columns, meta = market_store.load(root, symbol)
+            yield symbol, columns, meta[market_store.LAST_REFRESHED]
+
+    return append(path, items())
@@ -0,0 +1,163 @@
+"""
+Request rate governor: token buckets for hard per-host rate ceilings, combined with an AIMD
+(additive increase / multiplicative decrease) concurrency controller.
+
+Usage:
+    governor = RateGovernor([TokenBucket(10)])
+    async with governor:
+        ...  # make request
+    governor.report(status, latency)
+"""
+import asyncio
+import logging
+import time
+
+from insider_trading.metrics import get_metrics
+
+THROTTLE_STATUSES = (429, 503)
+
+LOG = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per `per` seconds with bursts up to `capacity`.
+    """
+
+    def __init__(self, rate, per=1.0, capacity=None):
+        self.rate = rate / per
+        self.capacity = capacity or rate
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def __repr__(self):
+        return f"TokenBucket ({self.rate:.3f} req/sec, capacity={self.capacity})"
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """
+        Wait for a token.
+        :return: float, seconds spent waiting
+        """
+        start = time.monotonic()
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+        return time.monotonic() - start
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: grows by ~1 per window of requests while latency stays within `latency_tolerance`
+    times the best latency seen, halves on throttling responses (at most once per `cooldown` seconds).
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, latency_tolerance=2.0, cooldown=1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.min_latency = None
+        self._last_decrease = 0.
+        self._condition = asyncio.Condition()
+
+    def __repr__(self):
+        return f"AdaptiveConcurrency (limit={self.limit:.1f}, in_flight={self.in_flight})"
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency):
+        if self.min_latency is None or latency < self.min_latency:
+            self.min_latency = latency
+        if latency <= self.latency_tolerance * self.min_latency:
+            self.limit = min(self.maximum, self.limit + 1. / self.limit)
+
+    def on_throttle(self):
+        now = time.monotonic()
+        if now - self._last_decrease > self.cooldown:
+            self.limit = max(self.minimum, self.limit / 2)
+            self._last_decrease = now
+            LOG.debug(f"Throttled, concurrency limit decreased to {self.limit:.1f}")
+
+
+class RateGovernor:
+    """
+    Async context manager that holds a concurrency slot and takes a token from every bucket.
+    """
+
+    def __init__(self, buckets, concurrency=None, name='default'):
+        """
+        :param name: name of the governor in metrics, e.g. the rate limited service
+        """
+        self.name = name
+        self.buckets = buckets
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        self.requests = 0
+        self.throttled = 0
+        self.wait_time = 0.
+        self._start = None
+
+    def __repr__(self):
+        return f"RateGovernor ({self.buckets}, {self.concurrency})"
+
+    async def __aenter__(self):
+        if self._start is None:
+            self._start = time.monotonic()
+        metrics = get_metrics()
+        with metrics.timer('concurrency_wait', governor=self.name):
+            await self.concurrency.acquire()
+        metrics.gauge('in_flight', self.concurrency.in_flight, governor=self.name)
+        wait_time = 0.
+        for bucket in self.buckets:
+            wait_time += await bucket.acquire()
+        self.wait_time += wait_time
+        metrics.observe('rate_limit_wait', wait_time, governor=self.name)
+        self.requests += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.concurrency.release()
+
+    def report(self, status, latency=None):
+        """
+        Feed response status and latency (seconds) back to the concurrency controller.
+        """
+        if status in THROTTLE_STATUSES:
+            self.backoff()
+        elif latency is not None and status < 400:
+            self.concurrency.on_success(latency)
+
+    def backoff(self):
+        self.throttled += 1
+        get_metrics().inc('throttled', governor=self.name)
+        self.concurrency.on_throttle()
+
+    def stats(self):
+        """
+        :return: dict of run statistics: achieved rate (req/sec), current concurrency limit etc.
+        """
+        elapsed = time.monotonic() - self._start if self._start else 0.
+        return {'requests': self.requests,
+                'throttled': self.throttled,
+                'rate': self.requests / elapsed if elapsed else 0.,
+                'concurrency': self.concurrency.limit,
+                'in_flight': self.concurrency.in_flight,
+                'wait_time': self.wait_time}
@@ -0,0 +1,68 @@
+"""
+Priority scheduler of market data downloads under the daily AlphaVantage quota.
+
+Tickers that need an update are scored, and the daily request budget is filled in priority order. Tickers which
+don't fit in the budget stay in the backlog (see `manifest.TickerManifest`) and gain priority while they wait.
+
+Score of a ticker:
+    recency    0.5 ** (days between its latest filing and the latest filing of the database / RECENCY_HALF_LIFE)
+    activity   number of filings in the last ACTIVITY_DAYS, log scaled to [0, 1]
+    staleness  days since its market data was refreshed / STALE_DAYS, capped at 1, 1 without data
+    waiting    days in the backlog
+weighted and summed, then multiplied by FAILURE_PENALTY ** number of failed downloads.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+
+RECENCY_HALF_LIFE = 30
+ACTIVITY_DAYS = 90
+STALE_DAYS = 90
+RECENCY_WEIGHT = 1.
+ACTIVITY_WEIGHT = 1.
+STALENESS_WEIGHT = 0.5
+WAITING_WEIGHT = 0.05
+FAILURE_PENALTY = 0.5
+
+LOG = logging.getLogger(__name__)
+
+
+def score(candidates, backlog, today):
+    """
+    :param candidates: data frame indexed by ticker with columns `latest` (date of the latest filing), `filings`
+                       (number of filings in the last `ACTIVITY_DAYS`) and `last_refreshed` (NaT without data)
+    :param backlog: dict ticker -> tuple (date queued, number of failed downloads), see `TickerManifest.backlog`
+    :param today: datetime
+    :return: series of scores indexed by ticker, sorted from the highest, ties in the candidates order
+    """
+    today = pd.Timestamp(today).normalize()
+    age = (candidates['latest'].max() - candidates['latest']).dt.days
+    recency = 0.5 ** (age / RECENCY_HALF_LIFE)
+    max_filings = candidates['filings'].max() if len(candidates) else 0
+    activity = np.log1p(candidates['filings']) / np.log1p(max_filings) if max_filings else 0.
+    staleness = ((today - candidates['last_refreshed']).dt.days / STALE_DAYS).clip(0., 1.).fillna(1.)
+
+    queued = pd.to_datetime(pd.Series({ticker: entry[0] for ticker, entry in backlog.items()}, dtype=object))
+    waiting = (today - queued.reindex(candidates.index)).dt.days.clip(lower=0).fillna(0)
+    failures = pd.Series({ticker: entry[1] for ticker, entry in backlog.items()}, dtype=float)
+    failures = failures.reindex(candidates.index).fillna(0)
+
+    scores = (RECENCY_WEIGHT * recency + ACTIVITY_WEIGHT * activity + STALENESS_WEIGHT * staleness
+              + WAITING_WEIGHT * waiting) * FAILURE_PENALTY ** failures
+    return scores.sort_values(ascending=False, kind='stable')
+
+
+def plan(candidates, backlog, today, budget):
+    """
+    Fill the request budget with the highest priority tickers.
+    :param budget: number of requests left
+    :return: list of tickers to download
+    """
+    scores = score(candidates, backlog, today)
+    symbols = list(scores.index[:max(budget, 0)])
+    LOG.info(f'Scheduled {len(symbols)} / {len(scores)} tickers, budget {budget}')
+    if symbols:
+        LOG.debug(f'Scores from {scores.iloc[0]:.3f} to {scores.iloc[len(symbols) - 1]:.3f}')
+    return symbols
@@ -0,0 +1,223 @@
+"""
+Column types of filings, market data and merged data frames.
+
+Filings are stored as text the way they are parsed from forms (CSV, SQLite, Parquet strings), readers convert
+them to compact types:
+    category    tickers, issuer CIKs and names, A/D and D/I codes and other repeated strings
+    Int64       owner CIKs, nullable integers
+    str         owner names, about as many distinct values as rows, categories would take more memory. The
+                pandas 3 string dtype, missing names stay missing
+    int8        ownership flags, 'true' / '1' is 1, anything else ('false', '0', missing) is 0
+    float32     reported prices per unit
+    float64     market prices, share amounts, holdings and volumes, exact up to 2 ** 53
+    datetime64  dates
+Derived market columns, moving averages `<column>_ma_<window>` and shifted `<column>_<days>`, have the type of
+their column, moving averages are computed in float64 as market data is stored. Other columns are kept as they
+are.
+
+Data frames are written with these types, so merged outputs have flags as 0 / 1 (missing flags are 0) and prices
+per unit as float32 values.
+
+CSV files are parsed by pyarrow if it's installed (`parquet` extra), text is parsed as categories by it much
+faster than by the pandas parser.
+
+Usage:
+    df = schema.read_csv(path)
+    df = schema.apply(pd.read_parquet(path))
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from insider_trading.config import *
+
+
+CATEGORY = 'category'
+IDENTIFIER = 'Int64'
+TEXT = 'str'
+FLAG = 'int8'
+PRICE = 'float32'
+MARKET_PRICE = 'float64'
+QUANTITY = 'float64'
+DATETIME = 'datetime64[ns]'
+
+DATE_FORMAT = '%Y-%m-%d'
+TRUE_VALUES = ['true', '1', 1, True]
+
+FILINGS_TYPES = {
+    REPORT_DATE: DATETIME,
+    OWNER_CIK: IDENTIFIER,
+    OWNER_NAME: TEXT,
+    IS_DIRECTOR: FLAG,
+    IS_OFFICER: FLAG,
+    IS_MAJOR_OWNER: FLAG,
+    IS_OTHER: FLAG,
+    COMMENTS: CATEGORY,
+    ISSUER_CIK: CATEGORY,
+    ISSUER_COMPANY: CATEGORY,
+    TICKER: CATEGORY,
+    EQUITY: CATEGORY,
+    TRANSACTION_DATE: DATETIME,
+    AQUIRED: CATEGORY,
+    AMOUNT: QUANTITY,
+    PRICE_PER_UNIT: PRICE,
+    HOLDING_BEFORE: QUANTITY,
+    HOLDING_AFTER: QUANTITY,
+    OWNERSHIP_STATUS: CATEGORY,
+    OWNERSHIP_NATURE: CATEGORY,
+}
+
+MARKET_TYPES = {
+    DATE: DATETIME,
+    OPEN: MARKET_PRICE,
+    CLOSE: MARKET_PRICE,
+    HIGH: MARKET_PRICE,
+    LOW: MARKET_PRICE,
+    ADJUSTED_CLOSE: MARKET_PRICE,
+    ADJUSTED_HIGH: MARKET_PRICE,
+    ADJUSTED_LOW: MARKET_PRICE,
+    VOLUME: QUANTITY,
+    DIVIDEND_AMOUNT: MARKET_PRICE,
+    TICKER: CATEGORY,
+    SPX_DATE: DATETIME,
+    SPX_ADJUSTED_CLOSE: MARKET_PRICE,
+}
+
+COLUMN_TYPES = {**FILINGS_TYPES, **MARKET_TYPES}
+
+# Filings columns stored as numbers by the database backends
+NUMERIC_COLUMNS = [col for col in FILINGS_COLUMNS if FILINGS_TYPES[col] in (PRICE, MARKET_PRICE, QUANTITY)]
+
+DERIVED_PATTERN = re.compile(r'^(?P<column>.+?)(_ma_\d+)?(_\d+)?$')
+
+
+def column_type(column):
+    """
+    :return: dtype of the column, None if it has no declared type
+    """
+    if column in COLUMN_TYPES:
+        return COLUMN_TYPES[column]
+    match = DERIVED_PATTERN.match(str(column))
+    if MARKET_TYPES.get(match.group('column')) in (PRICE, MARKET_PRICE, QUANTITY):
+        return MARKET_TYPES[match.group('column')]
+    return None
+
+
+def csv_dtypes(columns=COLUMN_TYPES):
+    """
+    `dtype` argument of `pd.read_csv`: numbers and text are parsed with their type, dates and flags are parsed
+    as categories and converted by `apply`, each distinct value once.
+    :param columns: columns to get types for, all declared columns by default
+    :return: dict of dtypes by column
+    """
+    dtypes = {}
+    for col in columns:
+        dtype = column_type(col)
+        if dtype is not None:
+            dtypes[col] = CATEGORY if dtype in (FLAG, DATETIME) else dtype
+    return dtypes
+
+
+def read_csv(path, **kwargs):
+    """
+    Read a CSV file with declared column types.
+    :param path: .csv file
+    :param kwargs: `pd.read_csv` arguments, e.g. `usecols`
+    :return: data frame
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        # Floats are parsed exactly, as pyarrow does
+        kwargs = {'float_precision': 'round_trip', **kwargs}
+    else:
+        kwargs = {'engine': 'pyarrow', **kwargs}
+    return apply(pd.read_csv(path, dtype=csv_dtypes(), **kwargs))
+
+
+def _by_value(values, convert):
+    """
+    Convert each distinct value once, e.g. of a text column with a few thousands of dates.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    converted = convert(pd.Index(uniques))
+    return converted, codes
+
+
+def to_flags(values):
+    """
+    :param values: series of 'true' / 'false' / '1' / '0' strings or numbers
+    :return: int8 series
+    """
+    if pd.api.types.is_numeric_dtype(values.dtype) and not isinstance(values.dtype, pd.CategoricalDtype):
+        return values.fillna(0).astype(FLAG)
+    flags, codes = _by_value(values, lambda uniques: uniques.isin(TRUE_VALUES))
+    # Code -1 is a missing value, it takes the appended False
+    flags = np.append(flags, False)[codes]
+    return pd.Series(flags.astype(FLAG), index=values.index, name=values.name)
+
+
+def to_dates(values):
+    """
+    :param values: series of datetimes or strings starting with a "%Y-%m-%d" date, other strings are NaT
+    :return: datetime64 series
+    """
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values.astype(DATETIME)
+    dates, codes = _by_value(values, lambda uniques: pd.to_datetime(uniques.astype(str).str[:10],
+                                                                    format=DATE_FORMAT, errors='coerce'))
+    # Code -1 is a missing value, it takes the appended NaT, also when there are no dates at all
+    dates = np.append(dates.to_numpy(dtype=DATETIME), np.datetime64('NaT', 'ns'))[codes]
+    return pd.Series(dates, index=values.index, name=values.name)
+
+
+def to_type(values, dtype):
+    """
+    Convert a series to a `COLUMN_TYPES` type.
+    """
+    if dtype == FLAG:
+        return to_flags(values)
+    if dtype == DATETIME:
+        return to_dates(values)
+    if dtype == IDENTIFIER:
+        if not pd.api.types.is_numeric_dtype(values.dtype) or isinstance(values.dtype, pd.CategoricalDtype):
+            values = pd.to_numeric(values.astype(object), errors='coerce')
+        return values.astype(IDENTIFIER)
+    if dtype == CATEGORY:
+        # Categories are strings, whatever the parser inferred, e.g. numbers for issuer CIKs
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = values.cat.categories
+            if categories.dtype == TEXT:
+                return values
+            return values.cat.set_categories(categories.astype(TEXT), rename=True)
+        if pd.api.types.is_numeric_dtype(values.dtype):
+            values = values.astype(str).where(values.notna())
+        return values.astype(CATEGORY)
+    return values.astype(dtype)
+
+
+def apply(df):
+    """
+    Convert the columns of a data frame with declared types, works inplace.
+    :param df: filings, market or merged data frame
+    :return: the data frame
+    """
+    for col in df.columns:
+        dtype = column_type(col)
+        if dtype is not None and (str(df[col].dtype) != dtype or dtype == CATEGORY):
+            df[col] = to_type(df[col], dtype)
+    return df
+
+
+def match_categories(df, reference, column=TICKER):
+    """
+    Give `column` of `df` the categories of the same column of `reference`, e.g. to merge on tickers.
+    Values missing in the reference categories become NaN. Works inplace.
+    """
+    if isinstance(reference[column].dtype, pd.CategoricalDtype) and df[column].dtype != reference[column].dtype:
+        df[column] = df[column].astype(reference[column].dtype)
+    return df
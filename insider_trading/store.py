@@ -1,13 +1,19 @@
 from datetime import datetime, timedelta
 import asyncio
-from asyncio import Semaphore
 import logging
 import time
 
-from insider_trading.data_parser import Index, utils
+from insider_trading.data_parser import FULL_INDEX_ENDPOINT, Index, IndexFetchError, utils
+from insider_trading.manifest import DONE, FAILED, SKIPPED
+from insider_trading.metrics import get_metrics
+from insider_trading.rate import RateGovernor, TokenBucket, AdaptiveConcurrency
 
 INVALID_NAMES = [' llc', ' lp', 'group', 'trust', 'associates', 'l.p.', 'holdings', 'inc.', 'partners']
 MAX_REQUESTS_PER_SEC = 10
+MAX_CONCURRENCY = 40
+MAX_IN_FLIGHT = 100
+MAX_DAYS_IN_FLIGHT = 3
+WRITE_QUEUE_SIZE = 100
 
 LOG = logging.getLogger(__name__)
 
@@ -26,19 +32,34 @@ def _valid_position(position):
 
 
 def _filter_valid_form(form):
-    form_content = form.get_content()
+    return is_valid_content(form.get_content())
 
+
+def is_valid_content(form_content):
+    """
+    Check if the form is filed by an individual director or officer.
+    :param form_content: dict, `data_parser.Form` content
+    """
+    return reject_reason(form_content) is None
+
+
+def reject_reason(form_content):
+    """
+    :param form_content: dict, `data_parser.Form` content
+    :return: why the form is filtered out (`owner_name` for entities, `position` for owners who are neither
+             directors nor officers), None for valid forms
+    """
     # 1. Check owner name
     owner_name = form_content['owner']['name']
+    if not _valid_name(owner_name):
+        return 'owner_name'
 
     # 2. Check position
     isdirector = form_content['owner']['isdirector']
     isofficer = form_content['owner']['isofficer']
-
-    if _valid_name(owner_name) and (_valid_position(isdirector) or _valid_position(isofficer)):
-        return True
-    else:
-        return False
+    if not (_valid_position(isdirector) or _valid_position(isofficer)):
+        return 'position'
+    return None
 
 
 def _make_row(entry, transaction):
@@ -62,42 +83,330 @@ def _make_row(entry, transaction):
     return row
 
 
-async def get_contents(index, limiter):
+def create_governor():
+    """
+    Rate governor for SEC EDGAR requests.
+    """
+    return RateGovernor([TokenBucket(MAX_REQUESTS_PER_SEC)],
+                        AdaptiveConcurrency(initial=MAX_REQUESTS_PER_SEC, maximum=MAX_CONCURRENCY), name='edgar')
+
+
+async def process_form(f, limiter, executor=None):
+    """
+    Download, parse and filter the form.
+    :return: tuple (status, error message), status is `manifest.DONE` for valid forms, `manifest.SKIPPED`
+             for filtered out forms and `manifest.FAILED` if the form could not be downloaded or parsed
+    """
+    metrics = get_metrics()
+    try:
+        # print(f'TIME: {time.monotonic()}')
+        await f.extract_info(limiter, executor)
+    except AttributeError as e:
+        LOG.debug(f"Error parsing {str(f)}: {e}")
+        metrics.inc('forms', status=FAILED)
+        return FAILED, str(e)
+    reason = reject_reason(f.get_content())
+    if reason is None:
+        LOG.debug(f'Got content for {f} !')
+        metrics.inc('forms', status=DONE)
+        return DONE, None
+    metrics.inc('forms', status=SKIPPED)
+    metrics.inc('forms_rejected', reason=reason)
+    return SKIPPED, None
+
+
+async def get_form(f, limiter, executor=None):
+    """
+    Download and parse the form.
+    :return: form content if the form is valid, None otherwise
+    """
+    status, _ = await process_form(f, limiter, executor)
+    if status == DONE:
+        return f.get_content()
+
+
+async def stream_contents(index, limiter, write, executor=None, max_in_flight=MAX_IN_FLIGHT,
+                          exclude=None, report=None):
+    """
+    Download and parse forms from the index, passing each valid form to `write` as soon as it's completed.
+    At most `max_in_flight` forms are processed at a time, and a slow writer holds back the downloads.
+    :param index: `data_parser.Index` with loaded data
+    :param limiter: `rate.RateGovernor`
+    :param write: callable(form), called for every valid form
+    :param executor: `concurrent.futures.Executor` to parse forms in
+    :param max_in_flight: max number of forms being downloaded and parsed concurrently
+    :param exclude: set of accession numbers to skip, e.g. already processed
+    :param report: callable(form, status, error), called for failed and filtered out forms
+    :return: number of valid forms, each accession number is processed once
+    """
+    forms = asyncio.Queue(maxsize=max_in_flight)
+    results = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+    metrics = get_metrics()
+    progress = metrics.progress('forms', unit='form')
+
+    async def produce():
+        # Indices list a form once per filer (e.g. reporting owner and issuer), it's processed once
+        seen = set()
+        for f in index.generate_form():
+            if f.accession in seen:
+                metrics.inc('forms_duplicated')
+                continue
+            seen.add(f.accession)
+            if exclude and f.accession in exclude:
+                metrics.inc('forms_excluded')
+                continue
+            progress.total = (progress.total or 0) + 1
+            await forms.put(f)
+        for _ in range(max_in_flight):
+            await forms.put(None)
+
+    async def process():
+        while True:
+            f = await forms.get()
+            if f is None:
+                break
+            metrics.gauge('queue_depth', forms.qsize(), queue='forms')
+            status, error = await process_form(f, limiter, executor)
+            progress.update()
+            if status == DONE:
+                await results.put(f)
+                metrics.gauge('queue_depth', results.qsize(), queue='write')
+            elif report is not None:
+                report(f, status, error)
+
+    async def consume():
+        count = 0
+        while True:
+            f = await results.get()
+            if f is None:
+                return count
+            with metrics.timer('stage', stage='write'):
+                write(f)
+            count += 1
+
+    async def fetch():
+        await asyncio.gather(produce(), *[process() for _ in range(max_in_flight)])
+        await results.put(None)
+
+    _, count = await asyncio.gather(fetch(), consume())
+    return count
+
+
+async def get_contents(index, limiter, executor=None):
+
+    valid_forms = []
+    await stream_contents(index, limiter, valid_forms.append, executor)
+
+    return [f.get_content() for f in valid_forms]
+
+
+async def async_get_index(date, client=None, governor=None):
+    """
+    Download daily index for the `date`.
+    :return: `data_parser.Index` or None if there is no index for the date
+    Raises `data_parser.IndexFetchError` if the index could not be downloaded.
+    """
+    index_name = utils.create_index_filename(date)
+    index_url = utils.index_url_from_date(date)
+    index = Index(index_url, index_name, client)
+    try:
+        await index.async_get_index(governor)
+    except AttributeError:
+        return None
+
+    return index
+
+
+async def async_get_quarter_indices(days, client=None, governor=None):
+    """
+    Download quarterly full indices covering `days` and split them by filing date.
+    :param days: list of datetime
+    :return: tuple (dict of daily `data_parser.Index` by date formatted as "%Y-%m-%d",
+             dict of the last date covered by each downloaded full index by its url)
+    """
+    quarters = sorted(set(utils.full_index_url_from_date(date) for date in days))
+    indices = {}
+    last_dates = {}
 
-    async def get_form(f, limiter):
+    async def get_quarter(url):
+        index = Index(url, f'full-index {url}', client, FULL_INDEX_ENDPOINT)
         try:
-            # print(f'TIME: {time.monotonic()}')
-            await f.extract_info(limiter)
-            if _filter_valid_form(f):
-                return f.get_content()
-            LOG.debug(f'Got content for {f} !')
-        except AttributeError:
-            LOG.debug(f"Error parsing {str(f)}")
+            await index.async_get_index(governor)
+        except (AttributeError, IndexFetchError) as e:
+            # Days of the quarter are read from daily indices
+            LOG.warning(f'No full index {url}: {e!r}')
+            return None
+        return index
+
+    for url, index in zip(quarters, await asyncio.gather(*[get_quarter(url) for url in quarters])):
+        if index is None:
+            continue
+        daily_indices = index.partition()
+        LOG.info(f'{index}: {len(index.entries.path)} forms filed on {len(daily_indices)} days')
+        indices.update(daily_indices)
+        if daily_indices:
+            last_dates[url] = max(daily_indices)
+
+    return indices, last_dates
+
+
+async def async_get_daily_data(date, client=None, governor=None, executor=None):
+
+    governor = governor or create_governor()
+    index = await async_get_index(date, client, governor)
+    if index is None:
+        return None
 
-    coros = [get_form(f, limiter) for f in index.generate_form()]
-    contents = await asyncio.gather(*coros)
+    daily_data = await get_contents(index, governor, executor)
+    LOG.info(f"Rate stats: {governor.stats()}")
 
-    valid_contents = [c for c in contents if c]
+    return daily_data
 
-    return valid_contents
 
+def get_daily_data(date, client=None, governor=None, executor=None):
+    """
+    Download and parse all forms filed on `date`.
+    :param date: datetime
+    :param client: `client.Client`, shared client is used if None
+    :param governor: `rate.RateGovernor`, new SEC governor is created if None
+    :param executor: `concurrent.futures.Executor` to parse forms in, e.g. a process pool
+    :return: list of valid forms contents or None if there is no index for the date
+    """
+    loop = asyncio.get_event_loop()
+    daily_data = loop.run_until_complete(async_get_daily_data(date, client, governor, executor))
 
-def get_daily_data(date):
+    return daily_data
 
-    index_name = utils.create_index_filename(date)
-    index_url = utils.index_url_from_date(date)
-    index = Index(index_url, index_name)
-    try:
-        index.get_index()
-    except AttributeError:
+
+async def async_stream_daily_data(date, write, client=None, governor=None, executor=None,
+                                  max_in_flight=MAX_IN_FLIGHT):
+
+    governor = governor or create_governor()
+    index = await async_get_index(date, client, governor)
+    if index is None:
         return None
 
-    loop = asyncio.get_event_loop()
-    limiter = Semaphore(MAX_REQUESTS_PER_SEC, loop=loop)
+    count = await stream_contents(index, governor, write, executor, max_in_flight)
+    LOG.info(f"Rate stats: {governor.stats()}")
 
-    daily_data = loop.run_until_complete(get_contents(index, limiter))
+    return count
 
-    return daily_data
+
+def stream_daily_data(date, write, client=None, governor=None, executor=None, max_in_flight=MAX_IN_FLIGHT):
+    """
+    Download and parse all forms filed on `date`, passing each valid form to `write` as soon as it's completed.
+    :param date: datetime
+    :param write: callable(form), called for every valid `data_parser.Form`
+    :param client: `client.Client`, shared client is used if None
+    :param governor: `rate.RateGovernor`, new SEC governor is created if None
+    :param executor: `concurrent.futures.Executor` to parse forms in, e.g. a process pool
+    :param max_in_flight: max number of forms being downloaded and parsed concurrently
+    :return: number of valid forms or None if there is no index for the date
+    """
+    loop = asyncio.get_event_loop()
+    count = loop.run_until_complete(async_stream_daily_data(date, write, client, governor, executor,
+                                                            max_in_flight))
+
+    return count
+
+
+class _DaySink:
+    """
+    Passes forms of the day to `write`, buffering them until all previous days are written.
+    """
+
+    def __init__(self, date, write):
+        self.date = date
+        self.write = write
+        self.live = False
+        self._forms = []
+
+    def __call__(self, form):
+        if self.live:
+            self.write(self.date, form)
+        else:
+            self._forms.append(form)
+
+    def go_live(self):
+        for form in self._forms:
+            self.write(self.date, form)
+        self._forms = []
+        self.live = True
+
+
+async def async_backfill(days, write, done=None, client=None, governor=None, executor=None,
+                         days_in_flight=MAX_DAYS_IN_FLIGHT, max_in_flight=MAX_IN_FLIGHT,
+                         exclude=None, report=None, full_index=False):
+
+    governor = governor or create_governor()
+    indices, last_dates = {}, {}
+    if full_index:
+        indices, last_dates = await async_get_quarter_indices(days, client, governor)
+
+    async def get_index(date):
+        key = date.strftime('%Y-%m-%d')
+        last_date = last_dates.get(utils.full_index_url_from_date(date))
+        if last_date is None or key > last_date:
+            # Days the full index doesn't cover (yet)
+            return await async_get_index(date, client, governor)
+        # Full index has no entries for days without Form 4 filings, e.g. holidays
+        return indices.get(key)
+
+    async def run_day(date, sink):
+        try:
+            index = await get_index(date)
+        except IndexFetchError as e:
+            return None, str(e)
+        if index is None:
+            return None, None
+        day_exclude = exclude(date) if exclude is not None else None
+        day_report = None
+        if report is not None:
+            def day_report(f, status, error):
+                report(date, f, status, error)
+        count = await stream_contents(index, governor, sink, executor, max_in_flight, day_exclude, day_report)
+        return count, None
+
+    sinks = [_DaySink(date, write) for date in days]
+    tasks = []
+    for i, sink in enumerate(sinks):
+        # Keep upcoming days running: their indices and first forms are fetched while current day finishes
+        while len(tasks) < min(i + days_in_flight, len(sinks)):
+            next_sink = sinks[len(tasks)]
+            tasks.append(asyncio.ensure_future(run_day(next_sink.date, next_sink)))
+        sink.go_live()
+        count, error = await tasks[i]
+        if done is not None:
+            done(sink.date, count, error)
+
+    LOG.info(f"Rate stats: {governor.stats()}")
+
+
+def backfill(days, write, done=None, client=None, governor=None, executor=None,
+             days_in_flight=MAX_DAYS_IN_FLIGHT, max_in_flight=MAX_IN_FLIGHT, exclude=None, report=None,
+             full_index=False):
+    """
+    Download and parse forms filed on several days, running up to `days_in_flight` days concurrently on one
+    event loop with one rate governor. Forms are written in date order: forms of the earliest unfinished day
+    are written as soon as they are completed, forms of the following days are buffered until it's done.
+    :param days: list of datetime, in the order to write
+    :param write: callable(date, form), called for every valid `data_parser.Form`
+    :param done: callable(date, count, error), called when all forms of the day are written,
+                 `count` is the number of valid forms or None if there is no index for the date,
+                 `error` is the error message if the index could not be downloaded, None otherwise
+    :param client: `client.Client`, shared client is used if None
+    :param governor: `rate.RateGovernor`, new SEC governor is created if None
+    :param executor: `concurrent.futures.Executor` to parse forms in, e.g. a process pool
+    :param days_in_flight: max number of days processed concurrently
+    :param max_in_flight: max number of forms of a day being downloaded and parsed concurrently
+    :param exclude: callable(date) returning set of accession numbers of the day to skip
+    :param report: callable(date, form, status, error), called for failed and filtered out forms
+    :param full_index: get forms from quarterly full indices, one request per quarter instead of one per day.
+                       Days after the last date of the full index are read from daily indices.
+    """
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(async_backfill(days, write, done, client, governor, executor,
+                                           days_in_flight, max_in_flight, exclude, report, full_index))
 
 
 def generate_csv_row(daily_data):
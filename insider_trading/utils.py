@@ -71,6 +71,16 @@ def index_url_from_date(date):
     return url_stem
 
 
+def full_index_url_from_date(date):
+    """
+    Quarterly form index containing the `date`, relative to EDGAR full-index.
+    """
+    year = date.strftime('%Y')
+    quarter = get_quarter(date)
+    url_stem = '/'.join([year, quarter, 'form.idx'])
+    return url_stem
+
+
 def parse_date(filename):
     """
     Find date from the string `filename`.
@@ -80,6 +90,15 @@ def parse_date(filename):
         return match.group(1)
 
 
+def parse_accession(url):
+    """
+    Find accession number (e.g. `0001209191-19-049005`) from the form url or filename.
+    """
+    match = re.search(r'(\d{10}-\d{2}-\d{6})', url)
+    if match:
+        return match.group(1)
+
+
 def get_quarter(date):
     """Compute quarter from the date"""
     quarter = {1: 'QTR1',
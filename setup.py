@@ -13,10 +13,18 @@ setup(
     author_email='y.karanouskaya@gmail.com',
     install_requires=[
         "beautifulsoup4",
+        # Text columns of `schema` are the pandas 3 `str` dtype, missing values stay NaN
+        "pandas>=3",
     ],
+    extras_require={
+        "parquet": ["pyarrow"],
+        "progress": ["tqdm"],
+    },
     scripts=[
             "bin/update-database",
             "bin/update-market-data",
-            "bin/merge-data"
+            "bin/merge-data",
+            "bin/ingest-feed",
+            "bin/migrate-market-data"
     ]
 )
\ No newline at end of file
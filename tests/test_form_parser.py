@@ -0,0 +1,51 @@
+import re
+
+import pytest
+from bs4 import BeautifulSoup
+
+from insider_trading import form_parser
+from insider_trading.data_parser import Form
+from insider_trading.perf import synthetic
+
+
+def soup_content(data):
+    form = Form('')
+    form.extract_soup_info(BeautifulSoup(data, 'html.parser'))
+    return form.get_content()
+
+
+def remove(data, tag):
+    return re.sub(rb'<%s>.*?</%s>' % (tag, tag), b'', data, flags=re.DOTALL)
+
+
+def assert_parity(data):
+    try:
+        expected = soup_content(data)
+    except AttributeError:
+        with pytest.raises(AttributeError):
+            form_parser.extract_content(data)
+        return
+    assert form_parser.extract_content(data) == expected
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_parity(seed):
+    assert_parity(synthetic.form4_submission(seed))
+
+
+@pytest.mark.parametrize('tag', [b'nonDerivativeTable', b'derivativeTable', b'footnotes', b'officerTitle'])
+def test_parity_without_table(tag):
+    for seed in range(10):
+        data = remove(synthetic.form4_submission(seed), tag)
+        assert tag not in data
+        assert_parity(data)
+
+
+def test_parity_without_transactions():
+    assert_parity(synthetic.form4_submission(0, n_transactions=0))
+
+
+def test_parity_without_footnote_references():
+    for seed in range(10):
+        data = re.sub(rb'<footnoteId id="F\d+"\s*/>', b'', synthetic.form4_submission(seed))
+        assert_parity(data)
@@ -0,0 +1,99 @@
+import pandas as pd
+import pytest
+
+from insider_trading.config import *
+from insider_trading.perf import generate, synthetic
+from insider_trading.preprocess import incremental, merge
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    database, market_root = generate.generate(tmp_path / 'data', 300, 10, 520)
+    return database, market_root, tmp_path / 'merged.csv'
+
+
+def assert_full_merge(database, market_root, output, **kwargs):
+    """
+    Incremental output is the same as a full merge saved the same way.
+    """
+    expected = output.with_name('full.csv')
+    incremental.write_output(merge.merge_forms_market(database, market_root, **kwargs), expected)
+    pd.testing.assert_frame_equal(incremental.read_output(output), incremental.read_output(expected))
+
+
+def read_database(database):
+    # Values are written back as they are
+    return pd.read_csv(database, dtype=str, keep_default_na=False)
+
+
+def append_filings(database, rows):
+    pd.concat([read_database(database), rows]).to_csv(database, index=False)
+
+
+def merged_filings(database, market_root, output, **kwargs):
+    return incremental.update(database, market_root, output, **kwargs)[0]
+
+
+def test_new_ticker_without_market_data(dataset):
+    database, market_root, output = dataset
+    incremental.update(database, market_root, output, ma_windows=[4])
+
+    rows = read_database(database).tail(1).assign(**{TICKER: 'MISSING'})
+    append_filings(database, rows)
+    assert incremental.update(database, market_root, output, ma_windows=[4])[0] == 0
+    assert_full_merge(database, market_root, output, ma_windows=[4])
+
+
+def test_new_filings(dataset):
+    database, market_root, output = dataset
+    incremental.update(database, market_root, output, ma_windows=[4])
+
+    df = read_database(database)
+    # Filings are appended in report date order
+    rows = df.tail(5).assign(**{OWNER_NAME: 'NEW OWNER', REPORT_DATE: df[REPORT_DATE].max()})
+    append_filings(database, rows)
+    assert merged_filings(database, market_root, output, ma_windows=[4]) == 5
+    assert_full_merge(database, market_root, output, ma_windows=[4])
+
+
+def test_refreshed_ticker(dataset):
+    database, market_root, output = dataset
+    incremental.update(database, market_root, output, ma_windows=[4])
+
+    ticker = read_database(database)[TICKER].value_counts().index[0]
+    synthetic.write_price_files(market_root, [ticker], 520, seed=100)
+    merged = merged_filings(database, market_root, output, ma_windows=[4])
+    assert 0 < merged == (read_database(database)[TICKER] == ticker).sum()
+    assert_full_merge(database, market_root, output, ma_windows=[4])
+
+
+def test_refreshed_sp500(dataset):
+    database, market_root, output = dataset
+    incremental.update(database, market_root, output, ma_windows=[4])
+    before = incremental.read_output(output)[SPX_ADJUSTED_CLOSE]
+
+    synthetic.write_price_files(market_root, [incremental.SP500], 520, seed=100)
+    assert merged_filings(database, market_root, output, ma_windows=[4]) == 0
+    assert not incremental.read_output(output)[SPX_ADJUSTED_CLOSE].equals(before)
+    assert_full_merge(database, market_root, output, ma_windows=[4])
+
+
+def test_removed_filing(dataset):
+    database, market_root, output = dataset
+    incremental.update(database, market_root, output, ma_windows=[4])
+    rows = len(incremental.read_output(output))
+
+    df = read_database(database)
+    df.drop(index=df.index[-1]).to_csv(database, index=False)
+    assert merged_filings(database, market_root, output, ma_windows=[4]) == 0
+    assert len(incremental.read_output(output)) == rows - 1
+    assert_full_merge(database, market_root, output, ma_windows=[4])
+
+
+def test_changed_parameters(dataset):
+    database, market_root, output = dataset
+    rows = merged_filings(database, market_root, output, ma_windows=[4])
+
+    assert merged_filings(database, market_root, output, ma_windows=[4, 12]) == rows
+    assert f'{ADJUSTED_CLOSE}_ma_12' in incremental.read_output(output).columns
+    assert_full_merge(database, market_root, output, ma_windows=[4, 12])
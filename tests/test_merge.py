@@ -0,0 +1,18 @@
+from insider_trading.config import *
+from insider_trading.perf import generate
+from insider_trading.preprocess import merge
+
+
+def test_load_market_frame_without_market_data(tmp_path):
+    _, market_root = generate.generate(tmp_path, 100, 5, 20)
+    loaded = merge.load_market_frame(['BA'], market_root, ma_windows=[4])
+    empty = merge.load_market_frame(['MISSING'], market_root, ma_windows=[4])
+    assert len(empty) == 0
+    assert empty.columns.tolist() == loaded.columns.tolist()
+
+
+def test_load_market_without_market_data(tmp_path):
+    _, market_root = generate.generate(tmp_path, 100, 5, 20)
+    market_df = merge.load_market(['MISSING'], market_root, ma_windows=[4])
+    assert len(market_df) == 0
+    assert f'{ADJUSTED_CLOSE}_ma_4' in market_df.columns
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from insider_trading.config import *
+from insider_trading.perf import generate
+from insider_trading.preprocess import feature_engineering as feat_eng
+from insider_trading.preprocess import merge, pipeline
+
+
+@pytest.fixture(scope='module')
+def merged(tmp_path_factory):
+    database, market_root = generate.generate(tmp_path_factory.mktemp('data'), 2000, 20, 520)
+    return merge.merge_forms_market(database, market_root, ma_windows=[4])
+
+
+def test_filter_before_shifted():
+    # The only price 180 days after the first report is on a filing dropped before the lookup
+    df = pd.DataFrame({TICKER: ['A', 'A'],
+                       REPORT_DATE: pd.to_datetime(['2019-01-01', '2019-07-01']),
+                       DATE: pd.to_datetime(['2018-12-31', '2019-06-30']),
+                       ADJUSTED_CLOSE: [10., 20.],
+                       PRICE_PER_UNIT: [10., 0.]})
+    expected = feat_eng.add_shifted(feat_eng.drop_zeros(df.copy()))
+    result = pipeline.FeaturePipeline().drop_zeros().shifted().run(df.copy())
+    assert len(expected) == len(result) == 0
+
+
+def test_parity_with_filter_before_shifted(merged):
+    cols = [ADJUSTED_CLOSE, f'{ADJUSTED_CLOSE}_ma_4']
+    merged = merged.copy()
+    merged.loc[merged.index[::3], PRICE_PER_UNIT] = 0.
+    expected = feat_eng.add_shifted(feat_eng.drop_zeros(merged.copy()), cols=cols, dt_days=180)
+    expected = feat_eng.add_gains(expected, new_col=f'{ADJUSTED_CLOSE}_180', ref_col=ADJUSTED_CLOSE)
+    result = (pipeline.FeaturePipeline()
+              .drop_zeros()
+              .shifted(cols=cols, dt_days=180)
+              .gains(new_col=f'{ADJUSTED_CLOSE}_180', ref_col=ADJUSTED_CLOSE)
+              .run(merged.copy()))
+    assert len(result) > 0
+    pd.testing.assert_frame_equal(result, expected.reset_index(drop=True))
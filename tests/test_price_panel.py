@@ -0,0 +1,42 @@
+import numpy as np
+
+from insider_trading import price_panel
+from insider_trading.config import ADJUSTED_CLOSE
+from insider_trading.perf import synthetic
+
+
+def accounted_size(path):
+    """
+    Size of the panel file from its header and index: live records, dead space and the index.
+    """
+    with open(path, 'rb') as fin:
+        _, index_size = price_panel._read_header(fin)
+    panel = price_panel.PricePanel(path)
+    live = sum(length for _, length, _ in panel.index.values()) * price_panel.RECORD.itemsize
+    dead = panel.dead
+    panel.close()
+    return price_panel.DATA_START + live + dead + index_size
+
+
+def test_dead_space_is_accounted(tmp_path):
+    path = tmp_path / 'panel.bin'
+    symbols = [f'T{i}' for i in range(10)]
+    price_panel.append(path, [(symbol, synthetic.price_columns(520, seed=i), '2019-09-13')
+                              for i, symbol in enumerate(symbols)])
+    for i in range(30):
+        price_panel.append(path, [('T0', synthetic.price_columns(20, seed=100 + i), '2019-09-13')])
+        assert path.stat().st_size == accounted_size(path)
+
+
+def test_compacted_after_appends(tmp_path):
+    path = tmp_path / 'panel.bin'
+    for i in range(30):
+        price_panel.append(path, [('T0', synthetic.price_columns(20, seed=i), '2019-09-13'),
+                                  ('T1', synthetic.price_columns(520, seed=1), '2019-09-13')])
+    assert path.stat().st_size == accounted_size(path)
+
+    panel = price_panel.PricePanel(path)
+    assert sorted(panel.tickers) == ['T0', 'T1']
+    np.testing.assert_array_equal(panel.records('T0')[ADJUSTED_CLOSE],
+                                  synthetic.price_columns(20, seed=29)[ADJUSTED_CLOSE])
+    panel.close()
@@ -0,0 +1,34 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from insider_trading import schema
+from insider_trading.config import *
+
+
+def test_to_dates_without_values():
+    for values in [pd.Series([np.nan, np.nan], dtype=object), pd.Series([None, None], dtype='category'),
+                   pd.Series([], dtype=object)]:
+        dates = schema.to_dates(values)
+        assert dates.dtype == schema.DATETIME
+        assert dates.isna().all() and len(dates) == len(values)
+
+
+def test_to_dates_with_missing_values():
+    dates = schema.to_dates(pd.Series(['2019-09-13', np.nan, '2019-09-13-05:00', 'bad']))
+    assert dates.tolist()[0] == dates.tolist()[2] == pd.Timestamp('2019-09-13')
+    assert dates.isna().tolist() == [False, True, False, True]
+
+
+def test_read_csv_with_empty_date_columns():
+    data = f'{REPORT_DATE},{TRANSACTION_DATE},{SPX_DATE},{TICKER}\n2019-09-13,,,AAPL\n2019-09-16,,,MSFT\n'
+    df = schema.read_csv(io.StringIO(data))
+    assert (df.dtypes[[REPORT_DATE, TRANSACTION_DATE, SPX_DATE]] == schema.DATETIME).all()
+    assert df[[TRANSACTION_DATE, SPX_DATE]].isna().all().all()
+    assert df[TICKER].tolist() == ['AAPL', 'MSFT']
+
+
+def test_missing_text_values():
+    df = schema.apply(pd.DataFrame({OWNER_NAME: ['DOE JOHN', None, np.nan]}, dtype=object))
+    assert df[OWNER_NAME].isna().tolist() == [False, True, True]
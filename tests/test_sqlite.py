@@ -0,0 +1,67 @@
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+from insider_trading.config import *
+from insider_trading.database import filings, sqlite
+from insider_trading.perf import synthetic
+
+
+def forms(n_forms=50, rows_per_form=2):
+    """
+    Synthetic forms as tuples (accession, rows), in report date order.
+    """
+    rows = synthetic.filings_rows(['AAA', 'BBB', 'CCC'], n_forms * rows_per_form)
+    return [(f'0000000001-19-{i:06d}', rows[i * rows_per_form:(i + 1) * rows_per_form]) for i in range(n_forms)]
+
+
+def write(path, forms, backend):
+    with filings.open_writer(path, backend) as writer:
+        for accession, rows in forms:
+            writer.write_rows(rows, accession=accession)
+
+
+def count_rows(path):
+    with closing(sqlite3.connect(str(path))) as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM {sqlite.TABLE}').fetchone()[0]
+
+
+def test_upsert_is_idempotent(tmp_path):
+    path = tmp_path / 'database.db'
+    data = forms()
+    write(path, data, 'sqlite')
+    assert count_rows(path) == 100
+
+    write(path, data, 'sqlite')
+    write(path, data[:10], 'sqlite')
+    assert count_rows(path) == 100
+    assert len(filings.read_filings(path)) == 100
+
+
+def test_upsert_updates_rows(tmp_path):
+    path = tmp_path / 'database.db'
+    data = forms()
+    write(path, data, 'sqlite')
+
+    accession, rows = data[0]
+    rows = [row[:] for row in rows]
+    rows[0][FILINGS_COLUMNS.index(TICKER)] = 'NEW'
+    write(path, [(accession, rows)], 'sqlite')
+    df = filings.read_filings(path)
+    assert len(df) == 100
+    assert (df[TICKER] == 'NEW').sum() == 1
+
+
+def test_export_csv_layout(tmp_path):
+    data = forms()
+    write(tmp_path / 'database.db', data, 'sqlite')
+    write(tmp_path / 'database.db', data, 'sqlite')
+    write(tmp_path / 'database.csv', data, 'csv')
+
+    assert sqlite.export_csv(tmp_path / 'database.db', tmp_path / 'exported.csv') == 100
+    exported, expected = (tmp_path / 'exported.csv').read_text(), (tmp_path / 'database.csv').read_text()
+    assert exported.splitlines()[0] == expected.splitlines()[0] == ','.join(FILINGS_COLUMNS)
+    # Numbers are stored as REAL, e.g. 39.20 is exported as 39.2
+    pd.testing.assert_frame_equal(filings.read_filings(tmp_path / 'exported.csv'),
+                                  filings.read_filings(tmp_path / 'database.csv'))